@@ -0,0 +1,65 @@
+import gzip
+import json
+from typing import Optional
+
+import aiohttp
+
+
+class BackendClient:
+    def __init__(self, host: str, max_connections: int = 4, keepalive_seconds: float = 60,
+                 timeout_seconds: float = 5, connect_timeout_seconds: float = 2):
+        """
+        HTTP client for one backend, reusing its connections across requests.
+
+        The session and its connection pool are created on the first request and live until
+        close(), so the exports after the first one skip the TCP handshake.
+
+        Args:
+            host: Base URL of the backend, e.g. http://10.0.4.62:80
+            max_connections: Connections to the backend open at most, requests beyond wait for one
+            keepalive_seconds: How long an idle connection is kept for the next request
+            timeout_seconds: Longest time a request may take, waiting for a connection included
+            connect_timeout_seconds: Longest time opening a connection may take
+        """
+        self.host = host.rstrip("/")
+        self.max_connections = max_connections
+        self.keepalive = keepalive_seconds
+        self.timeout = aiohttp.ClientTimeout(total=timeout_seconds, connect=connect_timeout_seconds)
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.sent_bytes = 0
+
+    def _session(self) -> aiohttp.ClientSession:
+        # Created lazily, a session binds to the event loop running when it is made
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=self.keepalive)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self.session
+
+    async def post(self, path: str, payload, compress: bool = False) -> None:
+        """POST payload as JSON, raising on connection errors, timeouts and error statuses."""
+        await self.post_json(path, json.dumps(payload).encode(), compress)
+
+    async def post_json(self, path: str, body: bytes, compress: bool = False) -> int:
+        """
+        POST an encoded JSON body, returns the bytes sent.
+
+        Args:
+            path: Path on the backend
+            body: JSON document
+            compress: Send the body gzip-compressed, with Content-Encoding: gzip
+        """
+        headers = {"Content-Type": "application/json"}
+        if compress:
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+        async with self._session().post(f"{self.host}{path}", data=body, headers=headers) as response:
+            # Reading the body to the end hands the connection back to the pool
+            await response.read()
+            response.raise_for_status()
+        self.sent_bytes += len(body)
+        return len(body)
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
@@ -0,0 +1,68 @@
+from bisect import bisect_left
+from typing import List, Optional
+
+
+def log_buckets(lowest: float, highest: float, buckets_per_decade: int = 10) -> List[float]:
+    """Upper bounds growing by a constant factor from lowest to highest."""
+    bounds = []
+    bound = lowest
+    step = 10 ** (1 / buckets_per_decade)
+    while bound < highest * (1 + 1e-9):
+        bounds.append(bound)
+        bound *= step
+    return bounds
+
+
+# 1 us to 10 s with ~26% resolution, suited to durations in seconds
+DURATION_BUCKETS = log_buckets(1e-6, 10)
+
+
+class FixedBucketHistogram:
+    def __init__(self, bounds: Optional[List[float]] = None):
+        """
+        Histogram with preallocated buckets, so recording never allocates.
+
+        Percentiles are reported as the upper bound of the bucket they fall in,
+        except for values above the last bound which report the observed maximum.
+
+        Args:
+            bounds: Sorted bucket upper bounds, defaults to DURATION_BUCKETS
+        """
+        self.bounds = bounds if bounds is not None else DURATION_BUCKETS
+        # The last bucket collects everything above the highest bound
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent: float) -> float:
+        if self.count == 0:
+            return 0.0
+
+        rank = self.count * percent / 100
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                if index == len(self.bounds):
+                    return self.max
+                return min(self.bounds[index], self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def reset(self) -> None:
+        for index in range(len(self.counts)):
+            self.counts[index] = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
@@ -23,86 +23,141 @@ class Metric:
 class MetricsRegistry:
     def __init__(self):
         self.metrics = {}
+        # Names of the metrics created or changed since the last take_metrics
+        self.changed = set()
 
 
     def inc_counter(self, name: str, value: float):
-        if format_metric_name(name) not in self.metrics:
-            self.metrics[format_metric_name(name)] = Metric.counter(name, 0)
-
-        self.metrics[format_metric_name(name)].value += value
+        metric_name = format_metric_name(name)
+        if metric_name not in self.metrics:
+            self.metrics[metric_name] = Metric.counter(name, 0)
+            self.changed.add(metric_name)
+
+        if value:
+            self.metrics[metric_name].value += value
+            self.changed.add(metric_name)
+
+    def set_counter(self, name: str, value: float):
+        """Set a counter to a total counted elsewhere."""
+        metric_name = format_metric_name(name)
+        metric = self.metrics.get(metric_name)
+        if metric is None:
+            self.metrics[metric_name] = Metric.counter(name, value)
+            self.changed.add(metric_name)
+        elif metric.value != value:
+            metric.value = value
+            self.changed.add(metric_name)
 
     def set_gauge(self, name: str, value: float):
-        if format_metric_name(name) not in self.metrics:
-            self.metrics[format_metric_name(name)] = Metric.gauge(name, value)
+        metric_name = format_metric_name(name)
+        metric = self.metrics.get(metric_name)
+        if metric is None:
+            self.metrics[metric_name] = Metric.gauge(name, value)
+            self.changed.add(metric_name)
+        elif metric.value != value:
+            metric.value = value
+            self.changed.add(metric_name)
 
-        self.metrics[format_metric_name(name)].value = value
+    @staticmethod
+    def _to_dict(metric: Metric) -> dict:
+        return {
+            'name': metric.name,
+            'type': metric.type,
+            'value': metric.value
+        }
 
     def get_metrics(self) -> list:
-        return [
-            {
-                'name': metric.name,
-                'type': metric.type,
-                'value': metric.value
-            }
-            for metric in self.metrics.values()
-        ]
+        return [self._to_dict(metric) for metric in self.metrics.values()]
+
+    def take_metrics(self, full: bool = False) -> list:
+        """
+        Get the metrics changed since the previous call, or all of them, and start tracking changes afresh.
+
+        Args:
+            full: Return every metric rather than only the changed ones
+        """
+        if full:
+            metrics = self.get_metrics()
+        else:
+            metrics = [self._to_dict(self.metrics[name]) for name in self.changed]
+        self.changed = set()
+        return metrics
+
+    def set_gauges(self, values: dict):
+        for name, value in values.items():
+            self.set_gauge(name, value)
 
     def observe_system_metrics(self):
         """
-        Observes various system metrics and records them as gauges
+        Observes various system metrics and records them as gauges.
+        Blocks for a second to measure the CPU usage, use a SystemMetricsSampler on the control loop.
         """
-        # CPU Metrics
-        cpu_percent = psutil.cpu_percent(interval=1)
-        self.set_gauge("cpu_usage_percent", cpu_percent)
-
-        # CPU Frequency
-        cpu_freq = psutil.cpu_freq()
-        if cpu_freq:
-            self.set_gauge("cpu_freq_current", cpu_freq.current)
-            if hasattr(cpu_freq, 'min'):
-                self.set_gauge("cpu_freq_min", cpu_freq.min)
-            if hasattr(cpu_freq, 'max'):
-                self.set_gauge("cpu_freq_max", cpu_freq.max)
-
-        # Memory Metrics
-        mem = psutil.virtual_memory()
-        self.set_gauge("memory_total_gb", round(mem.total / (1024 ** 3), 2))
-        self.set_gauge("memory_available_gb", round(mem.available / (1024 ** 3), 2))
-        self.set_gauge("memory_used_gb", round(mem.used / (1024 ** 3), 2))
-        self.set_gauge("memory_percent", mem.percent)
-
-        # Disk Metrics
-        disk = psutil.disk_usage('/')
-        self.set_gauge("disk_total_gb", round(disk.total / (1024 ** 3), 2))
-        self.set_gauge("disk_used_gb", round(disk.used / (1024 ** 3), 2))
-        self.set_gauge("disk_free_gb", round(disk.free / (1024 ** 3), 2))
-        self.set_gauge("disk_percent", disk.percent)
-
-        # Load Average (1, 5, 15 minutes)
-        try:
-            load1, load5, load15 = psutil.getloadavg()
-            self.set_gauge("load_1min", load1)
-            self.set_gauge("load_5min", load5)
-            self.set_gauge("load_15min", load15)
-        except (AttributeError, OSError):
-            # Might not be available on some systems
-            pass
-
-        # Temperature (if available)
-        try:
-            temperatures = psutil.sensors_temperatures()
-            if temperatures:
-                for name, entries in temperatures.items():
-                    for idx, entry in enumerate(entries):
-                        self.set_gauge(f"temperature_{name}_{idx}", entry.current)
-        except (AttributeError, OSError):
-            # Might not be available on some systems
-            pass
-
-        # Network IO Counters
-        net_io = psutil.net_io_counters()
-        self.set_gauge("network_bytes_sent", net_io.bytes_sent)
-        self.set_gauge("network_bytes_recv", net_io.bytes_recv)
+        self.set_gauges(collect_system_metrics(cpu_interval=1))
+
+
+def collect_system_metrics(cpu_interval=None) -> dict:
+    """
+    Collects various system metrics as gauge values by name
+
+    Args:
+        cpu_interval: Seconds to block measuring the CPU usage, None to report
+            the usage since the previous call instead
+    """
+    metrics = {}
+
+    # CPU Metrics
+    metrics["cpu_usage_percent"] = psutil.cpu_percent(interval=cpu_interval)
+
+    # CPU Frequency
+    cpu_freq = psutil.cpu_freq()
+    if cpu_freq:
+        metrics["cpu_freq_current"] = cpu_freq.current
+        if hasattr(cpu_freq, 'min'):
+            metrics["cpu_freq_min"] = cpu_freq.min
+        if hasattr(cpu_freq, 'max'):
+            metrics["cpu_freq_max"] = cpu_freq.max
+
+    # Memory Metrics
+    mem = psutil.virtual_memory()
+    metrics["memory_total_gb"] = round(mem.total / (1024 ** 3), 2)
+    metrics["memory_available_gb"] = round(mem.available / (1024 ** 3), 2)
+    metrics["memory_used_gb"] = round(mem.used / (1024 ** 3), 2)
+    metrics["memory_percent"] = mem.percent
+
+    # Disk Metrics
+    disk = psutil.disk_usage('/')
+    metrics["disk_total_gb"] = round(disk.total / (1024 ** 3), 2)
+    metrics["disk_used_gb"] = round(disk.used / (1024 ** 3), 2)
+    metrics["disk_free_gb"] = round(disk.free / (1024 ** 3), 2)
+    metrics["disk_percent"] = disk.percent
+
+    # Load Average (1, 5, 15 minutes)
+    try:
+        load1, load5, load15 = psutil.getloadavg()
+        metrics["load_1min"] = load1
+        metrics["load_5min"] = load5
+        metrics["load_15min"] = load15
+    except (AttributeError, OSError):
+        # Might not be available on some systems
+        pass
+
+    # Temperature (if available)
+    try:
+        temperatures = psutil.sensors_temperatures()
+        if temperatures:
+            for name, entries in temperatures.items():
+                for idx, entry in enumerate(entries):
+                    metrics[f"temperature_{name}_{idx}"] = entry.current
+    except (AttributeError, OSError):
+        # Might not be available on some systems
+        pass
+
+    # Network IO Counters
+    net_io = psutil.net_io_counters()
+    metrics["network_bytes_sent"] = net_io.bytes_sent
+    metrics["network_bytes_recv"] = net_io.bytes_recv
+
+    return metrics
 
 
 if __name__ == "__main__":
@@ -0,0 +1,56 @@
+import threading
+import time
+from typing import Optional
+
+from analytics.metric import collect_system_metrics
+
+
+class SystemMetricsSampler:
+    def __init__(self, interval_seconds: float = 5):
+        """
+        Samples the system metrics on a background thread at its own cadence.
+
+        Each sample replaces the snapshot dict as a whole, so readers on the control
+        loop pick up the latest complete snapshot without locking or blocking.
+
+        Args:
+            interval_seconds: Time between two samples, also the CPU usage averaging window
+        """
+        self.interval = interval_seconds
+        self.snapshot: dict = {}
+        self.snapshot_time: Optional[float] = None
+        # Incremented on every new snapshot so readers can skip unchanged ones
+        self.version = 0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.is_running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="system-metrics-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def sample(self) -> None:
+        # Without an interval cpu_percent reports the usage since its previous call
+        self.snapshot = collect_system_metrics(cpu_interval=None)
+        self.snapshot_time = time.time()
+        self.version += 1
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"Failed sampling system metrics: {e}")
+            self._stop_event.wait(self.interval)
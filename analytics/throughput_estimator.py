@@ -0,0 +1,90 @@
+from array import array
+from typing import Optional, Tuple
+
+from analytics.histogram import FixedBucketHistogram, log_buckets
+
+
+class ThroughputEstimator:
+    def __init__(self, capacity: int = 16384, windows: Tuple[int, ...] = (60, 300, 900)):
+        """
+        Streaming box rate over sliding windows, from the box timestamps.
+
+        Timestamps go into a preallocated ring buffer. Each window keeps the sequence
+        number of its oldest box and only moves it forward, so recording a box is
+        amortized O(1) however many boxes a window holds. Inter-arrival times go
+        into a fixed-bucket histogram.
+
+        Args:
+            capacity: Boxes kept in the ring buffer, should cover the longest window
+            windows: Window lengths in seconds
+        """
+        self.capacity = capacity
+        self.windows = windows
+        self.timestamps = array('d', bytes(8 * capacity))
+        # Sequence number of the next box, the ring index is count % capacity
+        self.count = 0
+        self.window_starts = [0] * len(windows)
+        self.inter_arrival = FixedBucketHistogram(log_buckets(1e-3, 3600))
+        self.started_at: Optional[float] = None
+        self.last_timestamp: Optional[float] = None
+        self.longest_gap = 0.0
+
+    def start(self, now: float) -> None:
+        """Set the time rates are measured from, so windows longer than the uptime are not diluted."""
+        self.started_at = now
+
+    def record(self, timestamp: float) -> None:
+        if self.started_at is None:
+            self.started_at = timestamp
+        if self.last_timestamp is not None:
+            gap = timestamp - self.last_timestamp
+            self.inter_arrival.record(gap)
+            if gap > self.longest_gap:
+                self.longest_gap = gap
+        self.last_timestamp = timestamp
+
+        self.timestamps[self.count % self.capacity] = timestamp
+        self.count += 1
+        self._expire(timestamp)
+
+    def _expire(self, now: float) -> None:
+        oldest_in_buffer = max(0, self.count - self.capacity)
+        for index, window in enumerate(self.windows):
+            start = max(self.window_starts[index], oldest_in_buffer)
+            cutoff = now - window
+            while start < self.count and self.timestamps[start % self.capacity] <= cutoff:
+                start += 1
+            self.window_starts[index] = start
+
+    def rate_per_minute(self, window_index: int, now: float) -> float:
+        if self.started_at is None:
+            return 0.0
+        self._expire(now)
+
+        boxes = self.count - self.window_starts[window_index]
+        elapsed = min(self.windows[window_index], now - self.started_at)
+        if self.window_starts[window_index] == max(0, self.count - self.capacity) and self.count > self.capacity:
+            # The buffer no longer reaches back to the start of the window
+            elapsed = now - self.timestamps[self.window_starts[window_index] % self.capacity]
+        if elapsed <= 0:
+            return 0.0
+        return boxes / elapsed * 60
+
+    def current_gap(self, now: float) -> float:
+        if self.last_timestamp is None:
+            return now - self.started_at if self.started_at is not None else 0.0
+        return now - self.last_timestamp
+
+    def summary(self, now: float) -> dict:
+        summary = {
+            f"boxes_per_minute_{window // 60}m": self.rate_per_minute(index, now)
+            for index, window in enumerate(self.windows)
+        }
+        summary.update({
+            "box_interarrival_p50_s": self.inter_arrival.percentile(50),
+            "box_interarrival_p90_s": self.inter_arrival.percentile(90),
+            "box_interarrival_p99_s": self.inter_arrival.percentile(99),
+            "box_gap_current_s": self.current_gap(now),
+            "box_gap_longest_s": self.longest_gap,
+        })
+        return summary
@@ -0,0 +1,94 @@
+# Run from the repository root: python -m benchmarks.line_scaling
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import tempfile
+import time
+
+from analytics.metric import MetricsRegistry
+from core.line_supervisor import LineSupervisor
+from implementations.mock_motor_controller import MockMotorController
+from implementations.mock_sensor_controller import MockSensorController
+from infrastructure.async_publisher import AsyncPublisher
+from infrastructure.boblogger import BobLogger
+from infrastructure.config_loader import ConfigLoader
+
+
+def write_config(path: str, line_count: int) -> None:
+    config = {
+        "speed": 12,
+        "power": "ON",
+        "lines": {str(line): {} for line in range(line_count)}
+    }
+    with open(path, 'w') as file:
+        json.dump(config, file)
+
+
+async def run_lines(publisher: AsyncPublisher, config_path: str, line_count: int,
+                    period_millis: float, duration: float) -> dict:
+    write_config(config_path, line_count)
+    supervisor = LineSupervisor(
+        publisher=publisher,
+        logger=BobLogger(),
+        metrics_registry=MetricsRegistry()
+    )
+    for line in range(line_count):
+        supervisor.add_line(
+            line_id=str(line),
+            motor=MockMotorController(),
+            sensor=MockSensorController(),
+            config_loader=ConfigLoader(config_path=config_path, section=str(line)),
+            delay_millis=period_millis
+        )
+
+    started_at = time.monotonic()
+    run_task = asyncio.create_task(supervisor.run())
+    await asyncio.sleep(duration)
+    await supervisor.stop()
+    await run_task
+    elapsed = time.monotonic() - started_at
+
+    stats = [line.scheduler.stats for line in supervisor.lines.values()]
+    ticks = sum(stat.ticks for stat in stats)
+    return {
+        "lines": line_count,
+        "ticks_per_second": ticks / elapsed,
+        "mean_tick_ms": sum(stat.total_tick_duration for stat in stats) / ticks * 1000 if ticks else 0.0,
+        "max_tick_ms": max(stat.max_tick_duration for stat in stats) * 1000,
+        "mean_jitter_ms": sum(stat.total_jitter for stat in stats) / ticks * 1000 if ticks else 0.0,
+        "overruns": sum(stat.overruns for stat in stats),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Tick throughput and latency as the number of lines grows")
+    parser.add_argument("--lines", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--period-ms", type=float, default=10)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--address", default="tcp://127.0.0.1:5599")
+    args = parser.parse_args()
+
+    publisher = AsyncPublisher(publish_address=args.address)
+    await publisher.connect()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        config_path = os.path.join(directory, "config.json")
+        for line_count in args.lines:
+            # The mocks and the publisher print on every call
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                results.append(await run_lines(publisher, config_path, line_count, args.period_ms, args.duration))
+
+    print(f"period {args.period_ms} ms, {args.duration} s per run")
+    print(f"{'lines':>6} {'ticks/s':>10} {'mean tick ms':>13} {'max tick ms':>12} {'mean jitter ms':>15} {'overruns':>9}")
+    for result in results:
+        print(f"{result['lines']:>6} {result['ticks_per_second']:>10.1f} {result['mean_tick_ms']:>13.3f} "
+              f"{result['max_tick_ms']:>12.3f} {result['mean_jitter_ms']:>15.3f} {result['overruns']:>9}")
+
+    publisher.pub.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
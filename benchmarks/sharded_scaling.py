@@ -0,0 +1,140 @@
+# Run from the repository root: python -m benchmarks.sharded_scaling
+import argparse
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import sys
+import tempfile
+import time
+
+from analytics.metric import MetricsRegistry
+from core.line_supervisor import LineSupervisor
+from core.sharded_supervisor import ShardedLineSupervisor
+from implementations.mock_motor_controller import MockMotorController
+from implementations.mock_sensor_controller import MockSensorController
+from infrastructure.async_publisher import AsyncPublisher
+from infrastructure.boblogger import BobLogger
+from infrastructure.config_loader import ConfigLoader
+
+
+class BusySensorController(MockSensorController):
+    """Mock sensor burning CPU on every read, standing in for per-line filtering and analytics."""
+
+    def __init__(self, work_micros: float):
+        super().__init__(verbose=False)
+        self.work = work_micros / 1_000_000
+
+    def is_box_visible(self) -> bool:
+        deadline = time.perf_counter() + self.work
+        while time.perf_counter() < deadline:
+            pass
+        return super().is_box_visible()
+
+
+def busy_line(line_id: str, config_loader: ConfigLoader, work_micros: float):
+    return MockMotorController(), BusySensorController(work_micros)
+
+
+def silence_stdout():
+    sys.stdout = open(os.devnull, 'w')
+
+
+def write_config(path: str, line_count: int) -> None:
+    config = {
+        "speed": 12,
+        "power": "ON",
+        "lines": {str(line): {} for line in range(line_count)}
+    }
+    with open(path, 'w') as file:
+        json.dump(config, file)
+
+
+async def run_in_process(config_path: str, line_count: int, line_factory, period_millis: float,
+                         duration: float, address: str) -> float:
+    publisher = AsyncPublisher(publish_address=address)
+    await publisher.connect()
+    supervisor = LineSupervisor(publisher=publisher, logger=BobLogger(), metrics_registry=MetricsRegistry())
+    for line in range(line_count):
+        config_loader = ConfigLoader(config_path=config_path, section=str(line))
+        motor, sensor = line_factory(str(line), config_loader)
+        supervisor.add_line(str(line), motor, sensor, config_loader, delay_millis=period_millis)
+
+    started_at = time.monotonic()
+    run_task = asyncio.create_task(supervisor.run())
+    await asyncio.sleep(duration)
+    await supervisor.stop()
+    await run_task
+    elapsed = time.monotonic() - started_at
+    publisher.pub.close()
+    # The stream closes its socket on a later loop iteration, the next run binds the same address
+    while not publisher.pub.at_closing():
+        await asyncio.sleep(0.01)
+    return sum(line.scheduler.stats.ticks for line in supervisor.lines.values()) / elapsed
+
+
+async def run_sharded(config_path: str, line_count: int, line_factory, period_millis: float,
+                      duration: float, address: str, workers: int) -> float:
+    supervisor = ShardedLineSupervisor(
+        line_ids=[str(line) for line in range(line_count)],
+        line_factory=line_factory,
+        config_path=config_path,
+        publish_address=address,
+        workers=workers,
+        delay_millis=period_millis,
+        initializer=silence_stdout
+    )
+    supervisor.start()
+    try:
+        # Measure between two table reads so worker start-up is not counted
+        while not all(state.ticks for state in supervisor.read_states().values()):
+            await asyncio.sleep(0.05)
+        ticks_before = sum(state.ticks for state in supervisor.read_states().values())
+        started_at = time.monotonic()
+        await asyncio.sleep(duration)
+        ticks_after = sum(state.ticks for state in supervisor.read_states().values())
+        elapsed = time.monotonic() - started_at
+        if not supervisor.proxy_thread.is_alive():
+            raise RuntimeError("The shard forwarder stopped, the sharded lines ran without a publish path")
+    finally:
+        supervisor.stop()
+    return (ticks_after - ticks_before) / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Aggregate tick throughput of in-process and sharded lines")
+    parser.add_argument("--lines", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--period-ms", type=float, default=1)
+    parser.add_argument("--work-us", type=float, default=200, help="CPU work per tick and line")
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--address", default="tcp://127.0.0.1:5599", help="Endpoint of the in-process publisher")
+    parser.add_argument("--sharded-address", default="tcp://127.0.0.1:5598",
+                        help="Endpoint of the sharded lines' forwarder, distinct so neither run waits on the other's socket")
+    args = parser.parse_args()
+
+    line_factory = functools.partial(busy_line, work_micros=args.work_us)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        config_path = os.path.join(directory, "config.json")
+        for line_count in args.lines:
+            write_config(config_path, line_count)
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                in_process = await run_in_process(
+                    config_path, line_count, line_factory, args.period_ms, args.duration, args.address
+                )
+                sharded = await run_sharded(
+                    config_path, line_count, line_factory, args.period_ms, args.duration, args.sharded_address,
+                    args.workers
+                )
+            results.append((line_count, in_process, sharded))
+
+    print(f"period {args.period_ms} ms, {args.work_us} us work per tick, {args.workers or os.cpu_count()} workers")
+    print(f"{'lines':>6} {'in-process ticks/s':>19} {'sharded ticks/s':>16} {'speedup':>8}")
+    for line_count, in_process, sharded in results:
+        print(f"{line_count:>6} {in_process:>19.1f} {sharded:>16.1f} {sharded / in_process:>7.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,143 @@
+# Run from the repository root: python -m benchmarks.transport_latency
+import argparse
+import multiprocessing
+import select
+import struct
+import time
+from typing import List
+
+from analytics.histogram import FixedBucketHistogram, log_buckets
+from infrastructure.shm_ring import ShmRing
+
+# Send time (CLOCK_MONOTONIC, shared by all processes) and message number at the start of every message
+_STAMP = struct.Struct("<qQ")
+RING_NAME = "bober-bench-ring"
+
+
+def receive_zmq(address: str, messages: int, ready, results) -> None:
+    import zmq
+
+    context = zmq.Context()
+    socket = context.socket(zmq.PULL)
+    socket.bind(address)
+    ready.set()
+    latencies = []
+    for _ in range(messages):
+        message = socket.recv()
+        latencies.append(time.monotonic_ns() - _STAMP.unpack_from(message)[0])
+    results.put(latencies)
+    socket.close()
+    context.term()
+
+
+def send_zmq(address: str, payloads: List[bytes], interval: float) -> None:
+    import zmq
+
+    context = zmq.Context()
+    socket = context.socket(zmq.PUSH)
+    socket.connect(address)
+    for index, payload in enumerate(payloads):
+        socket.send(_stamp(index, payload))
+        _pace(interval)
+    socket.close(linger=-1)
+    context.term()
+
+
+def receive_shm(messages: int, ready, results) -> None:
+    ring = ShmRing(RING_NAME, create=False)
+    notify_fd = ring.open_notifications()
+    ready.set()
+    latencies = []
+    while len(latencies) < messages:
+        for message in ring.read_all():
+            latencies.append(time.monotonic_ns() - _STAMP.unpack_from(message)[0])
+        if len(latencies) < messages and ring.prepare_wait():
+            select.select([notify_fd], [], [], 0.1)
+            ring.clear_notifications()
+    results.put(latencies)
+    ring.close()
+
+
+def send_shm(ring: ShmRing, payloads: List[bytes], interval: float) -> None:
+    for index, payload in enumerate(payloads):
+        message = _stamp(index, payload)
+        while not ring.write(message):
+            # Full, give the reader the core on a single-core Pi
+            time.sleep(0)
+        _pace(interval)
+
+
+def _stamp(index: int, payload: bytes) -> bytes:
+    return _STAMP.pack(time.monotonic_ns(), index) + payload
+
+
+def _pace(interval: float) -> None:
+    if interval > 0:
+        deadline = time.perf_counter() + interval
+        while time.perf_counter() < deadline:
+            pass
+
+
+def run(transport: str, messages: int, size: int, interval: float) -> dict:
+    payloads = [bytes(size)] * messages
+    ready = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    ring = None
+    if transport == "shm":
+        ring = ShmRing(RING_NAME, capacity=4 * 1024 * 1024)
+        receiver = multiprocessing.Process(target=receive_shm, args=(messages, ready, results))
+    else:
+        # Fail here rather than in the receiver, which the sender would wait for
+        import zmq
+        address = "tcp://127.0.0.1:5599" if transport == "tcp" else "ipc:///tmp/bober-bench.ipc"
+        receiver = multiprocessing.Process(target=receive_zmq, args=(address, messages, ready, results))
+    receiver.start()
+    ready.wait()
+
+    started_at = time.perf_counter()
+    if ring is not None:
+        send_shm(ring, payloads, interval)
+    else:
+        send_zmq(address, payloads, interval)
+    latencies = results.get()
+    elapsed = time.perf_counter() - started_at
+    receiver.join()
+    if ring is not None:
+        ring.unlink()
+        ring.close()
+
+    histogram = FixedBucketHistogram(log_buckets(1e-6, 1))
+    for latency in latencies:
+        histogram.record(latency / 1e9)
+    return {
+        "transport": transport,
+        "messages_per_second": messages / elapsed,
+        "p50_us": histogram.percentile(50) * 1e6,
+        "p99_us": histogram.percentile(99) * 1e6,
+        "max_us": max(latencies) / 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="One-way latency and throughput of TCP, ipc:// and shared memory")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--size", type=int, default=150, help="Payload bytes, about one JSON telemetry envelope")
+    parser.add_argument("--interval-us", type=float, default=0,
+                        help="Pause between messages, 0 to send as fast as possible")
+    parser.add_argument("--transports", nargs="+", default=["tcp", "ipc", "shm"], choices=["tcp", "ipc", "shm"])
+    args = parser.parse_args()
+
+    print(f"{args.messages} messages of {args.size} bytes, {args.interval_us} us apart")
+    print(f"{'transport':>10} {'msg/s':>10} {'p50 us':>9} {'p99 us':>9} {'max us':>9}")
+    for transport in args.transports:
+        try:
+            result = run(transport, args.messages, args.size, args.interval_us / 1_000_000)
+        except ImportError as e:
+            print(f"{transport:>10} skipped, {e}")
+            continue
+        print(f"{result['transport']:>10} {result['messages_per_second']:>10.0f} {result['p50_us']:>9.1f} "
+              f"{result['p99_us']:>9.1f} {result['max_us']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
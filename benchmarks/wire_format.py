@@ -0,0 +1,83 @@
+# Run from the repository root: python -m benchmarks.wire_format
+import argparse
+import datetime
+import time
+from typing import List
+
+from enums import WireCodec
+from infrastructure import wire
+from infrastructure.wire import decode_message, encode_batch, encode_event
+
+
+def sample_envelopes(count: int) -> List[dict]:
+    """Telemetry with the odd state change event, as the control loop publishes them."""
+    envelopes = []
+    for index in range(count):
+        data = {"totaloutputunitcount": 1000 + index, "machinespeed": 12, "lineid": "1"}
+        timestamp = (datetime.datetime(2026, 1, 1) + datetime.timedelta(milliseconds=100 * index)).isoformat() + "Z"
+        trace = {"source": "raspberrypi:1234", "seq": index + 1, "sent": 1_000_000_000 + 100_000_000 * index}
+        if index % 50 == 0:
+            envelopes.append({"type": "export_event", "timestamp": timestamp, "event": "running", "data": data,
+                              "trace": trace})
+        else:
+            envelopes.append({"type": "export_telemetry", "timestamp": timestamp, "data": data, "trace": trace})
+    return envelopes
+
+
+def measure(codec: WireCodec, envelopes: List[dict], batch_size: int, repeat: int) -> dict:
+    if batch_size == 1:
+        def encode():
+            return [encode_event(envelope, codec) for envelope in envelopes]
+    else:
+        def encode():
+            return [encode_batch(envelopes[start:start + batch_size], codec)
+                    for start in range(0, len(envelopes), batch_size)]
+    messages = encode()
+
+    decoded = [event for message in messages for event in decode_message(message)]
+    assert decoded == envelopes, f"{codec.name} does not round-trip"
+
+    started_at = time.perf_counter()
+    for _ in range(repeat):
+        encode()
+    encode_seconds = time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    for _ in range(repeat):
+        for message in messages:
+            decode_message(message)
+    decode_seconds = time.perf_counter() - started_at
+
+    count = len(envelopes) * repeat
+    return {
+        "codec": codec.name.lower(),
+        "batch": batch_size,
+        "bytes_per_message": sum(len(frame) for message in messages for frame in message) / len(envelopes),
+        "encode_us": encode_seconds / count * 1_000_000,
+        "decode_us": decode_seconds / count * 1_000_000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes and CPU per envelope for each wire codec")
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 64])
+    args = parser.parse_args()
+
+    codecs = [codec for codec in WireCodec if codec != WireCodec.MSGPACK or wire.msgpack is not None]
+    envelopes = sample_envelopes(args.messages)
+
+    print(f"{args.messages} envelopes, {args.repeat} rounds, bytes include every frame")
+    print(f"{'codec':>8} {'batch':>6} {'bytes/msg':>10} {'encode us':>10} {'decode us':>10}")
+    for batch_size in args.batch_sizes:
+        for codec in codecs:
+            result = measure(codec, envelopes, batch_size, args.repeat)
+            print(f"{result['codec']:>8} {result['batch']:>6} {result['bytes_per_message']:>10.1f} "
+                  f"{result['encode_us']:>10.2f} {result['decode_us']:>10.2f}")
+    if wire.msgpack is None:
+        print("msgpack is not installed, its codec was skipped")
+
+
+if __name__ == "__main__":
+    main()
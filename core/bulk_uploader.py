@@ -0,0 +1,136 @@
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from analytics.histogram import FixedBucketHistogram
+from analytics.metric import MetricsRegistry
+
+METRICS_PATH = "/api/v1/metrics/send"
+LOGS_PATH = "/api/v1/logs/send"
+
+
+def metric_key(metric: dict) -> Tuple[Optional[str], str]:
+    return metric.get("source"), metric["name"]
+
+
+class BulkUploader:
+    def __init__(self, send: Callable[[str, bytes], Awaitable[bool]], window_seconds: float = 5,
+                 max_request_bytes: int = 256 * 1024, max_pending_logs: int = 5000,
+                 collect_metrics: Optional[Callable[[], List[dict]]] = None):
+        """
+        Merges the metrics and logs received over a window and uploads them in one request each.
+
+        Metrics are merged by publisher and name, the latest value wins. Counters carry their
+        running total, so the latest one already sums the increments made during the window.
+        Logs are concatenated. A window's upload is split into several requests when its JSON would
+        exceed max_request_bytes.
+
+        Metrics that could not be uploaded go back into the next window, where the values
+        received meanwhile replace them, so a late upload never sends a stale value.
+
+        Args:
+            send: Uploads a JSON body to a backend path, False when it could not be delivered
+            window_seconds: Longest time a metric or log line waits for its upload
+            max_request_bytes: Largest JSON body of one request, before compression
+            max_pending_logs: Log lines after which the window is uploaded right away
+            collect_metrics: Called once per window before it is uploaded, returns metrics to add to it
+        """
+        self.send = send
+        self.window = window_seconds
+        self.max_request_bytes = max_request_bytes
+        self.max_pending_logs = max_pending_logs
+        self.collect_metrics = collect_metrics
+        # By (publisher, name), publishers such as the workers of a sharded supervisor share metric names
+        self.metrics: Dict[Tuple[Optional[str], str], dict] = {}
+        self.logs: List[dict] = []
+        self.requests = 0
+        self.json_bytes = 0
+        self.upload_latency = FixedBucketHistogram()
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+    def add_metrics(self, metrics: List[dict], source: Optional[str] = None) -> None:
+        """Add a publisher's metrics to the window, labelled with the publisher when it is known."""
+        for metric in metrics:
+            if source is not None:
+                metric = dict(metric, source=source)
+            self.metrics[metric_key(metric)] = metric
+        self._schedule()
+
+    def add_logs(self, logs: List[dict]) -> None:
+        self.logs.extend(logs)
+        if len(self.logs) >= self.max_pending_logs:
+            self._flush_soon()
+        else:
+            self._schedule()
+
+    def _schedule(self) -> None:
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_event_loop().call_later(self.window, self._flush_soon)
+
+    def _flush_soon(self) -> None:
+        task = asyncio.create_task(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self) -> None:
+        """Upload what the current window holds."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self.collect_metrics is not None:
+            for metric in self.collect_metrics():
+                self.metrics[metric_key(metric)] = metric
+        metrics, self.metrics = list(self.metrics.values()), {}
+        logs, self.logs = self.logs, []
+        if metrics:
+            failed = await self._upload(METRICS_PATH, metrics)
+            if failed:
+                for metric in failed:
+                    self.metrics.setdefault(metric_key(metric), metric)
+                self._schedule()
+        if logs:
+            await self._upload(LOGS_PATH, logs)
+
+    async def _upload(self, path: str, items: List[dict]) -> List[dict]:
+        """Upload the items, returns those that could not be delivered."""
+        failed = []
+        for chunk, body in self._bodies(items):
+            started = time.monotonic()
+            delivered = await self.send(path, body)
+            # Retries and backoff included
+            self.upload_latency.record(time.monotonic() - started)
+            if delivered:
+                self.requests += 1
+                self.json_bytes += len(body)
+            else:
+                failed.extend(chunk)
+        return failed
+
+    def _bodies(self, items: List[dict]) -> List[Tuple[List[dict], bytes]]:
+        """Encode the items as JSON arrays of at most max_request_bytes, halving until they fit."""
+        body = json.dumps(items).encode()
+        if len(body) <= self.max_request_bytes or len(items) == 1:
+            return [(items, body)]
+        middle = len(items) // 2
+        return self._bodies(items[:middle]) + self._bodies(items[middle:])
+
+    def observe(self, registry: MetricsRegistry) -> None:
+        registry.set_counter("sidecar_upload_requests", self.requests)
+        registry.set_counter("sidecar_upload_json_bytes", self.json_bytes)
+        if self.upload_latency.count:
+            registry.set_gauge("sidecar_upload_latency_p50_ms", self.upload_latency.percentile(50) * 1000)
+            registry.set_gauge("sidecar_upload_latency_p99_ms", self.upload_latency.percentile(99) * 1000)
+            registry.set_gauge("sidecar_upload_latency_max_ms", self.upload_latency.max * 1000)
+        self.upload_latency.reset()
+
+    async def close(self) -> None:
+        """Upload what is left and wait for the uploads under way."""
+        await self.flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        # Metrics that failed their last upload are not kept past the sidecar's lifetime
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
@@ -0,0 +1,16 @@
+# src/core/clock.py
+import asyncio
+import time
+
+
+class SystemClock:
+    """Real time source of the control loop. Simulations swap it for a VirtualClock."""
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def time(self) -> float:
+        return time.time()
+
+    async def sleep(self, seconds: float) -> None:
+        await asyncio.sleep(seconds)
@@ -1,21 +1,28 @@
 # src/core/control_loop.py
 import asyncio
-import datetime
 import time
 import traceback
+from typing import Callable, List, Optional
 
 # from analytics.analytics_client import produce_machine_iot_client
-from enums import MachineStatus
+from analytics.throughput_estimator import ThroughputEstimator
+from core import tick_profiler
+from core.clock import SystemClock
+from core.tick_profiler import TickProfiler
+from core.tick_scheduler import TickScheduler
+from enums import MachineStatus, OverrunPolicy
 from implementations.mock_motor_controller import MockMotorController
 from implementations.mock_sensor_controller import MockSensorController
 from implementations.queued_observability_controller import QueuedObservabilityController
+from implementations.speed_strategies import StepSpeedStrategy
 from infrastructure import config_loader
 from infrastructure.async_publisher import AsyncPublisher
-from infrastructure.config_loader import ConfigLoader
+from infrastructure.config_loader import ConfigLoader, ConfigSnapshot
 from infrastructure.boblogger import BobLogger
 from interfaces.motor_interface import IMotorController
 from interfaces.observability_interface import IObservabilityController
 from interfaces.sensor_interface import ISensorController
+from interfaces.speed_strategy_interface import ISpeedStrategy, SpeedInputs
 
 
 class ControlLoop:
@@ -25,7 +32,11 @@ class ControlLoop:
                  observability: IObservabilityController,
                  config_loader: ConfigLoader,
                  logger: BobLogger,
-                 delay_millis: float):
+                 delay_millis: float,
+                 overrun_policy: OverrunPolicy = OverrunPolicy.SKIP,
+                 profiler: Optional[TickProfiler] = None,
+                 clock: Optional[SystemClock] = None,
+                 speed_strategy: Optional[ISpeedStrategy] = None):
         self.motor = motor
         self.logger = logger
         self.sensor = sensor
@@ -34,27 +45,45 @@ class ControlLoop:
         self.is_on = True
         self.is_running = False
         self.desired_speed = 10
+        self.target_boxes_per_minute = None
+        self.speed_strategy = speed_strategy if speed_strategy is not None else StepSpeedStrategy()
         self.config_loader = config_loader
         self.delay_millis = delay_millis
+        # Every time source of the loop goes through the clock so simulations can replace it
+        self.clock = clock if clock is not None else SystemClock()
+        self.scheduler = TickScheduler(
+            period_millis=delay_millis,
+            overrun_policy=overrun_policy,
+            clock=self.clock.monotonic,
+            sleep=self.clock.sleep
+        )
+        self.profiler = profiler if profiler is not None else TickProfiler(clock=self.clock.monotonic)
+        self.throughput = ThroughputEstimator()
         self.last_telemetry_timestamp = 0
         self.telemetry_send_threshold = 10
+        self.tick_listeners: List[Callable[['ControlLoop'], None]] = []
+        self.config_loader.subscribe(self.on_config_changed)
+
+    def add_tick_listener(self, listener: Callable[['ControlLoop'], None]) -> None:
+        """Register a callback invoked with the control loop at the end of every tick."""
+        self.tick_listeners.append(listener)
 
     async def try_reload_config(self):
+        # Only true when the content changed, on_config_changed has already been applied
         if self.config_loader.should_reload():
-            self.config_loader.reload_config()
             await self.observability.observe_system_info()
             print(f"Reloaded config {self.config_loader.config}")
 
+    def on_config_changed(self, snapshot: ConfigSnapshot) -> None:
+        # The loader already serves this snapshot
         self.desired_speed = self.config_loader.get_speed()
+        self.target_boxes_per_minute = self.config_loader.get_target_boxes_per_minute()
         new_power_value = self.config_loader.is_power_on()
 
-
         if new_power_value != self.is_on:
             print(f"Machine power switched! [Previous {self.is_on}, current {new_power_value}]")
             self.is_on = new_power_value
 
-        # print(f"Updated desired speed to {self.desired_speed}")
-
     async def handle_power_switch(self):
 
         if self.is_on and not self.motor.is_running():
@@ -81,36 +110,65 @@ class ControlLoop:
     def manage_speed(self):
 
         if not self.is_on:
+            self.speed_strategy.reset()
             return
 
         machine_speed = self.motor.get_speed()
-        if machine_speed == self.desired_speed:
+        now = self.clock.monotonic()
+        command = self.speed_strategy.next_speed(SpeedInputs(
+            now=now,
+            machine_speed=machine_speed,
+            desired_speed=self.desired_speed,
+            target_boxes_per_minute=self.target_boxes_per_minute,
+            boxes_per_minute=self.throughput.rate_per_minute(0, now)
+        ))
+        if command is None or command == machine_speed:
             return
-        elif machine_speed > self.desired_speed:
-            self.logger.info(f"Desired speed is lesser then machine speed, slowing down... [machine speed: {machine_speed}, desired_speed: {self.desired_speed}]")
-            self.motor.slow_down()
-        else:
-            self.motor.speed_up()
-            self.logger.info(f"Desired speed is greater then machine speed, speeding up... [machine speed: {machine_speed}, desired_speed: {self.desired_speed}]")
 
+        self.logger.info("Adjusting machine speed [machine speed: %s, command: %s, desired_speed: %s, target_boxes_per_minute: %s]",
+                         machine_speed, command, self.desired_speed, self.target_boxes_per_minute)
+        self.motor.set_speed(command)
+
+
+    def count_boxes(self, box_visible_in_previous_cycle: bool) -> bool:
+        edges = self.sensor.drain_box_edges()
+        if edges is not None:
+            # Edge-triggered sensors report every box, however short it stayed in the beam
+            for edge in edges:
+                if edge.rising:
+                    self.on_box_detected(edge.timestamp)
+            return edges[-1].rising if edges else box_visible_in_previous_cycle
+
+        box_visible_currently = self.sensor.is_box_visible()
+
+        # Detect rising edge on sensor 1 (new box detected)
+        if not box_visible_in_previous_cycle and box_visible_currently:
+            self.on_box_detected(self.clock.monotonic())
+
+        return box_visible_currently
+
+    def on_box_detected(self, timestamp: float) -> None:
+        self.box_count += 1
+        self.throughput.record(timestamp)
+        self.logger.debug("New box appeared")
 
     async def try_send_telemetry(self):
-        now = datetime.datetime.now(datetime.timezone.utc)
-        time_since_last_send = now.timestamp() - self.last_telemetry_timestamp
+        now = self.clock.time()
+        time_since_last_send = now - self.last_telemetry_timestamp
 
         if time_since_last_send > self.telemetry_send_threshold:
             try:
                 speed = self.motor.get_speed()
-                self.logger.info(f"Send telemetry [box_count {self.box_count}, machine_speed {speed}]")
+                self.logger.info("Send telemetry [box_count %s, machine_speed %s]", self.box_count, speed)
                 await self.observability.observe_running_state(
                     box_count=self.box_count,
                     machine_speed=speed
                 )
 
-                self.last_telemetry_timestamp = now.timestamp()
+                self.last_telemetry_timestamp = now
                 return True
             except Exception as e:
-                self.logger.error(f"Error sending telemetry", e)
+                self.logger.error("Error sending telemetry", exc=e)
                 return False
 
 
@@ -126,27 +184,58 @@ class ControlLoop:
 
         box_visible_in_previous_cycle = False
         self.logger.debug("Starting loop")
+        self.scheduler.start()
+        self.throughput.start(self.clock.monotonic())
         while self.is_running:
             try:
-
+                profiler = self.profiler
+                tick_started_at = phase_started_at = time.perf_counter()
 
                 await self.try_reload_config()
+                phase_ended_at = time.perf_counter()
+                profiler.record(tick_profiler.RELOAD_CONFIG, phase_ended_at - phase_started_at)
+                phase_started_at = phase_ended_at
+
                 await self.handle_power_switch()
+                phase_ended_at = time.perf_counter()
+                profiler.record(tick_profiler.POWER_SWITCH, phase_ended_at - phase_started_at)
+                phase_started_at = phase_ended_at
 
                 self.manage_speed()
-                box_visible_currently = self.sensor.is_box_visible()
+                phase_ended_at = time.perf_counter()
+                profiler.record(tick_profiler.MANAGE_SPEED, phase_ended_at - phase_started_at)
+                phase_started_at = phase_ended_at
 
-                # Detect rising edge on sensor 1 (new box detected)
-                if not box_visible_in_previous_cycle and box_visible_currently:
-                    self.box_count += 1
-                    self.logger.debug("New box appeared")
-
-                box_visible_in_previous_cycle = box_visible_currently
+                box_visible_in_previous_cycle = self.count_boxes(box_visible_in_previous_cycle)
+                phase_ended_at = time.perf_counter()
+                profiler.record(tick_profiler.SENSOR, phase_ended_at - phase_started_at)
+                phase_started_at = phase_ended_at
 
                 await self.try_send_telemetry()
-
+                phase_ended_at = time.perf_counter()
+                profiler.record(tick_profiler.TELEMETRY, phase_ended_at - phase_started_at)
+                phase_started_at = phase_ended_at
+
+                for listener in self.tick_listeners:
+                    listener(self)
+                phase_ended_at = time.perf_counter()
+                profiler.record(tick_profiler.LISTENERS, phase_ended_at - phase_started_at)
+                phase_started_at = phase_ended_at
+
+                await self.observability.observe_tick_stats(self.scheduler.stats)
+                if profiler.export_due():
+                    await self.observability.observe_tick_profile(profiler)
+                    await self.observability.observe_throughput(self.throughput.summary(self.clock.monotonic()))
+                    await self.observability.observe_sensor(self.sensor.stats())
+                if profiler.report_due():
+                    self.logger.info(profiler.format_report())
+                    profiler.reset()
                 await self.observability.flush()
-                time.sleep(self.delay_millis / 1000)
+                phase_ended_at = time.perf_counter()
+                profiler.record(tick_profiler.FLUSH, phase_ended_at - phase_started_at)
+                profiler.record(tick_profiler.TICK, phase_ended_at - tick_started_at)
+
+                await self.scheduler.wait_for_next_tick()
             except Exception as e:
                 await self.observability.observe_machine_status_changed(
                     box_count=self.box_count,
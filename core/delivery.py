@@ -0,0 +1,205 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Optional
+
+from analytics.metric import MetricsRegistry
+from infrastructure.spool import SegmentSpool
+
+
+class RetryPolicy:
+    def __init__(self, attempts: int = 4, base_delay_seconds: float = 0.5, max_delay_seconds: float = 10):
+        """
+        Exponential backoff with full jitter: the wait before retry n is random between zero
+        and base_delay_seconds * 2^n, capped, so clients failing together do not retry together.
+
+        Args:
+            attempts: Tries per payload, the first one included
+            base_delay_seconds: Cap of the wait before the first retry
+            max_delay_seconds: Cap of any wait
+        """
+        self.attempts = attempts
+        self.base_delay = base_delay_seconds
+        self.max_delay = max_delay_seconds
+
+    def delay(self, retry: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout_seconds: float = 30,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Stops calls to a destination after failure_threshold consecutive failures.
+
+        Once open, calls are refused for reset_timeout_seconds, then a single call is let
+        through as a probe: its success closes the breaker, its failure opens it again.
+
+        Args:
+            failure_threshold: Consecutive failures opening the breaker
+            reset_timeout_seconds: Time the breaker stays open before probing
+            clock: Clock timing the open state
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout_seconds
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.opened = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self.probing or self.clock() - self.opened_at < self.reset_timeout:
+            return False
+        self.probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.probing or (self.opened_at is None and self.failures >= self.failure_threshold):
+            if self.opened_at is None:
+                self.opened += 1
+            self.opened_at = self.clock()
+        self.probing = False
+
+
+class Destination:
+    def __init__(self, name: str, send: Callable[[bytes], Awaitable[None]], dead_letters: SegmentSpool,
+                 retry: Optional[RetryPolicy] = None, breaker: Optional[CircuitBreaker] = None,
+                 redrive_interval_seconds: float = 10, redrive_batch: int = 32):
+        """
+        Delivers payloads to one destination with retries, keeping those it could not deliver.
+
+        A payload failing every attempt, or refused by the open circuit breaker, is appended
+        to the dead-letter spool on disk. A background task sends the dead letters again,
+        oldest first, whenever the breaker lets calls through, and stops at the first failure
+        so a destination that is still down sees one call rather than a burst.
+
+        Dead letters reach the destination after payloads sent later, so only payloads that
+        carry their own timestamps belong there. Callers deliver state that a newer payload
+        supersedes with dead_letter=False and keep it for their next send instead.
+
+        Args:
+            name: Destination name in metrics and messages
+            send: Sends one payload, raising on failure
+            dead_letters: Spool keeping the undelivered payloads, across restarts too
+            retry: Backoff between attempts
+            breaker: Circuit breaker guarding the destination
+            redrive_interval_seconds: How often the dead letters are looked at
+            redrive_batch: Dead letters read from the spool at a time
+        """
+        self.name = name
+        self.send = send
+        self.dead_letters = dead_letters
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.redrive_interval = redrive_interval_seconds
+        self.redrive_batch = redrive_batch
+        self.delivered = 0
+        self.retries = 0
+        self.dead_lettered = 0
+        self.redriven = 0
+        self._redrive_task: Optional[asyncio.Task] = None
+        self._redrive_wanted = asyncio.Event()
+
+    def start(self) -> None:
+        if self._redrive_task is None:
+            if self.dead_letters.pending:
+                # Left by a previous run
+                self._redrive_wanted.set()
+            self._redrive_task = asyncio.create_task(self._redrive_loop())
+
+    async def deliver(self, payload: bytes, dead_letter: bool = True) -> bool:
+        """
+        Send the payload, retrying with backoff. False when it could not be delivered.
+
+        Args:
+            payload: Payload to send
+            dead_letter: Keep the payload on disk to send again later when it could not be delivered
+        """
+        for attempt in range(self.retry.attempts):
+            if attempt > 0:
+                self.retries += 1
+                await asyncio.sleep(self.retry.delay(attempt - 1))
+            if not self.breaker.allow():
+                break
+            try:
+                await self.send(payload)
+            except Exception as e:
+                self.breaker.record_failure()
+                print(f"Failed sending to {self.name}, attempt {attempt + 1}: {e}")
+                continue
+            self.breaker.record_success()
+            self.delivered += 1
+            if self.dead_letters.pending:
+                # The destination is back, no need to wait for the next look at the dead letters
+                self._redrive_wanted.set()
+            return True
+
+        if dead_letter:
+            self._dead_letter(payload)
+        return False
+
+    def _dead_letter(self, payload: bytes) -> None:
+        try:
+            self.dead_letters.append(payload)
+            # Dead letters are rare, write each one through so a crash does not lose it
+            self.dead_letters.sync()
+            self.dead_lettered += 1
+        except (OSError, ValueError) as e:
+            print(f"Failed dead-lettering a {len(payload)} byte payload for {self.name}: {e}")
+
+    async def _redrive_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._redrive_wanted.wait(), self.redrive_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._redrive_wanted.clear()
+            await self.redrive()
+
+    async def redrive(self) -> None:
+        """Send the dead letters again, oldest first, until one fails or none is left."""
+        while self.dead_letters.pending and self.breaker.allow():
+            for seq, payload in self.dead_letters.read_from(self.dead_letters.first_unacked, self.redrive_batch):
+                try:
+                    await self.send(bytes(payload))
+                except Exception as e:
+                    self.breaker.record_failure()
+                    print(f"Redriving to {self.name} failed, {self.dead_letters.pending} dead letters left: {e}")
+                    return
+                self.breaker.record_success()
+                self.dead_letters.ack(seq)
+                self.redriven += 1
+                if not self.breaker.allow():
+                    break
+            self.dead_letters.sync()
+
+    def observe(self, registry: MetricsRegistry) -> None:
+        registry.set_counter(f"sidecar_{self.name}_delivered", self.delivered)
+        registry.set_counter(f"sidecar_{self.name}_retries", self.retries)
+        registry.set_counter(f"sidecar_{self.name}_dead_lettered", self.dead_lettered)
+        registry.set_counter(f"sidecar_{self.name}_redriven", self.redriven)
+        registry.set_counter(f"sidecar_{self.name}_dead_letters_dropped", self.dead_letters.dropped)
+        registry.set_gauge(f"sidecar_{self.name}_dead_letters_pending", self.dead_letters.pending)
+        registry.set_counter(f"sidecar_{self.name}_circuit_opened", self.breaker.opened)
+        registry.set_gauge(f"sidecar_{self.name}_circuit_open", 1 if self.breaker.is_open else 0)
+
+    async def close(self) -> None:
+        if self._redrive_task is not None:
+            self._redrive_task.cancel()
+            await asyncio.gather(self._redrive_task, return_exceptions=True)
+            self._redrive_task = None
+        self.dead_letters.sync()
+        self.dead_letters.close()
@@ -1,18 +1,125 @@
 import asyncio
 import json
+import os
+import time
+from typing import Callable, Dict, List, Optional
 
-import aiohttp
 import aiozmq
 import zmq
 
 from analytics.analytics_client import MachineIoTClient
-from core.system_info import get_system_info_string, get_system_info
+from analytics.backend_client import BackendClient
+from analytics.metric import MetricsRegistry
+from core import pipeline_tracer
+from core.bulk_uploader import LOGS_PATH, BulkUploader
+from core.delivery import Destination
+from core.pipeline_tracer import PipelineTracer
+from core.system_info import SystemInfoCache
+from enums import DropPolicy
+from infrastructure.publish_queue import DEFAULT_POLICY, PublishQueue, TypePolicy, metric_type_name
+from infrastructure.shm_ring import ShmRing
+from infrastructure.spool import SPOOL_ACK, SPOOL_HEADER, SegmentSpool
+from infrastructure.wire import decode_message, pack_frames, unpack_frames
+
+# Queues of received envelopes waiting for a worker, in priority order, machine events first.
+# Events are never dropped, the subscriber stops reading when their queue is full.
+DEFAULT_SUBSCRIBER_POLICIES: Dict[str, TypePolicy] = {
+    "export_event": TypePolicy(DropPolicy.NEVER_DROP, 1000),
+    "export_telemetry": TypePolicy(DropPolicy.DROP_OLDEST, 1000),
+    "flush_metrics": TypePolicy(DropPolicy.DROP_OLDEST, 100),
+    "flush_logs": TypePolicy(DropPolicy.DROP_OLDEST, 100),
+    "export_system_info": TypePolicy(DropPolicy.CONFLATE),
+}
 
 
 class SideCarExporter:
-    def __init__(self, analytics_client: MachineIoTClient = MachineIoTClient.produce(), backend_host = "http://10.0.4.62:80"):
+    def __init__(self, analytics_client: MachineIoTClient = MachineIoTClient.produce(), backend_host = "http://10.0.4.62:80",
+                 upload_window_seconds: float = 5, compress_uploads: bool = True, dead_letter_dir: str = "dead-letters"):
         self.analytics_client = analytics_client
         self.backend_host = backend_host
+        self.backend = BackendClient(backend_host)
+        self.compress_uploads = compress_uploads
+        # What fails every retry waits on disk, per destination, until the destination is back
+        self.backend_destination = Destination(
+            "backend", self.send_to_backend, SegmentSpool(os.path.join(dead_letter_dir, "backend")))
+        self.iot_hub_destination = Destination(
+            "iot_hub", self.send_to_iot_hub, SegmentSpool(os.path.join(dead_letter_dir, "iot_hub")))
+        # Metrics and logs go to the backend in one compressed upload per window,
+        # along with the sidecar's own metrics over that window
+        self.uploader = BulkUploader(self.upload, window_seconds=upload_window_seconds,
+                                     collect_metrics=self.collect_own_metrics)
+        self.own_metrics_full = False
+        self.system_info = SystemInfoCache()
+        # System info the backend last received, None until it has received some
+        self.sent_system_info: Optional[dict] = None
+        self.system_info_unchanged = 0
+        # Last metrics sequence number seen per publisher
+        self.metrics_sequences = {}
+        self.tracer = PipelineTracer()
+        # The sidecar's own metrics, sent along with the control loop's
+        self.metrics_registry = MetricsRegistry()
+        # Called with the registry before the sidecar's metrics are taken
+        self.metric_observers: List[Callable[[MetricsRegistry], None]] = []
+
+    def collect_own_metrics(self) -> list:
+        """The sidecar's metrics changed over the upload window, all of them when a publisher sent a full snapshot."""
+        full, self.own_metrics_full = self.own_metrics_full, False
+        return self.take_own_metrics(full)
+
+    def take_own_metrics(self, full: bool) -> list:
+        self.tracer.observe(self.metrics_registry)
+        self.uploader.observe(self.metrics_registry)
+        self.metrics_registry.set_counter("sidecar_upload_sent_bytes", self.backend.sent_bytes)
+        self.backend_destination.observe(self.metrics_registry)
+        self.iot_hub_destination.observe(self.metrics_registry)
+        for observe in self.metric_observers:
+            observe(self.metrics_registry)
+        self.metrics_registry.set_counter("sidecar_system_info_unchanged", self.system_info_unchanged)
+        return self.metrics_registry.take_metrics(full=full)
+
+    def start(self):
+        """Start sending dead letters again, those left by a previous run too."""
+        self.backend_destination.start()
+        self.iot_hub_destination.start()
+
+    async def upload(self, path: str, body: bytes) -> bool:
+        # Log lines carry their timestamps and may arrive late, metrics and system info are
+        # last values that a late copy would turn stale, their callers send them again instead
+        return await self.backend_destination.deliver(pack_frames([path.encode(), body]),
+                                                      dead_letter=path == LOGS_PATH)
+
+    async def send_to_backend(self, record: bytes):
+        path, body = unpack_frames(record)
+        await self.backend.post_json(path.decode(), body, compress=self.compress_uploads)
+
+    async def send_to_iot_hub(self, record: bytes):
+        message = json.loads(record.decode())
+        if message["kind"] == "telemetry":
+            await self.analytics_client.send_telemetry(**message["arguments"])
+        else:
+            await self.analytics_client.send_machine_event(**message["arguments"])
+
+    async def export_to_iot_hub(self, kind: str, **arguments) -> bool:
+        return await self.iot_hub_destination.deliver(json.dumps({"kind": kind, "arguments": arguments}).encode())
+
+    def check_metrics_sequence(self, event) -> None:
+        """
+        Report the metric flushes missed from the event's publisher, deltas lost in between leave stale values.
+
+        The tracer counts them as sidecar_metrics_missed, this only tells whether the metrics recovered.
+        """
+        source, sequence = event.get('source'), event.get('seq')
+        if sequence is None:
+            return
+        last_sequence = self.metrics_sequences.get(source)
+        self.metrics_sequences[source] = sequence
+        if last_sequence is None or sequence <= last_sequence:
+            # First flush seen from this publisher, or it restarted
+            return
+        missed = sequence - last_sequence - 1
+        if missed > 0:
+            recovery = "recovered by this full snapshot" if event.get('full') else "stale until the next full snapshot"
+            print(f"Missed {missed} metric flushes from {source}, metrics {recovery}")
 
     async def process_metric(self, event):
         event_type = event['type']
@@ -26,7 +133,8 @@ class SideCarExporter:
             total_output_unit_count=  data["totaloutputunitcount"]
             machine_speed= data["machinespeed"]
             timestamp = event['timestamp']
-            await self.analytics_client.send_telemetry(
+            await self.export_to_iot_hub(
+                "telemetry",
                 timestamp=timestamp,
                 machine_speed=machine_speed,
                 total_output_unit_count=total_output_unit_count,
@@ -44,7 +152,8 @@ class SideCarExporter:
             machine_speed = data["machinespeed"]
             timestamp = event['timestamp']
             event = event['event']
-            await self.analytics_client.send_machine_event(
+            await self.export_to_iot_hub(
+                "machine_event",
                 timestamp=timestamp,
                 machine_speed=machine_speed,
                 total_output_unit_count=total_output_unit_count,
@@ -53,49 +162,71 @@ class SideCarExporter:
             )
         elif event_type == "export_system_info":
             print("Received export_system_info event")
-            try:
-                info = get_system_info()
-                async with aiohttp.ClientSession() as session:
-                    await session.post(
-                        url=f"{self.backend_host}/api/v1/system/info",
-                        json=info
-                    )
-                    print(f"Sent system info to backend {info}" )
-            except Exception as e:
-                print("Failed sending metrics to backend", e)
+            info = self.system_info.get()
+            if info == self.sent_system_info:
+                self.system_info_unchanged += 1
+                return
+            if await self.upload("/api/v1/system/info", json.dumps(info).encode()):
+                self.sent_system_info = info
+                print(f"Sent system info to backend {info}" )
 
         elif event_type == "flush_metrics":
             print("Received flush_metrics event")
-            try:
-                data = event['data']
-                async with aiohttp.ClientSession() as session:
-                    await session.post(
-                        url=f"{self.backend_host}/api/v1/metrics/send",
-                        json=data
-                    )
-                    print(f"Sent system info to backend {data}" )
-            except Exception as e:
-                print("Failed sending metrics to backend", e)
+            self.check_metrics_sequence(event)
+            self.uploader.add_metrics(event['data'], source=event.get('source'))
+            if event.get('full'):
+                self.own_metrics_full = True
 
         elif event_type == "flush_logs":
             print("Received flush_logs event")
-            try:
-                data = event['data']
-                async with aiohttp.ClientSession() as session:
-                    await session.post(
-                        url=f"{self.backend_host}/api/v1/logs/send",
-                        json=data
-                    )
-                    print(f"Sent system info to backend {data}" )
-            except Exception as e:
-                print("Failed sending metrics to backend", e)
+            self.uploader.add_logs(event['data'])
+
+    async def close(self):
+        """Upload what is pending, then close the backend connections and disconnect from the IoT Hub."""
+        await self.uploader.close()
+        await self.backend_destination.close()
+        await self.iot_hub_destination.close()
+        await self.backend.close()
+        await self.analytics_client.disconnect()
 
 class AsyncSubscriber:
-    def __init__(self, exporter: SideCarExporter, listen_address: str):
+    def __init__(self, exporter: SideCarExporter, listen_address: str, topics: Optional[List[str]] = None,
+                 workers: int = 4, type_policies: Optional[Dict[str, TypePolicy]] = None):
+        """
+        Received envelopes wait in a bounded queue per type for a fixed pool of workers.
+
+        Workers take the highest priority type with envelopes waiting, each type is processed
+        by one worker at a time so its envelopes are exported in the order they arrived.
+        A full queue drops according to its type's policy, except that a full queue that
+        never drops pauses reading until a worker makes room.
+
+        Args:
+            exporter: Exporter processing the events
+            listen_address: ZMQ endpoint the control loop publishes on
+            topics: Streams to receive (telemetry, event, logs, metrics, system_info),
+                None for all of them. ZMQ drops the others before they reach this process,
+                picking topics needs a publisher sending topic frames.
+            workers: Envelopes processed concurrently at most
+            type_policies: Queue policy per envelope type, overriding the defaults
+        """
         self.exporter = exporter
-        self.tasks = set()
         self.listen_address = listen_address
+        self.topics = topics
         self.sub = None
+        self.worker_count = workers
+        self.type_policies = dict(DEFAULT_SUBSCRIBER_POLICIES)
+        if type_policies is not None:
+            self.type_policies.update(type_policies)
+        # In priority order, events first. Items are (event, monotonic arrival time in ns, delivery token).
+        self.queues: Dict[str, PublishQueue] = {
+            event_type: PublishQueue(policy) for event_type, policy in self.type_policies.items()
+        }
+        # Types a worker is processing an envelope of
+        self.busy = set()
+        self.workers: List[asyncio.Task] = []
+        self.work_ready = asyncio.Event()
+        self.room = asyncio.Event()
+        exporter.metric_observers.append(self.observe_queues)
 
     async def connect(self):
         self.sub = await aiozmq.create_zmq_stream(
@@ -103,35 +234,294 @@ class AsyncSubscriber:
             connect=self.listen_address,
             loop=asyncio.get_event_loop()
         )
-        self.sub.transport.subscribe(b'')
+        if self.topics is None:
+            self.sub.transport.subscribe(b'')
+        else:
+            for topic in self.topics:
+                self.sub.transport.subscribe(topic.encode())
         print("Subscriber connected and ready")
 
-    async def process_message(self, message):
+    async def process_message(self, event, received: int):
+        tracer = self.exporter.tracer
+        started = time.monotonic_ns()
+        tracer.record(pipeline_tracer.QUEUE, started - received)
         try:
-            event = json.loads(message.decode())
             print(f"Received event {event}")
             await self.exporter.process_metric(event)
         except Exception as e:
             print(f"Error processing message: {e}")
+        finished = time.monotonic_ns()
+        tracer.record(pipeline_tracer.EXPORT, finished - started)
+        tracer.record_since_sent(pipeline_tracer.TOTAL, event, finished)
+
+    def enqueue(self, event, received: int, token=None):
+        queue = self.queues.get(event.get('type'))
+        if queue is None:
+            queue = self.queues[event.get('type')] = PublishQueue(DEFAULT_POLICY)
+        queue.put((event, received, token))
+        self.work_ready.set()
+
+    def exported(self, token):
+        """Called once the envelope enqueued with token has been exported, or handed to the dead letters."""
+        pass
+
+    def next_type(self) -> Optional[str]:
+        for event_type, queue in self.queues.items():
+            if queue and event_type not in self.busy:
+                return event_type
+        return None
+
+    async def work(self):
+        while True:
+            event_type = self.next_type()
+            if event_type is None:
+                self.work_ready.clear()
+                await self.work_ready.wait()
+                continue
+            self.busy.add(event_type)
+            try:
+                event, received, token = self.queues[event_type].pop()
+                self.room.set()
+                await self.process_message(event, received)
+                if token is not None:
+                    self.exported(token)
+            finally:
+                self.busy.discard(event_type)
+                # More of this type may be waiting for a worker
+                self.work_ready.set()
+                self.room.set()
+
+    def start_workers(self):
+        self.exporter.start()
+        self.workers = [asyncio.create_task(self.work()) for _ in range(self.worker_count)]
+
+    def is_full(self) -> bool:
+        """Whether a queue that never drops is full, reading on would grow it past its bound."""
+        return any(queue.full for queue in self.queues.values())
 
-    def create_task(self, message):
-        task = asyncio.create_task(self.process_message(message))
-        self.tasks.add(task)
-        task.add_done_callback(self.tasks.discard)
+    async def wait_for_room(self):
+        while self.is_full():
+            self.room.clear()
+            await self.room.wait()
+
+    async def stop_workers(self):
+        """Let the workers process what is queued, then stop them."""
+        while self.workers and (any(self.queues.values()) or self.busy):
+            self.room.clear()
+            await self.room.wait()
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def observe_queues(self, registry: MetricsRegistry):
+        """Export the depth, processed and overflow counts per envelope type."""
+        for event_type, queue in self.queues.items():
+            name = metric_type_name(event_type)
+            registry.set_gauge(f"subscriber_{name}_queued", len(queue))
+            registry.set_counter(f"subscriber_{name}_processed", queue.sent)
+            registry.set_counter(f"subscriber_{name}_dropped", queue.dropped)
+
+    def dispatch(self, frames, token=None) -> int:
+        """
+        Decode a received message, single event or batch, and queue each of its events.
+        Returns the number of events queued, each calls exported(token) once processed.
+        """
+        tracer = self.exporter.tracer
+        received = time.monotonic_ns()
+        try:
+            events = decode_message(frames)
+        except Exception as e:
+            print(f"Error decoding message: {e}")
+            return 0
+        decoded = time.monotonic_ns()
+        tracer.record(pipeline_tracer.DECODE, decoded - received)
+        for event in events:
+            tracer.record_since_sent(pipeline_tracer.TRANSIT, event, received)
+            tracer.check_sequence(event)
+            self.enqueue(event, decoded, token)
+        return len(events)
+
+    def receive(self, message):
+        self.dispatch(message)
 
     async def run(self):
         await self.connect()
+        self.start_workers()
         try:
             while True:
+                await self.wait_for_room()
                 message = await self.sub.read()
                 if message:
-                    self.create_task(message[0])
+                    self.receive(message)
         except asyncio.CancelledError:
             print("Subscriber shutdown initiated")
         finally:
+            # The workers finish first, the spool subscriber acknowledges on the socket as they export
+            await self.stop_workers()
             self.sub.close()
-            if self.tasks:
-                await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
+class SpoolSubscriber(AsyncSubscriber):
+    def __init__(self, exporter: SideCarExporter, listen_address: str, **kwargs):
+        """
+        Subscriber for SpoolingAsyncPublishers, on a ROUTER socket.
+
+        Spooled messages are queued in sequence order, once each: replays of messages
+        already received are skipped, messages past a gap are left for the publisher to
+        resend once it goes back to the gap.
+
+        A message is acknowledged only once it has been exported, up to the oldest one still
+        queued or being exported, so whatever the sidecar holds when it stops is resent.
+        Spooled telemetry and events must never be dropped from the queues for the
+        acknowledgements to move on, the publisher's spool holds them while the subscriber
+        stops reading.
+        """
+        policies = {"export_telemetry": TypePolicy(DropPolicy.NEVER_DROP, 1000)}
+        policies.update(kwargs.pop("type_policies", None) or {})
+        super().__init__(exporter, listen_address, type_policies=policies, **kwargs)
+        # Last sequence number received per spool id
+        self.delivered = {}
+        # Last sequence number acknowledged per spool id, every one up to it is exported,
+        # and those exported past it while an older one is still on its way
+        self.acknowledged = {}
+        self.exported_ahead = {}
+        self.duplicates = 0
+        self.lost = 0
+        self.malformed = 0
+
+    async def connect(self):
+        self.sub = await aiozmq.create_zmq_stream(
+            zmq.ROUTER,
+            bind=self.listen_address,
+            loop=asyncio.get_event_loop()
+        )
+        print("Spool subscriber bound and ready")
+
+    def receive(self, message):
+        if len(message) < 3 or len(message[1]) != SPOOL_HEADER.size:
+            # Not from a spooling publisher, nothing to acknowledge either
+            self.malformed += 1
+            print(f"Skipped a malformed spooled message of {len(message)} frames")
+            return
+        identity, header, frames = message[0], message[1], message[2:]
+        spool_id, seq, first_seq = SPOOL_HEADER.unpack(header)
+        if seq == 0:
+            self.dispatch(frames)
+            return
+
+        last_seq = self.delivered.get(spool_id)
+        if last_seq is None:
+            # First message from this spool since we started, what it no longer holds was delivered before
+            last_seq = first_seq - 1
+        elif first_seq > last_seq + 1:
+            # Dropped from the publisher's full spool before they were delivered
+            self.lost += first_seq - last_seq - 1
+            print(f"Lost {first_seq - last_seq - 1} spooled messages")
+            last_seq = first_seq - 1
+        # The publisher no longer holds anything before first_seq, there is nothing older to wait for
+        self.advance_acknowledged(spool_id, first_seq - 1)
+
+        if seq == last_seq + 1:
+            last_seq = seq
+            self.delivered[spool_id] = last_seq
+            if self.dispatch(frames, token=(identity, spool_id, seq)) == 0:
+                # Not decodable, exporting it again would not help
+                self.exported((identity, spool_id, seq))
+                return
+        elif seq <= last_seq:
+            self.duplicates += 1
+
+        self.delivered[spool_id] = last_seq
+        self.sub.write([identity, SPOOL_ACK.pack(spool_id, self.acknowledged[spool_id])])
+
+    def observe_queues(self, registry: MetricsRegistry):
+        super().observe_queues(registry)
+        registry.set_counter("subscriber_spool_duplicates", self.duplicates)
+        registry.set_counter("subscriber_spool_lost", self.lost)
+        registry.set_counter("subscriber_spool_malformed", self.malformed)
+
+    def advance_acknowledged(self, spool_id: bytes, seq: int):
+        if spool_id not in self.acknowledged or seq > self.acknowledged[spool_id]:
+            self.acknowledged[spool_id] = seq
+            ahead = self.exported_ahead.get(spool_id)
+            if ahead:
+                self.exported_ahead[spool_id] = {exported for exported in ahead if exported > seq}
+
+    def exported(self, token):
+        identity, spool_id, seq = token
+        acknowledged = self.acknowledged.get(spool_id, 0)
+        if seq <= acknowledged:
+            return
+        ahead = self.exported_ahead.setdefault(spool_id, set())
+        ahead.add(seq)
+        # Messages of different types are exported by different workers, acknowledge only past the oldest one left
+        while acknowledged + 1 in ahead:
+            acknowledged += 1
+            ahead.remove(acknowledged)
+        self.acknowledged[spool_id] = acknowledged
+        self.sub.write([identity, SPOOL_ACK.pack(spool_id, acknowledged)])
+
+
+class SharedMemorySubscriber(AsyncSubscriber):
+    def __init__(self, exporter: SideCarExporter, ring_name: str = "bober-ring", poll_seconds: float = 1, **kwargs):
+        """
+        Subscriber reading a SharedMemoryPublisher's ring.
+
+        Args:
+            exporter: Exporter processing the events
+            ring_name: Name of the shared memory ring
+            poll_seconds: Longest sleep between two looks at the ring, in case a wake-up is lost
+            **kwargs: Passed on to AsyncSubscriber
+        """
+        super().__init__(exporter, listen_address=f"shm://{ring_name}", **kwargs)
+        self.ring_name = ring_name
+        self.poll_seconds = poll_seconds
+        self.ring = None
+        self.readable = asyncio.Event()
+
+    async def connect(self):
+        while self.ring is None:
+            try:
+                self.ring = ShmRing(self.ring_name, create=False)
+            except FileNotFoundError:
+                # The control loop creates the ring when it starts
+                await asyncio.sleep(self.poll_seconds)
+        notify_fd = self.ring.open_notifications()
+        asyncio.get_event_loop().add_reader(notify_fd, self.on_notification)
+        print("Shared memory subscriber attached and ready")
+
+    def on_notification(self):
+        self.ring.clear_notifications()
+        self.readable.set()
+
+    async def run(self):
+        await self.connect()
+        self.start_workers()
+        try:
+            while True:
+                # Messages left on the ring wait there, the publisher's queues take the pressure
+                await self.wait_for_room()
+                messages = self.ring.read_all()
+                for message in messages:
+                    self.receive(unpack_frames(message))
+                if messages:
+                    # Let the workers run before reading on
+                    await asyncio.sleep(0)
+                elif self.ring.prepare_wait():
+                    self.readable.clear()
+                    try:
+                        await asyncio.wait_for(self.readable.wait(), self.poll_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+        except asyncio.CancelledError:
+            print("Subscriber shutdown initiated")
+        finally:
+            if self.ring is not None:
+                if self.ring.notify_fd is not None:
+                    asyncio.get_event_loop().remove_reader(self.ring.notify_fd)
+                self.ring.close()
+            await self.stop_workers()
 
 
 async def main():
@@ -141,6 +531,8 @@ async def main():
         await subscriber.run()
     except KeyboardInterrupt:
         print("Shutting down...")
+    finally:
+        await metrics_collector.close()
 
 
 if __name__ == "__main__":
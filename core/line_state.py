@@ -0,0 +1,116 @@
+# src/core/line_state.py
+import math
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import List, NamedTuple, Optional
+
+
+class LineState(NamedTuple):
+    box_count: int
+    speed: float
+    is_on: bool
+    ticks: int
+    updated_at: float
+
+
+# seq, box_count, speed, is_on, ticks, updated_at (monotonic seconds)
+_SLOT = struct.Struct("<QqdQQd")
+_SEQ = struct.Struct("<Q")
+
+
+class LineStateTable:
+    def __init__(self, line_count: int, name: Optional[str] = None, create: bool = True, read_attempts: int = 1000):
+        """
+        Fixed-size table of line states in shared memory, one slot per line.
+
+        Every slot has a single writer (the process running that line). Writers
+        bump a sequence number to odd before and to even after writing the slot
+        so readers in other processes can detect and retry torn reads without
+        any locking or IPC round trip.
+
+        A writer that died halfway through a write leaves its slot odd for good, so a
+        read gives up after read_attempts torn reads and returns the last state it read
+        from that slot, whose updated_at tells how old it is.
+
+        Args:
+            line_count: Number of slots in the table
+            name: Name of the shared memory block, required when attaching
+            create: Create the block, or attach to an existing one by name
+            read_attempts: Torn reads of a slot after which a read returns the last state read
+        """
+        self.line_count = line_count
+        self.read_attempts = read_attempts
+        # Last consistent state read per slot, returned when a slot stays torn
+        self._last_read: List[Optional[LineState]] = [None] * line_count
+        self.stale_reads = 0
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=line_count * _SLOT.size)
+        self.buffer = self.shm.buf
+        self.owner = create
+        if create:
+            self.buffer[:line_count * _SLOT.size] = bytes(line_count * _SLOT.size)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def write(self, index: int, box_count: int, speed: Optional[float], is_on: bool, ticks: int) -> None:
+        offset = index * _SLOT.size
+        seq = _SEQ.unpack_from(self.buffer, offset)[0]
+        _SEQ.pack_into(self.buffer, offset, seq + 1)
+        _SLOT.pack_into(
+            self.buffer, offset,
+            seq + 1,
+            box_count,
+            float(speed) if speed is not None else math.nan,
+            int(is_on),
+            ticks,
+            time.monotonic()
+        )
+        _SEQ.pack_into(self.buffer, offset, seq + 2)
+
+    def read(self, index: int) -> LineState:
+        """
+        Read a slot, retrying torn reads.
+
+        Raises:
+            TimeoutError: The slot stayed torn for read_attempts reads and was never read before
+        """
+        offset = index * _SLOT.size
+        for _ in range(self.read_attempts):
+            seq, box_count, speed, is_on, ticks, updated_at = _SLOT.unpack_from(self.buffer, offset)
+            if seq % 2 == 0 and _SEQ.unpack_from(self.buffer, offset)[0] == seq:
+                state = LineState(box_count, speed, bool(is_on), ticks, updated_at)
+                self._last_read[index] = state
+                return state
+        last_read = self._last_read[index]
+        if last_read is None:
+            raise TimeoutError(f"Line state slot {index} stayed torn for {self.read_attempts} reads")
+        self.stale_reads += 1
+        return last_read
+
+    def read_all(self) -> List[LineState]:
+        return [self.read(index) for index in range(self.line_count)]
+
+    def close(self) -> None:
+        self.buffer = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class LineStateMirror:
+    """Tick listener copying a control loop's state into its LineStateTable slot."""
+
+    def __init__(self, table: LineStateTable, index: int):
+        self.table = table
+        self.index = index
+
+    def __call__(self, control_loop) -> None:
+        self.table.write(
+            self.index,
+            box_count=control_loop.box_count,
+            speed=control_loop.motor.get_speed(),
+            is_on=control_loop.is_on,
+            ticks=control_loop.scheduler.stats.ticks
+        )
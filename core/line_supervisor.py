@@ -0,0 +1,101 @@
+# src/core/line_supervisor.py
+import asyncio
+from typing import Dict, List
+
+from analytics.metric import MetricsRegistry
+from core.control_loop import ControlLoop
+from core.tick_scheduler import TickScheduler
+from implementations.line_observability_controller import LineObservabilityController
+from implementations.queued_observability_controller import QueuedObservabilityController
+from infrastructure.async_publisher import AsyncPublisher
+from infrastructure.boblogger import BobLogger
+from infrastructure.config_loader import ConfigLoader
+from interfaces.motor_interface import IMotorController
+from interfaces.sensor_interface import ISensorController
+
+
+class LineSupervisor:
+    def __init__(self,
+                 publisher: AsyncPublisher,
+                 logger: BobLogger,
+                 metrics_registry: MetricsRegistry = None,
+                 flush_millis: float = 100):
+        """
+        Host several conveyor lines, each with its own ControlLoop, on one event loop.
+
+        All lines share the publisher, logger and metrics registry. Logs and metrics
+        are flushed once per flush period for all lines together.
+
+        Args:
+            publisher: Publisher shared by all lines
+            logger: Logger shared by all lines
+            metrics_registry: Registry shared by all lines
+            flush_millis: Period of the shared logs and metrics flush
+        """
+        self.logger = logger
+        self.observability = QueuedObservabilityController(
+            publisher=publisher,
+            logger=logger,
+            metrics_registry=metrics_registry
+        )
+        self.flush_scheduler = TickScheduler(period_millis=flush_millis)
+        self.lines: Dict[str, ControlLoop] = {}
+        self.is_running = False
+
+    def add_line(self,
+                 line_id: str,
+                 motor: IMotorController,
+                 sensor: ISensorController,
+                 config_loader: ConfigLoader,
+                 delay_millis: float = 100) -> ControlLoop:
+        if line_id in self.lines:
+            raise ValueError(f"Line {line_id} is already registered")
+
+        control_loop = ControlLoop(
+            motor=motor,
+            sensor=sensor,
+            observability=LineObservabilityController(line_id, self.observability),
+            config_loader=config_loader,
+            logger=self.logger,
+            delay_millis=delay_millis
+        )
+        self.lines[line_id] = control_loop
+        return control_loop
+
+    async def _flush_periodically(self) -> None:
+        self.flush_scheduler.start()
+        while self.is_running:
+            try:
+                await self.observability.flush()
+            except Exception as e:
+                self.logger.error("Error flushing observability", exc=e)
+            await self.flush_scheduler.wait_for_next_tick()
+
+    async def _run_line(self, line_id: str, control_loop: ControlLoop) -> None:
+        self.logger.info("Starting line %s", line_id)
+        await control_loop.run()
+        self.logger.info("Line %s stopped", line_id)
+
+    async def run(self) -> None:
+        self.is_running = True
+        flush_task = asyncio.create_task(self._flush_periodically())
+        try:
+            # A failing line stops itself, the others keep running
+            await asyncio.gather(*[
+                self._run_line(line_id, control_loop)
+                for line_id, control_loop in self.lines.items()
+            ])
+        finally:
+            self.is_running = False
+            await flush_task
+            await self.observability.flush()
+
+    async def stop(self) -> None:
+        await asyncio.gather(*[
+            control_loop.stop()
+            for control_loop in self.lines.values()
+            if control_loop.is_running
+        ])
+
+    def get_line_ids(self) -> List[str]:
+        return list(self.lines.keys())
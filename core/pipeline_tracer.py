@@ -0,0 +1,88 @@
+from typing import Dict, Optional, Tuple
+
+from analytics.histogram import FixedBucketHistogram
+from analytics.metric import MetricsRegistry
+from infrastructure.publish_queue import metric_type_name
+from infrastructure.wire import TRACE
+
+# Stages of an envelope's trip from the publisher to the backend, in order. TOTAL covers the whole trip.
+TRANSIT = 0
+DECODE = 1
+QUEUE = 2
+EXPORT = 3
+TOTAL = 4
+
+STAGE_NAMES = (
+    "transit",
+    "decode",
+    "queue",
+    "export",
+    "total",
+)
+
+
+class PipelineTracer:
+    def __init__(self):
+        """
+        Latency per stage and loss of the envelopes a sidecar receives, from their trace.
+
+        transit runs from the publish call to the message's arrival, so it includes the
+        publisher's queues, batching and the socket. decode is per received message, queue
+        is the wait from arrival until processing starts, export the IoT Hub send. Metrics and
+        logs only join the bulk upload window during export, their HTTP upload is measured
+        by the BulkUploader.
+        Stages measured against the publisher's send time need it on the same machine.
+
+        Gaps and duplicates are counted per envelope type from the sequence numbers, an
+        envelope dropped by the publisher's queue policy shows up as a gap too.
+        """
+        self.histograms = [FixedBucketHistogram() for _ in STAGE_NAMES]
+        # Last sequence number received per publisher and envelope type
+        self.sequences: Dict[Tuple[str, str], int] = {}
+        self.gaps: Dict[str, int] = {}
+        self.duplicates: Dict[str, int] = {}
+
+    def record(self, stage: int, nanoseconds: int) -> None:
+        self.histograms[stage].record(nanoseconds / 1e9)
+
+    def record_since_sent(self, stage: int, event: dict, now: int) -> None:
+        """Record the time from the envelope's publish call until now, when it carries a trace."""
+        sent = self.sent_at(event)
+        if sent is not None and now >= sent:
+            self.record(stage, now - sent)
+
+    @staticmethod
+    def sent_at(event: dict) -> Optional[int]:
+        trace = event.get(TRACE)
+        return trace.get("sent") if trace else None
+
+    def check_sequence(self, event: dict) -> None:
+        """Count the envelopes missed or received again from the event's publisher, call in arrival order."""
+        trace = event.get(TRACE)
+        if not trace:
+            return
+        event_type = event["type"]
+        key = (trace["source"], event_type)
+        sequence = trace["seq"]
+        last_sequence = self.sequences.get(key)
+        if last_sequence is not None and sequence <= last_sequence:
+            self.duplicates[event_type] = self.duplicates.get(event_type, 0) + 1
+            return
+        if last_sequence is not None and sequence > last_sequence + 1:
+            self.gaps[event_type] = self.gaps.get(event_type, 0) + sequence - last_sequence - 1
+        self.sequences[key] = sequence
+
+    def observe(self, registry: MetricsRegistry) -> None:
+        """Export the percentiles since the previous call and the loss counters, then start new histograms."""
+        for name, histogram in zip(STAGE_NAMES, self.histograms):
+            registry.set_gauge(f"sidecar_latency_{name}_count", histogram.count)
+            if histogram.count:
+                registry.set_gauge(f"sidecar_latency_{name}_p50_ms", histogram.percentile(50) * 1000)
+                registry.set_gauge(f"sidecar_latency_{name}_p99_ms", histogram.percentile(99) * 1000)
+                registry.set_gauge(f"sidecar_latency_{name}_max_ms", histogram.max * 1000)
+            histogram.reset()
+        for event_type, gaps in self.gaps.items():
+            registry.set_counter(f"sidecar_{metric_type_name(event_type)}_missed", gaps)
+        for event_type, duplicates in self.duplicates.items():
+            registry.set_counter(f"sidecar_{metric_type_name(event_type)}_duplicates", duplicates)
+
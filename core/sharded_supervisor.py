@@ -0,0 +1,218 @@
+# src/core/sharded_supervisor.py
+import asyncio
+import multiprocessing
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import zmq
+
+from analytics.metric import MetricsRegistry
+from core.line_state import LineState, LineStateMirror, LineStateTable
+from core.line_supervisor import LineSupervisor
+from infrastructure.async_publisher import AsyncPublisher
+from infrastructure.boblogger import BobLogger
+from infrastructure.config_loader import ConfigLoader
+from interfaces.motor_interface import IMotorController
+from interfaces.sensor_interface import ISensorController
+
+# Builds the motor and sensor of a line in the worker process. Must be picklable,
+# i.e. a module level function.
+LineFactory = Callable[[str, ConfigLoader], Tuple[IMotorController, ISensorController]]
+
+
+async def _run_shard_async(shard: List[Tuple[int, str]],
+                           table_name: str,
+                           line_count: int,
+                           line_factory: LineFactory,
+                           config_path: str,
+                           proxy_address: str,
+                           delay_millis: float,
+                           stop_event) -> None:
+    table = LineStateTable(line_count, name=table_name, create=False)
+    publisher = AsyncPublisher(publish_address=proxy_address, bind=False)
+    await publisher.connect()
+
+    supervisor = LineSupervisor(
+        publisher=publisher,
+        logger=BobLogger(),
+        metrics_registry=MetricsRegistry()
+    )
+    for index, line_id in shard:
+        config_loader = ConfigLoader(config_path=config_path, section=line_id)
+        motor, sensor = line_factory(line_id, config_loader)
+        control_loop = supervisor.add_line(
+            line_id=line_id,
+            motor=motor,
+            sensor=sensor,
+            config_loader=config_loader,
+            delay_millis=float(config_loader.get_value("delay_millis", delay_millis))
+        )
+        control_loop.add_tick_listener(LineStateMirror(table, index))
+
+    async def wait_for_stop():
+        while not stop_event.is_set():
+            await asyncio.sleep(0.1)
+        await supervisor.stop()
+
+    stop_task = asyncio.create_task(wait_for_stop())
+    try:
+        await supervisor.run()
+    finally:
+        stop_task.cancel()
+        publisher.pub.close()
+        table.close()
+
+
+def run_shard(shard: List[Tuple[int, str]],
+              table_name: str,
+              line_count: int,
+              line_factory: LineFactory,
+              config_path: str,
+              proxy_address: str,
+              delay_millis: float,
+              stop_event,
+              initializer: Optional[Callable[[], None]] = None) -> None:
+    """Worker process entry point running a subset of the lines on its own event loop."""
+    if initializer is not None:
+        initializer()
+    asyncio.run(_run_shard_async(
+        shard, table_name, line_count, line_factory, config_path, proxy_address, delay_millis, stop_event
+    ))
+
+
+class ShardedLineSupervisor:
+    def __init__(self,
+                 line_ids: List[str],
+                 line_factory: LineFactory,
+                 config_path: str,
+                 publish_address: str,
+                 proxy_address: str = "ipc:///tmp/bober-shard-proxy",
+                 workers: Optional[int] = None,
+                 delay_millis: float = 100,
+                 initializer: Optional[Callable[[], None]] = None):
+        """
+        Spread the lines over a pool of worker processes, one per core by default.
+
+        Each worker hosts its share of the lines in a LineSupervisor. Line state is
+        mirrored into a LineStateTable in shared memory, so the coordinator reads
+        every line without talking to the workers. Workers publish to a local
+        XSUB/XPUB forwarder bound to publish_address, so subscribers still connect
+        to a single endpoint.
+
+        Args:
+            line_ids: Ids of the lines to run, each with a section in the config file
+            line_factory: Module level function building the motor and sensor of a line
+            config_path: Path to the shared config file
+            publish_address: Endpoint subscribers connect to
+            proxy_address: Endpoint the workers publish to
+            workers: Number of worker processes, defaults to the number of cores
+            delay_millis: Tick period of lines without their own delay_millis
+            initializer: Module level function called at the start of every worker
+        """
+        self.line_ids = list(line_ids)
+        self.line_factory = line_factory
+        self.config_path = config_path
+        self.publish_address = publish_address
+        self.proxy_address = proxy_address
+        self.workers = min(workers or os.cpu_count() or 1, len(self.line_ids)) or 1
+        self.delay_millis = delay_millis
+        self.initializer = initializer
+
+        # Fork would copy the parent's event loop and ZMQ context into the workers
+        self.mp_context = multiprocessing.get_context("spawn")
+        self.stop_event = self.mp_context.Event()
+        self.processes: List[multiprocessing.Process] = []
+        self.table: Optional[LineStateTable] = None
+        self.zmq_context: Optional[zmq.Context] = None
+        self.proxy_thread: Optional[threading.Thread] = None
+
+    def shards(self) -> List[List[Tuple[int, str]]]:
+        """Assign the lines round-robin to the workers, keeping their table index."""
+        shards = [[] for _ in range(self.workers)]
+        for index, line_id in enumerate(self.line_ids):
+            shards[index % self.workers].append((index, line_id))
+        return shards
+
+    def _bind_proxy(self) -> Tuple[zmq.Socket, zmq.Socket]:
+        frontend = self.zmq_context.socket(zmq.XSUB)
+        backend = self.zmq_context.socket(zmq.XPUB)
+        try:
+            frontend.bind(self.proxy_address)
+            backend.bind(self.publish_address)
+        except zmq.ZMQError:
+            frontend.close(linger=0)
+            backend.close(linger=0)
+            raise
+        return frontend, backend
+
+    def _run_proxy(self, frontend: zmq.Socket, backend: zmq.Socket) -> None:
+        # The sockets belong to this thread from here on
+        try:
+            zmq.proxy(frontend, backend)
+        except zmq.ContextTerminated:
+            pass
+        finally:
+            frontend.close(linger=0)
+            backend.close(linger=0)
+
+    def start(self) -> None:
+        """
+        Bind the forwarder and start the workers.
+
+        Raises:
+            zmq.ZMQError: The forwarder could not bind its endpoints, e.g. one is in use
+        """
+        self.zmq_context = zmq.Context()
+        try:
+            # Bound here rather than in the proxy thread, so workers never publish into a forwarder that failed
+            sockets = self._bind_proxy()
+        except zmq.ZMQError:
+            self.zmq_context.term()
+            self.zmq_context = None
+            raise
+        self.table = LineStateTable(len(self.line_ids))
+        self.proxy_thread = threading.Thread(target=self._run_proxy, args=sockets, name="shard-proxy", daemon=True)
+        self.proxy_thread.start()
+
+        for shard in self.shards():
+            process = self.mp_context.Process(
+                target=run_shard,
+                args=(shard, self.table.name, len(self.line_ids), self.line_factory, self.config_path,
+                      self.proxy_address, self.delay_millis, self.stop_event, self.initializer),
+                daemon=True
+            )
+            process.start()
+            self.processes.append(process)
+        print(f"Started {len(self.line_ids)} lines on {len(self.processes)} worker processes")
+
+    def read_states(self) -> Dict[str, LineState]:
+        return {line_id: self.table.read(index) for index, line_id in enumerate(self.line_ids)}
+
+    def stop(self, timeout: float = 5) -> None:
+        self.stop_event.set()
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self.processes.clear()
+
+        if self.zmq_context is not None:
+            self.zmq_context.term()
+            self.proxy_thread.join()
+            self.zmq_context = None
+        if self.table is not None:
+            self.table.close()
+            self.table = None
+
+    async def run(self, report_interval: float = 10) -> None:
+        """Start the workers and periodically print the state of every line."""
+        self.start()
+        try:
+            while all(process.is_alive() for process in self.processes):
+                await asyncio.sleep(report_interval)
+                for line_id, state in self.read_states().items():
+                    print(f"Line {line_id}: box_count={state.box_count} speed={state.speed} "
+                          f"is_on={state.is_on} ticks={state.ticks}")
+        finally:
+            self.stop()
@@ -1,14 +1,18 @@
+import functools
 import platform
+import time
+from typing import Callable, Optional
+
 import psutil
 import os
 
 
-def get_system_info():
+@functools.lru_cache(maxsize=None)
+def get_static_system_info():
     """
-    Get detailed system information from Raspberry Pi
-    Returns a dictionary containing system information
+    System information that does not change while the process runs, gathered on the first call
     """
-    system_info = {
+    return {
         # Python Version
         'pythonVersion': platform.python_version(),
         # OS Information
@@ -19,15 +23,59 @@ def get_system_info():
         # CPU Information
         'cpuCountPhysical': psutil.cpu_count(logical=False),
         'cpuCountLogical': psutil.cpu_count(logical=True),
-        'cpuFreqCurrent': psutil.cpu_freq().current if hasattr(psutil.cpu_freq(), 'current') else 'N/A',
         # Memory Information
         'totalRam': round(psutil.virtual_memory().total / (1024 ** 3), 2),  # GB
         # Disk Information
         'diskTotal': round(psutil.disk_usage('/').total / (1024 ** 3), 2),  # GB
     }
+
+
+def get_dynamic_system_info():
+    """
+    System information that changes over time, read anew on every call
+    """
+    cpu_freq = psutil.cpu_freq()
+    return {
+        'cpuFreqCurrent': cpu_freq.current if hasattr(cpu_freq, 'current') else 'N/A',
+    }
+
+
+def get_system_info():
+    """
+    Get detailed system information from Raspberry Pi
+    Returns a dictionary containing system information
+    """
+    system_info = dict(get_static_system_info())
+    system_info.update(get_dynamic_system_info())
     return system_info
 
 
+class SystemInfoCache:
+    def __init__(self, ttl_seconds: float = 300, clock: Callable[[], float] = time.monotonic):
+        """
+        System information with the dynamic fields read at most once per ttl_seconds.
+
+        Args:
+            ttl_seconds: How long the dynamic fields are reused before they are read again
+            clock: Clock timing the cached fields
+        """
+        self.ttl = ttl_seconds
+        self.clock = clock
+        self._dynamic: Optional[dict] = None
+        self._read_at = 0.0
+        # Gathered now rather than when the first event comes in
+        get_static_system_info()
+
+    def get(self) -> dict:
+        now = self.clock()
+        if self._dynamic is None or now - self._read_at >= self.ttl:
+            self._dynamic = get_dynamic_system_info()
+            self._read_at = now
+        system_info = dict(get_static_system_info())
+        system_info.update(self._dynamic)
+        return system_info
+
+
 def get_system_info_string():
     """
     Returns formatted system information as a string
@@ -0,0 +1,92 @@
+# src/core/tick_profiler.py
+import time
+from typing import Callable, Dict, Optional
+
+from analytics.histogram import FixedBucketHistogram
+
+# Phases of a ControlLoop tick, in execution order. TICK covers the whole tick.
+RELOAD_CONFIG = 0
+POWER_SWITCH = 1
+MANAGE_SPEED = 2
+SENSOR = 3
+TELEMETRY = 4
+LISTENERS = 5
+FLUSH = 6
+TICK = 7
+
+PHASE_NAMES = (
+    "reload_config",
+    "power_switch",
+    "manage_speed",
+    "sensor",
+    "telemetry",
+    "listeners",
+    "flush",
+    "tick",
+)
+
+
+class TickProfiler:
+    def __init__(self,
+                 export_interval_seconds: float = 1,
+                 report_interval_seconds: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Per-phase duration histograms for the control loop tick.
+
+        Recording a phase is a bisect and a few integer updates on preallocated
+        histograms. Percentiles are only computed when exporting.
+
+        Args:
+            export_interval_seconds: How often the percentiles are pushed to the metrics
+            report_interval_seconds: If set, how often a report is logged and the histograms reset
+            clock: Clock deciding when exports and reports are due
+        """
+        self.histograms = [FixedBucketHistogram() for _ in PHASE_NAMES]
+        self.export_interval = export_interval_seconds
+        self.report_interval = report_interval_seconds
+        self.clock = clock
+        self._last_export = clock()
+        self._last_report = self._last_export
+
+    def record(self, phase: int, seconds: float) -> None:
+        self.histograms[phase].record(seconds)
+
+    def summary(self) -> Dict[str, dict]:
+        return {
+            name: {
+                "count": histogram.count,
+                "p50": histogram.percentile(50),
+                "p99": histogram.percentile(99),
+                "max": histogram.max,
+            }
+            for name, histogram in zip(PHASE_NAMES, self.histograms)
+        }
+
+    def export_due(self) -> bool:
+        now = self.clock()
+        if now - self._last_export >= self.export_interval:
+            self._last_export = now
+            return True
+        return False
+
+    def report_due(self) -> bool:
+        if self.report_interval is None:
+            return False
+        now = self.clock()
+        if now - self._last_report >= self.report_interval:
+            self._last_report = now
+            return True
+        return False
+
+    def format_report(self) -> str:
+        lines = [f"Tick profile over the last {self.report_interval}s (ms):",
+                 f"{'phase':<14} {'count':>8} {'p50':>9} {'p99':>9} {'max':>9}"]
+        for name, phase in self.summary().items():
+            lines.append(f"{name:<14} {phase['count']:>8} {phase['p50'] * 1000:>9.3f} "
+                         f"{phase['p99'] * 1000:>9.3f} {phase['max'] * 1000:>9.3f}")
+        return "\n".join(lines)
+
+    def reset(self) -> None:
+        for histogram in self.histograms:
+            histogram.reset()
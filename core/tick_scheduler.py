@@ -0,0 +1,109 @@
+# src/core/tick_scheduler.py
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from enums import OverrunPolicy
+
+
+@dataclass
+class TickStats:
+    ticks: int = 0
+    overruns: int = 0
+    skipped_ticks: int = 0
+    last_jitter: float = 0.0
+    max_jitter: float = 0.0
+    total_jitter: float = 0.0
+    last_tick_duration: float = 0.0
+    max_tick_duration: float = 0.0
+    total_tick_duration: float = 0.0
+
+    @property
+    def mean_jitter(self) -> float:
+        return self.total_jitter / self.ticks if self.ticks else 0.0
+
+    @property
+    def mean_tick_duration(self) -> float:
+        return self.total_tick_duration / self.ticks if self.ticks else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "skipped_ticks": self.skipped_ticks,
+            "last_jitter": self.last_jitter,
+            "max_jitter": self.max_jitter,
+            "mean_jitter": self.mean_jitter,
+            "last_tick_duration": self.last_tick_duration,
+            "max_tick_duration": self.max_tick_duration,
+            "mean_tick_duration": self.mean_tick_duration,
+        }
+
+
+class TickScheduler:
+    def __init__(self,
+                 period_millis: float,
+                 overrun_policy: OverrunPolicy = OverrunPolicy.SKIP,
+                 max_catch_up_ticks: int = 10,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], Awaitable[None]] = asyncio.sleep):
+        """
+        Fixed-rate tick scheduler driven by absolute deadlines on a monotonic clock.
+
+        Deadlines sit on a fixed grid (start + n * period), so the time spent
+        inside a tick does not push the following ticks back.
+
+        Args:
+            period_millis: Tick period in milliseconds
+            overrun_policy: What to do with ticks missed while a tick overran
+            max_catch_up_ticks: Backlog after which CATCH_UP falls back to skipping
+            clock: Monotonic clock returning seconds
+            sleep: Coroutine function used to wait for the next deadline
+        """
+        self.period = period_millis / 1000
+        self.overrun_policy = overrun_policy
+        self.max_catch_up_ticks = max_catch_up_ticks
+        self.clock = clock
+        self.sleep = sleep
+        self.stats = TickStats()
+        self._next_deadline = None
+        self._tick_started_at = None
+
+    def start(self) -> None:
+        """Anchor the tick grid at the current time."""
+        now = self.clock()
+        self._tick_started_at = now
+        self._next_deadline = now + self.period
+
+    async def wait_for_next_tick(self) -> None:
+        """Wait until the next deadline, handling overruns according to the policy."""
+        if self._next_deadline is None:
+            self.start()
+
+        now = self.clock()
+        tick_duration = now - self._tick_started_at
+        self.stats.last_tick_duration = tick_duration
+        self.stats.max_tick_duration = max(self.stats.max_tick_duration, tick_duration)
+        self.stats.total_tick_duration += tick_duration
+
+        if now < self._next_deadline:
+            await self.sleep(self._next_deadline - now)
+        else:
+            self.stats.overruns += 1
+            missed = int((now - self._next_deadline) // self.period) if self.period > 0 else 0
+            if missed > 0 and (self.overrun_policy == OverrunPolicy.SKIP or missed > self.max_catch_up_ticks):
+                self.stats.skipped_ticks += missed
+                self._next_deadline += missed * self.period
+            # Let the other tasks on the event loop run even when we are late
+            await self.sleep(0)
+
+        woke_at = self.clock()
+        jitter = woke_at - self._next_deadline
+        self.stats.ticks += 1
+        self.stats.last_jitter = jitter
+        self.stats.max_jitter = max(self.stats.max_jitter, jitter)
+        self.stats.total_jitter += abs(jitter)
+
+        self._tick_started_at = woke_at
+        self._next_deadline += self.period
@@ -9,4 +9,27 @@ class MachineStatus(Enum):
     RUNNING = "running"
     STOPPED = "stopped"
     WARNING = "warning"
-    ERROR = "error"
\ No newline at end of file
+    ERROR = "error"
+
+class OverrunPolicy(Enum):
+    # Run the missed ticks back-to-back until the schedule is caught up
+    CATCH_UP = "catch_up"
+    # Drop the missed ticks and re-align to the next deadline on the grid
+    SKIP = "skip"
+
+
+class WireCodec(Enum):
+    # Values are the codec byte of the wire header
+    JSON = 0
+    MSGPACK = 1
+    # Fixed struct layout for telemetry and event envelopes, JSON for everything else
+    STRUCT = 2
+
+
+class DropPolicy(Enum):
+    # Drop the oldest queued message to make room for a new one
+    DROP_OLDEST = "drop_oldest"
+    # Keep only the newest message, older ones are superseded by it
+    CONFLATE = "conflate"
+    # Queue without a limit, for messages that must not be lost
+    NEVER_DROP = "never_drop"
\ No newline at end of file
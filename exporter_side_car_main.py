@@ -1,15 +1,34 @@
+import argparse
 import asyncio
 
-from core.exporter_side_car import SideCarExporter, AsyncSubscriber
+from core.exporter_side_car import SideCarExporter, AsyncSubscriber, SharedMemorySubscriber, SpoolSubscriber
 
 
 async def main():
-    metrics_collector = SideCarExporter()
-    subscriber = AsyncSubscriber(metrics_collector, listen_address="tcp://127.0.0.1:5555")
+    parser = argparse.ArgumentParser(description="Export what the control loop publishes")
+    parser.add_argument("--transport", choices=["pub", "spool", "shm"], default="pub",
+                        help="Subscribe over PUB/SUB, receive and acknowledge spooled messages, "
+                             "or read the control loop's shared memory ring")
+    parser.add_argument("--topics", nargs="+", choices=["telemetry", "event", "logs", "metrics", "system_info"],
+                        default=None, help="Streams this sidecar exports, all of them by default "
+                             "(pub only, needs the control loop run with --topic-frames)")
+    parser.add_argument("--dead-letter-dir", default="dead-letters",
+                        help="Directory keeping what could not be exported until the destination is back")
+    args = parser.parse_args()
+
+    metrics_collector = SideCarExporter(dead_letter_dir=args.dead_letter_dir)
+    if args.transport == "spool":
+        subscriber = SpoolSubscriber(metrics_collector, listen_address="tcp://127.0.0.1:5556")
+    elif args.transport == "shm":
+        subscriber = SharedMemorySubscriber(metrics_collector, ring_name="bober-ring")
+    else:
+        subscriber = AsyncSubscriber(metrics_collector, listen_address="tcp://127.0.0.1:5555", topics=args.topics)
     try:
         await subscriber.run()
     except KeyboardInterrupt:
         print("Shutting down...")
+    finally:
+        await metrics_collector.close()
 
 
 if __name__ == "__main__":
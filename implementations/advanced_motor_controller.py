@@ -23,6 +23,11 @@ class AdvancedMotor:
             self._current_speed -= self._speed_modifier
             self._motor.ChangeDutyCycle(self._current_speed)
 
+    def set_speed(self, speed: float):
+        if self._current_speed > 0:
+            self._current_speed = min(max(speed, 10), 14)
+            self._motor.ChangeDutyCycle(self._current_speed)
+
     def get_current_speed(self) -> int:
         return self._current_speed
 
@@ -65,6 +70,10 @@ class AdvancedMotorController(IMotorController):
         if self.isRunning:
             self.motor.speed_up()
 
+    def set_speed(self, speed: float) -> None:
+        if self.isRunning:
+            self.motor.set_speed(speed)
+
     def stop_motor(self) -> None:
         if self.isRunning:
             self.isRunning = False
@@ -75,9 +84,9 @@ class AdvancedMotorController(IMotorController):
             self.isRunning = True
             self.motor.start()
 
-    def __init__(self):
+    def __init__(self, pin: int = 18):
         self.isRunning = False
-        self.motor = AdvancedMotor(pin=18, frequency=50, modifier=1)
+        self.motor = AdvancedMotor(pin=pin, frequency=50, modifier=1)
 
 
 def test_speed_control():
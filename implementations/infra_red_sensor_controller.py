@@ -1,8 +1,11 @@
 from abc import ABC, abstractmethod
+import threading
+from collections import deque
+from typing import List, Optional
 from gpiozero import DigitalInputDevice
 import time
 
-from interfaces.sensor_interface import ISensorController
+from interfaces.sensor_interface import ISensorController, SensorEdge
 
 
 class IRSensorController(ISensorController):
@@ -13,6 +16,71 @@ class IRSensorController(ISensorController):
         return not self.ir_sensor.value
 
 
+class EdgeTriggeredIRSensorController(IRSensorController):
+    def __init__(self, pin: int = 22, debounce_millis: float = 5, buffer_size: int = 1024):
+        """
+        IR sensor that records beam edges from gpiozero callbacks instead of being polled.
+
+        The callbacks run on gpiozero's pin thread and append to a buffer the control
+        loop drains each tick. Both hold a lock only for a few list operations, so
+        neither side waits on the other for long.
+
+        Args:
+            pin: GPIO pin the IR sensor is connected to
+            debounce_millis: Edges closer than this to the previous accepted edge are ignored
+            buffer_size: Maximum number of edges kept between two drains
+        """
+        self.ir_sensor = DigitalInputDevice(pin, bounce_time=debounce_millis / 1000 if debounce_millis else None)
+        self.debounce = debounce_millis / 1000
+        self.buffer_size = buffer_size
+        self.edges = deque(maxlen=buffer_size)
+        self.dropped_edges = 0
+        self._last_edge_time = 0.0
+        self._last_edge_visible = self.is_box_visible()
+        # Guards the debounce state and the edges, shared by the pin thread and drain_box_edges
+        self._lock = threading.Lock()
+
+        # The beam reads low while a box blocks it
+        self.ir_sensor.when_deactivated = self._on_box_entered
+        self.ir_sensor.when_activated = self._on_box_left
+
+    def _on_box_entered(self) -> None:
+        self._record_edge(True)
+
+    def _on_box_left(self) -> None:
+        self._record_edge(False)
+
+    def _record_edge(self, visible: bool) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if visible == self._last_edge_visible or now - self._last_edge_time < self.debounce:
+                return
+
+            self._last_edge_time = now
+            self._last_edge_visible = visible
+            if len(self.edges) == self.buffer_size:
+                self.dropped_edges += 1
+            self.edges.append(SensorEdge(timestamp=now, rising=visible))
+
+    def drain_box_edges(self) -> Optional[List[SensorEdge]]:
+        # An edge swallowed by the debounce window leaves us out of sync with the beam. The edge
+        # recorded to catch up carries the drain time, the beam changed up to a tick earlier.
+        self._record_edge(self.is_box_visible())
+
+        with self._lock:
+            drained = list(self.edges)
+            self.edges.clear()
+        return drained
+
+    def stats(self) -> dict:
+        return {"sensor_dropped_edges": self.dropped_edges}
+
+    def close(self) -> None:
+        self.ir_sensor.when_deactivated = None
+        self.ir_sensor.when_activated = None
+        self.ir_sensor.close()
+
+
 # Example usage:
 if __name__ == "__main__":
     sensor = IRSensorController()
@@ -0,0 +1,54 @@
+# src/implementations/line_observability_controller.py
+from core.tick_profiler import TickProfiler
+from core.tick_scheduler import TickStats
+from enums import MachineStatus
+from implementations.queued_observability_controller import QueuedObservabilityController
+from interfaces.observability_interface import IObservabilityController
+
+
+class LineObservabilityController(IObservabilityController):
+    """
+    Per-line view on a QueuedObservabilityController shared by several control loops.
+
+    Everything observed is tagged with the line id. Flushing is left to the owner
+    of the shared controller so the publisher sends one batch of logs and metrics
+    per flush instead of one per line.
+    """
+
+    def __init__(self, line_id: str, shared: QueuedObservabilityController):
+        self.line_id = line_id
+        self.shared = shared
+
+    async def flush(self):
+        pass
+
+    async def observe_system_info(self):
+        await self.shared.observe_system_info()
+
+    async def observe_machine_status_changed(self, box_count: int, machine_speed: int, status: MachineStatus, event: str) -> None:
+        await self.shared.observe_machine_status_changed(
+            box_count=box_count,
+            machine_speed=machine_speed,
+            status=status,
+            event=event,
+            line_id=self.line_id
+        )
+
+    async def observe_running_state(self, box_count: int, machine_speed: float) -> None:
+        await self.shared.observe_running_state(
+            box_count=box_count,
+            machine_speed=machine_speed,
+            line_id=self.line_id
+        )
+
+    async def observe_tick_stats(self, stats: TickStats) -> None:
+        await self.shared.observe_tick_stats(stats, line_id=self.line_id)
+
+    async def observe_tick_profile(self, profiler: TickProfiler) -> None:
+        await self.shared.observe_tick_profile(profiler, line_id=self.line_id)
+
+    async def observe_throughput(self, summary: dict) -> None:
+        await self.shared.observe_throughput(summary, line_id=self.line_id)
+
+    async def observe_sensor(self, stats: dict) -> None:
+        await self.shared.observe_sensor(stats, line_id=self.line_id)
@@ -4,34 +4,44 @@ from interfaces.motor_interface import IMotorController
 class MockMotorController(IMotorController):
 
     def is_running(self) -> bool:
-        return self.is_running
+        return self.running
 
     def get_speed(self) -> int:
-        pass
+        return self.current_speed
 
     default_speed: float
     current_speed: float
-    is_running: bool
+    running: bool
 
     def __init__(self):
         self.current_speed = 0.0
-        self.default_speed = 50.0
-        self.is_running = False
+        # Same duty cycle range as the AdvancedMotor (10-14)
+        self.default_speed = 10.0
+        self.max_speed = 14.0
+        self.running = False
 
     def start_motor(self) -> None:
-        self.is_running = True
+        self.running = True
+        self.current_speed = self.default_speed
 
     def stop_motor(self) -> None:
-        self.is_running = False
+        self.running = False
+        self.current_speed = 0.0
 
     def speed_up(self) -> None:
-        pass
+        if self.running and self.current_speed < self.max_speed:
+            self.current_speed += 1
 
     def slow_down(self) -> None:
-        pass
+        if self.running and self.current_speed > self.default_speed:
+            self.current_speed -= 1
+
+    def set_speed(self, speed: float) -> None:
+        if self.running:
+            self.current_speed = min(max(speed, self.default_speed), self.max_speed)
 
     def get_status(self) -> dict:
         return {
-            "is_running": self.is_running,
+            "is_running": self.running,
             "current_speed": self.current_speed
         }
@@ -4,7 +4,8 @@ from interfaces.sensor_interface import ISensorController
 
 class MockSensorController(ISensorController):
 
-    def __init__(self):
+    def __init__(self, verbose: bool = True):
+        self.verbose = verbose
         self.counter = 0
         self.switch_point = 3
         self.is_visible = False
@@ -15,6 +16,7 @@ class MockSensorController(ISensorController):
             self.is_visible = not self.is_visible
             self.counter = 0
 
-        print(f"mock sensor state {self.is_visible} point {self.switch_point} counter {self.counter} ")
+        if self.verbose:
+            print(f"mock sensor state {self.is_visible} point {self.switch_point} counter {self.counter} ")
 
         return self.is_visible
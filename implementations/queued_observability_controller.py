@@ -1,59 +1,115 @@
 # src/implementations/in_memory_observability_controller.py
+import re
 from enum import Enum
 
 from analytics.analytics_client import MachineIoTClient
 from analytics.metric import MetricsRegistry
+from analytics.system_metrics_sampler import SystemMetricsSampler
+from core.tick_profiler import TickProfiler
+from core.tick_scheduler import TickStats
 from enums import MachineStatus
 from infrastructure.async_publisher import AsyncPublisher
 from infrastructure.boblogger import BobLogger
 from interfaces.observability_interface import IObservabilityController
 from datetime import datetime
+from typing import Optional
 
 class QueuedObservabilityController(IObservabilityController):
 
 
 
     async def flush(self):
-        logs = self.logger.get_logs()[:]
-        self.logger.clear()
+        logs = self.logger.drain()
 
         if len(logs) > 0:
             await self.publisher.flush_logs(logs)
+        self.metrics_registry.set_gauge("log_messages_dropped", self.logger.dropped)
 
+        self.apply_system_metrics()
         await self.publisher.flush_metrics(self.metrics_registry)
 
 
     async def observe_system_info(self):
         await self.publisher.publish_system_info()
-        self.metrics_registry.observe_system_metrics()
+        self.apply_system_metrics()
 
+    def apply_system_metrics(self):
+        """Copy the sampler's latest snapshot into the registry, never blocking the caller."""
+        sampler = self.system_metrics_sampler
+        if not sampler.is_running:
+            sampler.start()
+        if sampler.version != self._applied_system_metrics_version:
+            self._applied_system_metrics_version = sampler.version
+            self.metrics_registry.set_gauges(sampler.snapshot)
 
-    async def observe_machine_status_changed(self, box_count: int, machine_speed: int, status: MachineStatus, event: str) -> None:
+
+    async def observe_machine_status_changed(self, box_count: int, machine_speed: int, status: MachineStatus, event: str,
+                                             line_id: Optional[str] = None) -> None:
         await self.publisher.publish_event(
             event_name=event,
-            data={
-                "totaloutputunitcount": box_count,
-                "machinespeed": machine_speed,
-            }
+            data=self.machine_data(box_count, machine_speed, line_id)
         )
-        await self.observe_is_on(machine_speed)
+        await self.observe_is_on(machine_speed, line_id)
 
-    async def observe_running_state(self, box_count: int, machine_speed: float) -> None:
-        self.logger.info(f"Current state: box_count={box_count}, machine_speed={machine_speed}")
-        await self.publisher.publish_telemetry(data={
-            "totaloutputunitcount": box_count,
-            "machinespeed": machine_speed,
-        })
-        await self.observe_is_on(machine_speed)
+    async def observe_running_state(self, box_count: int, machine_speed: float, line_id: Optional[str] = None) -> None:
+        line_prefix = f"[line {line_id}] " if line_id is not None else ""
+        self.logger.info("%sCurrent state: box_count=%s, machine_speed=%s", line_prefix, box_count, machine_speed)
+        await self.publisher.publish_telemetry(data=self.machine_data(box_count, machine_speed, line_id))
+        await self.observe_is_on(machine_speed, line_id)
+
+    async def observe_tick_stats(self, stats: TickStats, line_id: Optional[str] = None) -> None:
+        self.metrics_registry.set_gauge(line_metric_name("tick_count", line_id), stats.ticks)
+        self.metrics_registry.set_gauge(line_metric_name("tick_overruns", line_id), stats.overruns)
+        self.metrics_registry.set_gauge(line_metric_name("tick_skipped", line_id), stats.skipped_ticks)
+        self.metrics_registry.set_gauge(line_metric_name("tick_jitter_last_ms", line_id), stats.last_jitter * 1000)
+        self.metrics_registry.set_gauge(line_metric_name("tick_jitter_max_ms", line_id), stats.max_jitter * 1000)
+        self.metrics_registry.set_gauge(line_metric_name("tick_jitter_mean_ms", line_id), stats.mean_jitter * 1000)
+        self.metrics_registry.set_gauge(line_metric_name("tick_duration_max_ms", line_id), stats.max_tick_duration * 1000)
+
+    async def observe_tick_profile(self, profiler: TickProfiler, line_id: Optional[str] = None) -> None:
+        for phase, summary in profiler.summary().items():
+            for statistic in ("p50", "p99", "max"):
+                self.metrics_registry.set_gauge(
+                    line_metric_name(f"tick_phase_{phase}_{statistic}_ms", line_id),
+                    summary[statistic] * 1000
+                )
+
+    async def observe_throughput(self, summary: dict, line_id: Optional[str] = None) -> None:
+        for name, value in summary.items():
+            self.metrics_registry.set_gauge(line_metric_name(name, line_id), value)
 
-    async def observe_is_on(self, machine_speed):
+    async def observe_sensor(self, stats: dict, line_id: Optional[str] = None) -> None:
+        for name, value in stats.items():
+            self.metrics_registry.set_counter(line_metric_name(name, line_id), value)
+
+    async def observe_is_on(self, machine_speed, line_id: Optional[str] = None):
         if machine_speed == 0:
-            self.metrics_registry.set_gauge("is_running", 0)
+            self.metrics_registry.set_gauge(line_metric_name("is_running", line_id), 0)
         else:
-            self.metrics_registry.set_gauge("is_running", 1)
+            self.metrics_registry.set_gauge(line_metric_name("is_running", line_id), 1)
+
+    @staticmethod
+    def machine_data(box_count: int, machine_speed: float, line_id: Optional[str]) -> dict:
+        data = {
+            "totaloutputunitcount": box_count,
+            "machinespeed": machine_speed,
+        }
+        if line_id is not None:
+            data["lineid"] = line_id
+        return data
 
-    def __init__(self, publisher: AsyncPublisher, logger: BobLogger):
+    def __init__(self, publisher: AsyncPublisher, logger: BobLogger, metrics_registry: MetricsRegistry = None,
+                 system_metrics_sampler: SystemMetricsSampler = None):
         self.publisher = publisher
-        self.metrics_registry = MetricsRegistry()
+        self.metrics_registry = metrics_registry if metrics_registry is not None else MetricsRegistry()
         self.logger = logger
+        self.system_metrics_sampler = system_metrics_sampler if system_metrics_sampler is not None else SystemMetricsSampler()
+        self._applied_system_metrics_version = 0
+
+
+def line_metric_name(name: str, line_id: Optional[str]) -> str:
+    if line_id is None:
+        return name
+    # Line ids end up in metric names, which only allow [a-zA-Z0-9_]
+    return f"line_{re.sub(r'[^a-zA-Z0-9_]', '_', line_id)}_{name}"
 
@@ -0,0 +1,58 @@
+# src/implementations/recording_observability_controller.py
+from typing import List, Optional
+
+from enums import MachineStatus
+from infrastructure.boblogger import BobLogger
+from interfaces.observability_interface import IObservabilityController
+
+
+class RecordingObservabilityController(IObservabilityController):
+    """Keeps everything observed in memory, for simulations and offline runs."""
+
+    def __init__(self, logger: Optional[BobLogger] = None, clock=None):
+        self.logger = logger
+        self.clock = clock
+        self.events: List[dict] = []
+        self.telemetry: List[dict] = []
+        self.tick_stats = None
+        self.tick_profile = None
+        self.throughput = None
+        self.sensor_stats = None
+
+    def _now(self) -> Optional[float]:
+        return self.clock.monotonic() if self.clock is not None else None
+
+    async def flush(self):
+        if self.logger is not None:
+            self.logger.clear()
+
+    async def observe_system_info(self):
+        pass
+
+    async def observe_machine_status_changed(self, box_count: int, machine_speed: int, status: MachineStatus, event: str) -> None:
+        self.events.append({
+            "time": self._now(),
+            "event": event,
+            "status": status.value,
+            "totaloutputunitcount": box_count,
+            "machinespeed": machine_speed,
+        })
+
+    async def observe_running_state(self, box_count: int, machine_speed: float) -> None:
+        self.telemetry.append({
+            "time": self._now(),
+            "totaloutputunitcount": box_count,
+            "machinespeed": machine_speed,
+        })
+
+    async def observe_tick_stats(self, stats) -> None:
+        self.tick_stats = stats
+
+    async def observe_tick_profile(self, profiler) -> None:
+        self.tick_profile = profiler.summary()
+
+    async def observe_throughput(self, summary: dict) -> None:
+        self.throughput = summary
+
+    async def observe_sensor(self, stats: dict) -> None:
+        self.sensor_stats = stats
@@ -0,0 +1,134 @@
+# src/implementations/speed_strategies.py
+from typing import Optional
+
+from interfaces.speed_strategy_interface import ISpeedStrategy, SpeedInputs
+
+
+class StepSpeedStrategy(ISpeedStrategy):
+    """Moves the duty cycle one fixed step per tick towards the desired speed."""
+
+    def __init__(self, step: float = 1):
+        self.step = step
+
+    def next_speed(self, inputs: SpeedInputs) -> Optional[float]:
+        if inputs.machine_speed < inputs.desired_speed:
+            return min(inputs.machine_speed + self.step, inputs.desired_speed)
+        if inputs.machine_speed > inputs.desired_speed:
+            return max(inputs.machine_speed - self.step, inputs.desired_speed)
+        return None
+
+
+class RampProfile:
+    def __init__(self, max_rate: float = 4):
+        """
+        Feed-forward ramp limiting how fast the duty cycle command may change.
+
+        Args:
+            max_rate: Largest duty cycle change per second
+        """
+        self.max_rate = max_rate
+        self._last_time: Optional[float] = None
+
+    def next(self, now: float, current: float, target: float) -> float:
+        dt = now - self._last_time if self._last_time is not None else 0.0
+        self._last_time = now
+        max_change = self.max_rate * dt
+        return min(max(target, current - max_change), current + max_change)
+
+    def reset(self) -> None:
+        self._last_time = None
+
+
+class PidController:
+    def __init__(self, kp: float, ki: float, kd: float, output_min: float, output_max: float):
+        """
+        PID controller with conditional integration as anti-windup.
+
+        The integral only accumulates while the output is not saturated, or when the
+        error pulls it back out of saturation. The derivative acts on the measurement
+        rather than the error, so setpoint changes do not kick the output.
+        """
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.output_min = output_min
+        self.output_max = output_max
+        self.integral = 0.0
+        self._last_measurement: Optional[float] = None
+
+    def update(self, setpoint: float, measurement: float, dt: float, feed_forward: float = 0.0) -> float:
+        error = setpoint - measurement
+        derivative = 0.0
+        if self._last_measurement is not None and dt > 0:
+            derivative = -self.kd * (measurement - self._last_measurement) / dt
+        self._last_measurement = measurement
+
+        proportional = self.kp * error
+        integral = self.integral + self.ki * error * dt
+        output = feed_forward + proportional + integral + derivative
+
+        if output > self.output_max:
+            if error < 0:
+                self.integral = integral
+            return self.output_max
+        if output < self.output_min:
+            if error > 0:
+                self.integral = integral
+            return self.output_min
+
+        self.integral = integral
+        return output
+
+    def reset(self) -> None:
+        self.integral = 0.0
+        self._last_measurement = None
+
+
+class ClosedLoopSpeedStrategy(ISpeedStrategy):
+    def __init__(self,
+                 ramp: Optional[RampProfile] = None,
+                 pid: Optional[PidController] = None,
+                 feed_forward_offset: float = 10,
+                 feed_forward_gain: float = 0.0):
+        """
+        Drives the duty cycle towards the configured throughput, or the configured duty cycle when
+        no throughput is set. The command always goes through the ramp profile.
+
+        In throughput mode the PID corrects the feed-forward estimate
+        feed_forward_offset + feed_forward_gain * target_boxes_per_minute
+        using the measured boxes per minute.
+
+        Args:
+            ramp: Ramp profile applied to the command
+            pid: Controller mapping the throughput error to a duty cycle
+            feed_forward_offset: Duty cycle at zero throughput
+            feed_forward_gain: Duty cycle added per box per minute of target
+        """
+        self.ramp = ramp if ramp is not None else RampProfile()
+        self.pid = pid if pid is not None else PidController(kp=0.05, ki=0.01, kd=0.0, output_min=10, output_max=14)
+        self.feed_forward_offset = feed_forward_offset
+        self.feed_forward_gain = feed_forward_gain
+        self._last_time: Optional[float] = None
+
+    def next_speed(self, inputs: SpeedInputs) -> Optional[float]:
+        dt = inputs.now - self._last_time if self._last_time is not None else 0.0
+        self._last_time = inputs.now
+
+        if inputs.target_boxes_per_minute is not None:
+            target = self.pid.update(
+                setpoint=inputs.target_boxes_per_minute,
+                measurement=inputs.boxes_per_minute,
+                dt=dt,
+                feed_forward=self.feed_forward_offset + self.feed_forward_gain * inputs.target_boxes_per_minute
+            )
+        else:
+            self.pid.reset()
+            target = inputs.desired_speed
+
+        command = self.ramp.next(inputs.now, inputs.machine_speed, target)
+        return command if command != inputs.machine_speed else None
+
+    def reset(self) -> None:
+        self.ramp.reset()
+        self.pid.reset()
+        self._last_time = None
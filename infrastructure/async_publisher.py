@@ -1,76 +1,360 @@
 import asyncio
-import datetime
-import json
-from typing import List
+import os
+import socket
+import time
+from typing import Dict, List, Optional
 
 import aiozmq
 import zmq
 
 from analytics.metric import MetricsRegistry
+from enums import WireCodec
 from infrastructure.boblogger import LogMessage
+from infrastructure.envelopes import MetricsSequencer, event_envelope, logs_envelope, system_info_envelope, telemetry_envelope
+from infrastructure.publish_queue import PublishQueues, TypePolicy
+from infrastructure.shm_ring import ShmRing
+from infrastructure.spool import SPOOL_ACK, SPOOL_HEADER, SegmentSpool
+from infrastructure.wire import EnvelopeStamper, encode_batch, encode_event, pack_frames, topic_for, unpack_frames
 
 
 class AsyncPublisher:
-    def __init__(self, publish_address: str):
+    def __init__(self, publish_address: str, bind: bool = True, codec: WireCodec = WireCodec.JSON,
+                 full_metrics_interval_seconds: float = 30, source: Optional[str] = None,
+                 send_hwm: int = 1000, write_buffer_bytes: int = 256 * 1024,
+                 type_policies: Optional[Dict[str, TypePolicy]] = None, topic_frames: bool = False):
+        """
+        Publishes envelopes without ever blocking the caller.
+
+        Envelopes wait in a queue per type until the socket takes them. The socket holds up
+        to send_hwm messages per subscriber and then pushes back instead of dropping, once
+        write_buffer_bytes are waiting on it the queues stop draining and each type's
+        policy decides what is dropped: by default the oldest telemetry, never an event.
+
+        Args:
+            publish_address: ZMQ endpoint to publish on
+            bind: Bind the endpoint, or connect to it (e.g. to a forwarding proxy)
+            codec: Wire encoding, binary codecs need subscribers that read the wire header
+            full_metrics_interval_seconds: How often a metrics flush carries every metric
+                rather than only the changed ones, so late subscribers catch up
+            source: Name of this publisher in its envelopes, defaults to host and process id
+            send_hwm: ZMQ send high-water mark, messages queued per subscriber
+            write_buffer_bytes: Bytes waiting on the socket after which the queues stop draining
+            type_policies: Drop policy per envelope type, overriding the defaults
+            topic_frames: Prefix every message with its topic frame so subscribers can pick
+                streams, only sidecars that read topic frames understand such messages
+        """
         self.publish_address = publish_address
+        self.bind = bind
+        self.codec = codec
+        self.topic_frames = topic_frames
+        self.source = source if source is not None else f"{socket.gethostname()}:{os.getpid()}"
+        self.metrics_sequencer = MetricsSequencer(self.source, full_metrics_interval_seconds)
+        self.stamper = EnvelopeStamper(self.source)
+        self.send_hwm = send_hwm
+        self.write_buffer_bytes = write_buffer_bytes
+        # In drain order, events first
+        self.queues = PublishQueues(type_policies)
+        self._drain_task: Optional[asyncio.Task] = None
         self.pub = None
 
+    async def _open_stream(self, socket_type: int):
+        stream = await aiozmq.create_zmq_stream(socket_type, loop=asyncio.get_event_loop())
+        # Options only apply to connections made after they are set
+        stream.transport.setsockopt(zmq.SNDHWM, self.send_hwm)
+        if socket_type == zmq.PUB:
+            # Report a full subscriber queue as back pressure rather than silently dropping
+            stream.transport.setsockopt(zmq.XPUB_NODROP, 1)
+        stream.transport.set_write_buffer_limits(high=self.write_buffer_bytes)
+        if self.bind:
+            await stream.transport.bind(self.publish_address)
+        else:
+            await stream.transport.connect(self.publish_address)
+        return stream
+
     async def connect(self):
-        self.pub = await aiozmq.create_zmq_stream(
-            zmq.PUB,
-            bind=self.publish_address,
-            loop=asyncio.get_event_loop()
-        )
+        self.pub = await self._open_stream(zmq.PUB)
         print("Publisher connected and ready")
 
+    def _send(self, event: dict):
+        self.stamper.stamp(event)
+        self.queues.put(event)
+        self._drain()
+
+    def _drain(self):
+        """Move queued envelopes to the socket while it keeps up, then wait for it to catch up."""
+        while self.queues:
+            if not self._writable():
+                if self._drain_task is None:
+                    self._drain_task = asyncio.create_task(self._drain_when_writable())
+                return
+            self._emit(self.queues.pop())
+
+    def _writable(self) -> bool:
+        return self._buffered_bytes() < self.write_buffer_bytes
+
+    def _buffered_bytes(self) -> int:
+        return self.pub.transport.get_write_buffer_size()
+
+    async def _wait_writable(self):
+        await self.pub.drain()
+
+    async def _drain_when_writable(self):
+        try:
+            await self._wait_writable()
+        except Exception as e:
+            print(f"Publisher stopped draining: {e}")
+            return
+        finally:
+            self._drain_task = None
+        self._drain()
+
+    def _emit(self, event: dict):
+        frames = encode_event(event, self.codec)
+        self.pub.write([topic_for(event["type"])] + frames if self.topic_frames else frames)
+
+    def observe_queues(self, registry: MetricsRegistry):
+        """Export the sent, dropped and queued counts per envelope type."""
+        self.queues.observe(registry)
+        registry.set_gauge("publisher_write_buffer_bytes", self._buffered_bytes())
+
+    async def flush(self):
+        """Send whatever is still buffered, nothing is buffered by this publisher."""
+        pass
+
     async def publish_telemetry(self, data: dict):
-        event = {
-            "type": "export_telemetry",
-            "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
-            "data": data
-        }
-        message = json.dumps(event)
-        self.pub.write([message.encode()])
-        print(f"Published telemetry: {message}")
+        event = telemetry_envelope(data)
+        self._send(event)
+        print(f"Published telemetry: {event}")
 
     async def publish_event(self, event_name: str, data: dict):
-        event = {
-            "type": "export_event",
-            "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
-            "event": event_name,
-            "data": data
-        }
-        message = json.dumps(event)
-        self.pub.write([message.encode()])
-        print(f"Published event: {message}")
+        event = event_envelope(event_name, data)
+        self._send(event)
+        print(f"Published event: {event}")
 
     async def publish_system_info(self):
-        event = {
-            "type": "export_system_info", }
-        message = json.dumps(event)
-        self.pub.write([message.encode()])
-        print(f"Published event: {message}")
+        event = system_info_envelope()
+        self._send(event)
+        print(f"Published event: {event}")
 
 
     async def flush_logs(self, logs: List[LogMessage]):
+        event = logs_envelope(logs)
+        self._send(event)
+        # print(f"Published event: {event}")
 
-        data = [log.to_dict() for log in logs]
-        event = {
-            "type": "flush_logs",
-            "data": data
-        }
-        message = json.dumps(event)
+    async def flush_metrics(self, registry: MetricsRegistry):
+        """Publish the metrics changed since the previous flush, and all of them once per full metrics interval."""
+        self.observe_queues(registry)
+        event = self.metrics_sequencer.envelope(registry)
+        if event is not None:
+            self._send(event)
+        # print(f"Published event: {event}")
 
-        self.pub.write([message.encode()])
-        # print(f"Published event: {message}")
 
-    async def flush_metrics(self, registry: MetricsRegistry):
-        data = registry.get_metrics()
-        event = {
-            "type": "flush_metrics",
-            "data": data
-        }
-        message = json.dumps(event)
-        self.pub.write([message.encode()])
-        print(f"Published event: {message}")
+class BatchingAsyncPublisher(AsyncPublisher):
+    def __init__(self, publish_address: str, window_millis: float = 500, max_batch_size: int = 64, **kwargs):
+        """
+        Publisher collecting envelopes and sending them as one multipart message per window.
+
+        Envelopes are batched per topic. A batch is sent when it holds max_batch_size envelopes
+        or window_millis after the first envelope of the window, whichever comes first, with a
+        single serialization.
+
+        Args:
+            publish_address: ZMQ endpoint to publish on
+            window_millis: Longest time an envelope waits in the batch
+            max_batch_size: Envelopes after which the batch is sent right away
+            **kwargs: Passed on to AsyncPublisher
+        """
+        super().__init__(publish_address, **kwargs)
+        self.window = window_millis / 1000
+        self.max_batch_size = max_batch_size
+        self.batches: Dict[bytes, List[dict]] = {}
+        self._flush_handle = None
+
+    def _emit(self, event: dict):
+        topic = topic_for(event["type"])
+        batch = self.batches.setdefault(topic, [])
+        batch.append(event)
+        if len(batch) >= self.max_batch_size:
+            self._send_batch(topic)
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_event_loop().call_later(self.window, self._send_batches)
+
+    def _send_batch(self, topic: bytes):
+        batch = self.batches.pop(topic, None)
+        if batch:
+            frames = encode_batch(batch, self.codec)
+            self.pub.write([topic] + frames if self.topic_frames else frames)
+
+    def _send_batches(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for topic in list(self.batches):
+            self._send_batch(topic)
+
+    async def flush(self):
+        self._send_batches()
+
+
+class SpoolingAsyncPublisher(AsyncPublisher):
+    # Envelope types written to the spool and resent until the subscriber acknowledges them
+    SPOOLED_TYPES = ("export_telemetry", "export_event")
+
+    def __init__(self, publish_address: str, spool: SegmentSpool, ack_timeout_seconds: float = 2,
+                 max_in_flight: int = 256, sync_interval_seconds: float = 5, **kwargs):
+        """
+        Publisher delivering telemetry and events at least once over DEALER, to a SpoolSubscriber's ROUTER.
+
+        Telemetry and events are appended to the spool before they are sent and stay there
+        until the subscriber acknowledges them. Without an acknowledgement for ack_timeout_seconds
+        the publisher goes back to the oldest unacknowledged message and sends again from there,
+        which also replays the spool after the subscriber or this process restarts. The spool
+        is the queue of telemetry and events, other envelopes go through the usual queues and
+        are sent once.
+
+        Args:
+            publish_address: ZMQ endpoint of the subscriber
+            spool: Spool holding the unacknowledged messages
+            ack_timeout_seconds: Time without acknowledgements after which unacknowledged messages are resent
+            max_in_flight: Messages sent and not yet acknowledged at most
+            sync_interval_seconds: How often the spool is written through to the disk
+            **kwargs: Passed on to AsyncPublisher, bind defaults to False
+        """
+        kwargs.setdefault("bind", False)
+        super().__init__(publish_address, **kwargs)
+        self.spool = spool
+        self.ack_timeout = ack_timeout_seconds
+        self.max_in_flight = max_in_flight
+        self.sync_interval = sync_interval_seconds
+        self._next_to_send = spool.first_unacked
+        self._last_progress = time.monotonic()
+        self._last_sync = time.monotonic()
+        self._ack_task: Optional[asyncio.Task] = None
+        self.malformed_acks = 0
+
+    async def connect(self):
+        self.pub = await self._open_stream(zmq.DEALER)
+        self._ack_task = asyncio.create_task(self._read_acks())
+        print(f"Spooling publisher connected, {self.spool.pending} messages to replay")
+        self._send_window()
+
+    def _send(self, event: dict):
+        if event["type"] not in self.SPOOLED_TYPES:
+            super()._send(event)
+            return
+        self.stamper.stamp(event)
+        self.spool.append(pack_frames(encode_event(event, self.codec)))
+        self._send_window()
+
+    def _emit(self, event: dict):
+        self.pub.write([SPOOL_HEADER.pack(self.spool.spool_id, 0, 0)] + encode_event(event, self.codec))
+
+    def observe_queues(self, registry: MetricsRegistry):
+        super().observe_queues(registry)
+        registry.set_counter("publisher_spool_dropped", self.spool.dropped)
+        registry.set_gauge("publisher_spool_pending", self.spool.pending)
+        registry.set_counter("publisher_spool_malformed_acks", self.malformed_acks)
+
+    def _send_window(self):
+        first_unacked = self.spool.first_unacked
+        # Messages dropped from a full spool are not waited for
+        next_to_send = max(self._next_to_send, first_unacked)
+        count = self.max_in_flight - (next_to_send - first_unacked)
+        # While the subscriber is away the transport buffers writes, resending into it would only grow the buffer
+        if count <= 0 or self.pub is None or not self._writable():
+            return
+        for seq, payload in self.spool.read_from(next_to_send, count):
+            self.pub.write([SPOOL_HEADER.pack(self.spool.spool_id, seq, first_unacked)] + unpack_frames(payload))
+            next_to_send = seq + 1
+        self._next_to_send = next_to_send
+
+    async def _read_acks(self):
+        while True:
+            try:
+                frames = await asyncio.wait_for(self.pub.read(), self.ack_timeout)
+            except asyncio.TimeoutError:
+                frames = None
+            except aiozmq.ZmqStreamClosed:
+                break
+
+            now = time.monotonic()
+            if frames and (len(frames) != 1 or len(frames[0]) != SPOOL_ACK.size):
+                # Not an acknowledgement, the resends and syncs below must go on regardless
+                self.malformed_acks += 1
+                print(f"Skipped a malformed acknowledgement of {len(frames)} frames")
+            elif frames:
+                spool_id, seq = SPOOL_ACK.unpack(frames[0])
+                if spool_id == self.spool.spool_id and seq > self.spool.acked:
+                    self.spool.ack(seq)
+                    self._last_progress = now
+            if self.spool.pending and now - self._last_progress >= self.ack_timeout:
+                # Nothing acknowledged lately, the subscriber may have missed messages or restarted
+                self._next_to_send = self.spool.first_unacked
+                self._last_progress = now
+            self._send_window()
+
+            if now - self._last_sync >= self.sync_interval:
+                self._last_sync = now
+                await self._sync_spool()
+
+    async def _sync_spool(self):
+        try:
+            # msync can take a while on an SD card, keep it off the control loop's thread
+            await asyncio.get_event_loop().run_in_executor(None, self.spool.sync)
+        except (OSError, ValueError) as e:
+            print(f"Failed syncing the spool: {e}")
+
+    async def flush(self):
+        self._send_window()
+        await self._sync_spool()
+
+    async def close(self):
+        if self._ack_task is not None:
+            self._ack_task.cancel()
+            self._ack_task = None
+        self.spool.sync()
+        self.pub.close()
+
+
+class SharedMemoryPublisher(AsyncPublisher):
+    def __init__(self, ring_name: str = "bober-ring", capacity: int = 4 * 1024 * 1024, **kwargs):
+        """
+        Publisher writing to a shared memory ring read by a SharedMemorySubscriber on the same machine.
+
+        The queues drain into the ring while it has write_buffer_bytes free, so that is also
+        the largest message the ring is sure to take.
+
+        Args:
+            ring_name: Name of the shared memory ring
+            capacity: Bytes the ring holds, when this publisher creates it
+            **kwargs: Passed on to AsyncPublisher
+        """
+        super().__init__(publish_address=f"shm://{ring_name}", **kwargs)
+        self.ring_name = ring_name
+        self.capacity = capacity
+        self.ring: Optional[ShmRing] = None
+
+    async def connect(self):
+        self.ring = ShmRing(self.ring_name, self.capacity)
+        print(f"Publisher writing to shared memory ring {self.ring_name}")
+
+    def _writable(self) -> bool:
+        return self.ring.free >= self.write_buffer_bytes
+
+    def _buffered_bytes(self) -> int:
+        return self.ring.used
+
+    async def _wait_writable(self):
+        # The ring has no notification towards the producer, the subscriber frees space as it reads
+        while not self._writable():
+            await asyncio.sleep(0.01)
+
+    def _emit(self, event: dict):
+        payload = pack_frames(encode_event(event, self.codec))
+        if not self.ring.write(payload):
+            print(f"Dropped a {len(payload)} byte {event['type']} message larger than the free ring space")
 
+    async def close(self):
+        self.ring.close()
\ No newline at end of file
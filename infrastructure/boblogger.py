@@ -1,8 +1,9 @@
+import threading
+import time
 import traceback
-from dataclasses import dataclass
 from datetime import datetime, timezone
 from enum import Enum
-from typing import List
+from typing import List, Optional
 
 
 class Severity(Enum):
@@ -13,64 +14,181 @@ class Severity(Enum):
     CRITICAL = "CRITICAL"
 
 
-@dataclass
 class LogMessage:
-    timestamp: datetime
-    message: str
-    severity: Severity
+    """
+    One log record. The message is formatted from its template and arguments only
+    when something reads it, so records nobody looks at cost no formatting.
+
+    A template that does not match its arguments is reported in the message rather than
+    raised, as it only shows once the record is written out, far from the logging call.
+    """
+
+    __slots__ = ("created", "severity", "template", "args", "exc", "_message")
+
+    def __init__(self, created: float, severity: Severity, template: str, args: tuple = (),
+                 exc: Optional[BaseException] = None):
+        self.created = created
+        self.severity = severity
+        self.template = template
+        self.args = args
+        self.exc = exc
+        self._message = None
+
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self.created, timezone.utc)
+
+    @property
+    def message(self) -> str:
+        if self._message is None:
+            message = self._format()
+            if self.exc is not None:
+                exc = self.exc
+                message += " " + ''.join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+            self._message = message
+        return self._message
+
+    def _format(self) -> str:
+        if not self.args:
+            return self.template
+        try:
+            return self.template % self.args
+        except Exception as e:
+            return f"{self.template} {self.args!r} (formatting failed: {e!r})"
 
     def __str__(self) -> str:
         return f"[{self.timestamp.isoformat()}] {self.severity.value}: {self.message}"
 
     def to_dict(self) -> dict:
         return {
-            "timestamp": self.timestamp.timestamp(),
+            "timestamp": self.created,
             "message": self.message,
             "severity": self.severity.value,
         }
 
 
 class BobLogger:
-    def __init__(self):
-        self.messages: List[LogMessage] = []
-
-    def _log(self, message: str, severity: Severity) -> None:
-        log_message = LogMessage(
-            timestamp=datetime.now(timezone.utc),
-            message=message,
-            severity=severity
-        )
-        print(str(log_message))
-        self.messages.append(log_message)
-
-    def info(self, message: str) -> None:
-        self._log(message, Severity.INFO)
-
-    def warning(self, message: str) -> None:
-        self._log(message, Severity.WARNING)
-
-    def error(self, message: str, exc: Exception = None):
-        stack_trace = None
-        if exc:
-            stack_trace = ''.join(traceback.format_exception(type(exc), exc, exc.__traceback__))
-        log_message = LogMessage(
-            message=message + " " + stack_trace,
-            severity=Severity.ERROR,
-            timestamp=datetime.now(timezone.utc),
-        )
-        print(str(log_message))
-        self.messages.append(log_message)
-
-
-    def debug(self, message: str) -> None:
-        self._log(message, Severity.DEBUG)
+    def __init__(self, capacity: int = 4096, echo: bool = True, log_path: Optional[str] = None,
+                 sink_interval_seconds: float = 0.1):
+        """
+        Logger keeping the records not yet flushed in a fixed-size ring buffer.
+
+        When the buffer is full the oldest record is dropped and counted, so a stalled
+        flush costs old log lines rather than memory. Console and file output happen on
+        a background thread, logging itself only stores the record.
+
+        Args:
+            capacity: Records kept until they are flushed
+            echo: Write the records to stdout
+            log_path: File the records are appended to, None for no file
+            sink_interval_seconds: Longest time a record waits before it is written out
+        """
+        self.capacity = capacity
+        self.echo = echo
+        self.log_path = log_path
+        self.sink_interval = sink_interval_seconds
+        self._ring: List[Optional[LogMessage]] = [None] * capacity
+        # Sequence numbers: next record to write, next one to flush, next one to output
+        self._written = 0
+        self._flushed = 0
+        self._output = 0
+        self.dropped = 0
+        self.output_dropped = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _log(self, severity: Severity, message: str, args: tuple = (), exc: Optional[BaseException] = None) -> None:
+        record = LogMessage(time.time(), severity, message, args, exc)
+        with self._lock:
+            self._ring[self._written % self.capacity] = record
+            self._written += 1
+            if self._written - self._flushed > self.capacity:
+                self._flushed += 1
+                self.dropped += 1
+
+        # The output thread polls, waking it for every record would cost the caller a GIL handoff
+        if self._thread is None and (self.echo or self.log_path is not None):
+            self._start_sink()
+
+    def info(self, message: str, *args) -> None:
+        self._log(Severity.INFO, message, args)
+
+    def warning(self, message: str, *args) -> None:
+        self._log(Severity.WARNING, message, args)
+
+    def error(self, message: str, *args, exc: Optional[BaseException] = None) -> None:
+        self._log(Severity.ERROR, message, args, exc)
+
+    def debug(self, message: str, *args) -> None:
+        self._log(Severity.DEBUG, message, args)
+
+    def _records(self, start: int, end: int) -> List[LogMessage]:
+        return [self._ring[sequence % self.capacity] for sequence in range(start, end)]
 
     def get_logs(self) -> List[LogMessage]:
-        return self.messages
+        """Get the records logged since the last flush, oldest first."""
+        with self._lock:
+            return self._records(self._flushed, self._written)
 
     def clear(self) -> None:
-        self.messages.clear()
-
-
-
-
+        with self._lock:
+            self._flushed = self._written
+
+    def drain(self) -> List[LogMessage]:
+        """Get the records logged since the last flush and mark them as flushed."""
+        with self._lock:
+            records = self._records(self._flushed, self._written)
+            self._flushed = self._written
+        return records
+
+    def _start_sink(self) -> None:
+        self._thread = threading.Thread(target=self._run_sink, name="boblogger-sink", daemon=True)
+        self._thread.start()
+
+    def _run_sink(self) -> None:
+        log_file = open(self.log_path, 'a') if self.log_path is not None else None
+        try:
+            while not self._stop_event.is_set():
+                self._wake.wait(self.sink_interval)
+                self._wake.clear()
+                self._write_output_safely(log_file)
+            self._write_output_safely(log_file)
+        finally:
+            if log_file is not None:
+                log_file.close()
+
+    def _write_output_safely(self, log_file) -> None:
+        # A failed write costs its records, not the thread and every record after them
+        try:
+            self._write_output(log_file)
+        except Exception as e:
+            print(f"Failed writing log records: {e!r}")
+
+    def _write_output(self, log_file) -> None:
+        with self._lock:
+            oldest = max(self._output, self._written - self.capacity)
+            self.output_dropped += oldest - self._output
+            records = self._records(oldest, self._written)
+            self._output = self._written
+        if not records:
+            return
+
+        # Formatting happens here, off the thread that logged
+        text = "\n".join(str(record) for record in records)
+        if self.echo:
+            print(text)
+        if log_file is not None:
+            log_file.write(text + "\n")
+            log_file.flush()
+
+    def close(self) -> None:
+        """Stop the output thread once everything logged so far has been written out."""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+        self._stop_event.clear()
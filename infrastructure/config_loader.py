@@ -1,37 +1,134 @@
+import hashlib
 import json
 import os
 from datetime import datetime, timedelta
+from types import MappingProxyType
+from typing import Callable, List, Mapping, Optional, Tuple
+
+
+class ConfigSnapshot:
+    """Immutable view of one version of the configuration."""
+
+    __slots__ = ("_version", "_digest", "_values", "_loaded_at")
+
+    def __init__(self, version: int, digest: str, values: dict, loaded_at: datetime):
+        object.__setattr__(self, "_version", version)
+        object.__setattr__(self, "_digest", digest)
+        object.__setattr__(self, "_values", MappingProxyType(dict(values)))
+        object.__setattr__(self, "_loaded_at", loaded_at)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConfigSnapshot is immutable")
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def digest(self) -> str:
+        return self._digest
+
+    @property
+    def values(self) -> Mapping:
+        return self._values
+
+    @property
+    def loaded_at(self) -> datetime:
+        return self._loaded_at
+
+    def get(self, key: str, default=None):
+        return self._values.get(key, default)
+
+    def __repr__(self) -> str:
+        return f"ConfigSnapshot(version={self._version}, digest={self._digest[:12]}, values={dict(self._values)})"
+
+
+ConfigListener = Callable[[ConfigSnapshot], None]
 
 
 class ConfigLoader:
-    def __init__(self, config_path: str):
+    def __init__(self, config_path: str, section: Optional[str] = None):
+        """
+        Args:
+            config_path: Path to the JSON config file
+            section: Line id whose entry under "lines" overrides the top-level values
+        """
         self._config_path = config_path
-        self._config = {}
+        self._section = section
+        self._raw_config = {}
+        self._snapshot = ConfigSnapshot(0, "", {}, datetime.now())
+        # (mtime_ns, size, inode) and content digest of the file as last read
+        self._file_stat: Optional[Tuple[int, int, int]] = None
+        self._file_digest: Optional[str] = None
+        self._listeners: List[ConfigListener] = []
         self._last_reload_time = None
         self._reload_interval = timedelta(seconds=1)
         self.reload_config()
 
     def should_reload(self) -> bool:
-        """Check if config needs to be reloaded and reload if necessary."""
-        if self._last_reload_time is None:
-            self.reload_config()
-            return True
+        """Check the file at most once per reload interval, True if the configuration changed."""
+        if self._last_reload_time is not None:
+            time_since_reload = datetime.now() - self._last_reload_time
+            if time_since_reload <= self._reload_interval:
+                return False
 
-        time_since_reload = datetime.now() - self._last_reload_time
-        if time_since_reload > self._reload_interval:
-            self.reload_config()
-            return True
+        self._last_reload_time = datetime.now()
+        if self._stat_file() == self._file_stat:
+            return False
+        return self.reload_config()
 
-        return False
+    def _stat_file(self) -> Tuple[int, int, int]:
+        stat = os.stat(self._config_path)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
 
-    def reload_config(self) -> None:
-        """Reload configuration from file and update timestamp."""
+    def reload_config(self) -> bool:
+        """Reload configuration from file, True if it differs from the current snapshot."""
         if not os.path.exists(self._config_path):
             raise FileNotFoundError(f"Config file not found at {self._config_path}")
 
-        with open(self._config_path, 'r') as file:
-            self._config = json.load(file)
-            self._last_reload_time = datetime.now()
+        file_stat = self._stat_file()
+        with open(self._config_path, 'rb') as file:
+            content = file.read()
+        self._last_reload_time = datetime.now()
+        self._file_stat = file_stat
+
+        file_digest = hashlib.blake2b(content, digest_size=16).hexdigest()
+        if file_digest == self._file_digest:
+            return False
+        self._file_digest = file_digest
+
+        self._raw_config = json.loads(content)
+        config = self._resolve_section(self._raw_config)
+        # Another line's section may have changed, this one did not
+        if self._snapshot.version > 0 and config == dict(self._snapshot.values):
+            return False
+
+        digest = hashlib.blake2b(json.dumps(config, sort_keys=True).encode(), digest_size=16).hexdigest()
+        self._snapshot = ConfigSnapshot(self._snapshot.version + 1, digest, config, self._last_reload_time)
+        for listener in list(self._listeners):
+            listener(self._snapshot)
+        return True
+
+    def _resolve_section(self, raw_config: dict) -> dict:
+        """Merge the line section over the top-level values shared by all lines."""
+        config = {key: value for key, value in raw_config.items() if key != 'lines'}
+        if self._section is not None:
+            config.update(raw_config.get('lines', {}).get(self._section, {}))
+        return config
+
+    def subscribe(self, listener: ConfigListener, notify_current: bool = True) -> None:
+        """Call listener with every new snapshot, and right away with the current one unless told otherwise."""
+        self._listeners.append(listener)
+        if notify_current:
+            listener(self._snapshot)
+
+    def unsubscribe(self, listener: ConfigListener) -> None:
+        self._listeners.remove(listener)
+
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        """Get the current configuration snapshot."""
+        return self._snapshot
 
     @property
     def last_reload_time(self) -> datetime:
@@ -41,11 +138,21 @@ class ConfigLoader:
     @property
     def config(self) -> dict:
         """Get the current configuration."""
-        return self._config.copy()
+        return dict(self._snapshot.values)
+
+    @property
+    def section(self) -> Optional[str]:
+        """Get the line id this loader reads, None for the top-level config."""
+        return self._section
+
+    @property
+    def line_ids(self) -> List[str]:
+        """Get the ids of the lines configured under "lines"."""
+        return list(self._raw_config.get('lines', {}).keys())
 
     def get_value(self, key: str, default=None):
         """Get a specific configuration value."""
-        return self._config.get(key, default)
+        return self._snapshot.get(key, default)
 
     def is_power_on(self) -> bool:
         """Check if power is on."""
@@ -55,8 +162,23 @@ class ConfigLoader:
         """Get the speed value."""
         return int(self.get_value('speed', 0))
 
+    def get_target_boxes_per_minute(self) -> Optional[float]:
+        """Get the throughput target, None when the speed is set as a duty cycle."""
+        target = self.get_value('target_boxes_per_minute')
+        return float(target) if target is not None else None
+
     def save_config(self, config: dict) -> None:
         """Save new configuration to file."""
+        raw_config = dict(self._raw_config)
+        if self._section is not None:
+            raw_config['lines'] = dict(raw_config.get('lines', {}))
+            raw_config['lines'][self._section] = config
+        else:
+            # Keep the per-line sections when the top-level values are replaced
+            raw_config = dict(config)
+            if 'lines' in self._raw_config and 'lines' not in config:
+                raw_config['lines'] = self._raw_config['lines']
+
         with open(self._config_path, 'w') as file:
-            json.dump(config, file, indent=2)
-        self.reload_config()
\ No newline at end of file
+            json.dump(raw_config, file, indent=2)
+        self.reload_config()
@@ -0,0 +1,76 @@
+import datetime
+import time
+from typing import List, Optional
+
+from analytics.metric import MetricsRegistry
+from infrastructure.boblogger import LogMessage
+
+
+def _utc_now() -> str:
+    return datetime.datetime.utcnow().isoformat() + "Z"
+
+
+def telemetry_envelope(data: dict) -> dict:
+    return {
+        "type": "export_telemetry",
+        "timestamp": _utc_now(),
+        "data": data
+    }
+
+
+def event_envelope(event_name: str, data: dict) -> dict:
+    return {
+        "type": "export_event",
+        "timestamp": _utc_now(),
+        "event": event_name,
+        "data": data
+    }
+
+
+def system_info_envelope() -> dict:
+    return {
+        "type": "export_system_info", }
+
+
+def logs_envelope(logs: List[LogMessage]) -> dict:
+    return {
+        "type": "flush_logs",
+        "data": [log.to_dict() for log in logs]
+    }
+
+
+class MetricsSequencer:
+    def __init__(self, source: str, full_interval_seconds: float = 30):
+        """
+        Builds a publisher's flush_metrics envelopes.
+
+        An envelope carries the metrics changed since the previous one, and all of them once
+        per full interval so late subscribers catch up. Envelopes are numbered consecutively
+        per source, so the subscriber can tell when it missed a delta.
+
+        Args:
+            source: Name of the publisher in its envelopes
+            full_interval_seconds: How often an envelope carries every metric
+        """
+        self.source = source
+        self.full_interval = full_interval_seconds
+        self.sequence = 0
+        self._last_full: Optional[float] = None
+
+    def envelope(self, registry: MetricsRegistry) -> Optional[dict]:
+        """Take the registry's metrics into the next envelope, None when there is nothing to send."""
+        now = time.monotonic()
+        full = self._last_full is None or now - self._last_full >= self.full_interval
+        data = registry.take_metrics(full=full)
+        if not data and not full:
+            return None
+        if full:
+            self._last_full = now
+        self.sequence += 1
+        return {
+            "type": "flush_metrics",
+            "source": self.source,
+            "seq": self.sequence,
+            "full": full,
+            "data": data
+        }
@@ -0,0 +1,113 @@
+import collections
+from typing import Deque, Dict, NamedTuple, Optional
+
+from analytics.metric import MetricsRegistry
+from enums import DropPolicy
+
+
+class TypePolicy(NamedTuple):
+    drop_policy: DropPolicy
+    # Messages queued at most, unbounded at 0. Conflated types hold one, a full
+    # queue that never drops makes the producer wait where it supports waiting.
+    max_queued: int = 0
+
+
+# Events come first when the queues are drained, they are never dropped
+DEFAULT_TYPE_POLICIES: Dict[str, TypePolicy] = {
+    "export_event": TypePolicy(DropPolicy.NEVER_DROP),
+    "export_telemetry": TypePolicy(DropPolicy.DROP_OLDEST, 1000),
+    "export_system_info": TypePolicy(DropPolicy.CONFLATE),
+    "flush_metrics": TypePolicy(DropPolicy.DROP_OLDEST, 100),
+    "flush_logs": TypePolicy(DropPolicy.DROP_OLDEST, 100),
+}
+DEFAULT_POLICY = TypePolicy(DropPolicy.DROP_OLDEST, 100)
+
+
+class PublishQueue:
+    def __init__(self, policy: TypePolicy):
+        """Messages of one type waiting for the socket, with the counts of those sent and dropped."""
+        self.policy = policy
+        self.items: Deque[dict] = collections.deque()
+        self.sent = 0
+        self.dropped = 0
+
+    def put(self, event: dict) -> None:
+        if self.policy.drop_policy == DropPolicy.CONFLATE:
+            self.dropped += len(self.items)
+            self.items.clear()
+        elif self.policy.drop_policy == DropPolicy.DROP_OLDEST and len(self.items) >= self.policy.max_queued:
+            self.items.popleft()
+            self.dropped += 1
+        self.items.append(event)
+
+    def pop(self) -> dict:
+        self.sent += 1
+        return self.items.popleft()
+
+    @property
+    def full(self) -> bool:
+        """Whether the queue never drops and holds max_queued messages, putting more would grow it past its bound."""
+        return self.policy.drop_policy == DropPolicy.NEVER_DROP and len(self.items) >= self.policy.max_queued > 0
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+class PublishQueues:
+    def __init__(self, type_policies: Optional[Dict[str, TypePolicy]] = None,
+                 defaults: Dict[str, TypePolicy] = DEFAULT_TYPE_POLICIES):
+        """
+        A publisher's queues, one per envelope type, drained in the order of the policies.
+
+        Args:
+            type_policies: Drop policy per envelope type, overriding the defaults
+            defaults: Drop policies of the types, in drain order. Types without one get DEFAULT_POLICY.
+        """
+        self.type_policies = dict(defaults)
+        if type_policies is not None:
+            self.type_policies.update(type_policies)
+        self.queues: Dict[str, PublishQueue] = {
+            event_type: PublishQueue(policy) for event_type, policy in self.type_policies.items()
+        }
+
+    def queue_for(self, event_type: str) -> PublishQueue:
+        queue = self.queues.get(event_type)
+        if queue is None:
+            queue = self.queues[event_type] = PublishQueue(DEFAULT_POLICY)
+        return queue
+
+    def put(self, event: dict) -> None:
+        self.queue_for(event["type"]).put(event)
+
+    def pop(self) -> dict:
+        """The next envelope to send, from the first type in drain order with envelopes queued."""
+        for queue in self.queues.values():
+            if queue:
+                return queue.pop()
+        raise IndexError("No envelope is queued")
+
+    def clear(self) -> int:
+        """Discard every queued envelope, returns how many there were."""
+        discarded = len(self)
+        for queue in self.queues.values():
+            queue.items.clear()
+        return discarded
+
+    def observe(self, registry: MetricsRegistry) -> None:
+        """Export the sent, dropped and queued counts per envelope type."""
+        for event_type, queue in self.queues.items():
+            name = metric_type_name(event_type)
+            registry.set_counter(f"publisher_{name}_sent", queue.sent)
+            registry.set_counter(f"publisher_{name}_dropped", queue.dropped)
+            registry.set_gauge(f"publisher_{name}_queued", len(queue))
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+
+def metric_type_name(event_type: str) -> str:
+    """Short name of an envelope type for metric names, export_telemetry becomes telemetry."""
+    for prefix in ("export_", "flush_"):
+        if event_type.startswith(prefix):
+            return event_type[len(prefix):]
+    return event_type
@@ -0,0 +1,185 @@
+import errno
+import os
+import struct
+from multiprocessing import resource_tracker, shared_memory
+from typing import List, Optional
+
+# Header, each index on its own cache line: magic and capacity, then the write position
+# (producer only), the read position (consumer only) and the consumer's waiting flag
+_MAGIC = b"BOBRING1"
+_INFO = struct.Struct("<8sQ")
+_POSITION = struct.Struct("<Q")
+_FLAG = struct.Struct("<Q")
+_WRITE_OFFSET = 64
+_READ_OFFSET = 128
+_WAITING_OFFSET = 192
+_DATA_OFFSET = 256
+
+# Records are a length followed by the payload, padded to 8 bytes. A record that would
+# run past the end of the buffer starts over at the beginning, after a wrap marker.
+_LENGTH = struct.Struct("<I")
+_WRAP = 0xFFFFFFFF
+_ALIGN = 8
+
+
+def _record_size(length: int) -> int:
+    return (_LENGTH.size + length + _ALIGN - 1) & ~(_ALIGN - 1)
+
+
+class ShmRing:
+    def __init__(self, name: str, capacity: int = 4 * 1024 * 1024, create: bool = True):
+        """
+        Single-producer, single-consumer ring buffer of messages in shared memory.
+
+        Each side only ever writes its own position, so neither needs a lock. The consumer
+        sleeps on a named pipe next to the ring: before sleeping it raises a waiting flag
+        and looks at the ring once more, the producer writes a byte to the pipe after a
+        message only when the flag is up. A busy ring costs no system calls.
+
+        The block outlives both processes, so a restarted sidecar carries on reading where
+        the previous one stopped. It goes away when unlink() is called or the Pi reboots.
+
+        Args:
+            name: Name of the shared memory block, the pipe is /tmp/<name>.notify
+            capacity: Bytes of messages the ring holds, a multiple of 8
+            create: Create the block when it does not exist, or only attach to it
+        """
+        if capacity % _ALIGN:
+            raise ValueError(f"Capacity must be a multiple of {_ALIGN}")
+        self.name = name
+        self.notify_path = f"/tmp/{name}.notify"
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=create, size=_DATA_OFFSET + capacity)
+            if create:
+                _INFO.pack_into(self.shm.buf, 0, _MAGIC, capacity)
+        except FileExistsError:
+            self.shm = shared_memory.SharedMemory(name=name)
+        # The block is shared by unrelated processes, neither should unlink it when it exits
+        resource_tracker.unregister(self.shm._name, "shared_memory")
+
+        magic, self.capacity = _INFO.unpack_from(self.shm.buf, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"Shared memory block {name} is not a message ring")
+        self.buffer = self.shm.buf
+        self._notify_fd: Optional[int] = None
+        self._keepalive_fd: Optional[int] = None
+
+    @property
+    def notify_fd(self) -> Optional[int]:
+        return self._notify_fd
+
+    def _position(self, offset: int) -> int:
+        return _POSITION.unpack_from(self.buffer, offset)[0]
+
+    @property
+    def used(self) -> int:
+        return self._position(_WRITE_OFFSET) - self._position(_READ_OFFSET)
+
+    @property
+    def free(self) -> int:
+        return self.capacity - self.used
+
+    def write(self, payload: bytes) -> bool:
+        """Append a message, False when the ring has no room for it. Producer only."""
+        size = _record_size(len(payload))
+        write = self._position(_WRITE_OFFSET)
+        position = write % self.capacity
+        to_end = self.capacity - position
+        needed = size + to_end if size > to_end else size
+        if needed > self.capacity - (write - self._position(_READ_OFFSET)):
+            return False
+
+        if size > to_end:
+            _LENGTH.pack_into(self.buffer, _DATA_OFFSET + position, _WRAP)
+            write += to_end
+            position = 0
+        start = _DATA_OFFSET + position
+        _LENGTH.pack_into(self.buffer, start, len(payload))
+        self.buffer[start + _LENGTH.size:start + _LENGTH.size + len(payload)] = payload
+        # Publish the record only once it is complete
+        _POSITION.pack_into(self.buffer, _WRITE_OFFSET, write + size)
+
+        if _FLAG.unpack_from(self.buffer, _WAITING_OFFSET)[0]:
+            _FLAG.pack_into(self.buffer, _WAITING_OFFSET, 0)
+            self._notify()
+        return True
+
+    def read_all(self, limit: int = 1024) -> List[bytes]:
+        """Take up to limit messages off the ring, oldest first. Consumer only."""
+        messages = []
+        read = self._position(_READ_OFFSET)
+        write = self._position(_WRITE_OFFSET)
+        while read < write and len(messages) < limit:
+            position = read % self.capacity
+            start = _DATA_OFFSET + position
+            length = _LENGTH.unpack_from(self.buffer, start)[0]
+            if length == _WRAP:
+                read += self.capacity - position
+                continue
+            messages.append(bytes(self.buffer[start + _LENGTH.size:start + _LENGTH.size + length]))
+            read += _record_size(length)
+        _POSITION.pack_into(self.buffer, _READ_OFFSET, read)
+        return messages
+
+    def _notify(self) -> None:
+        if self._notify_fd is None:
+            try:
+                self._notify_fd = os.open(self.notify_path, os.O_WRONLY | os.O_NONBLOCK)
+            except OSError:
+                # No consumer has the pipe open, it reads the ring when it starts
+                return
+        try:
+            os.write(self._notify_fd, b"\0")
+        except BlockingIOError:
+            # Enough wake-ups are pending already
+            pass
+        except OSError:
+            # The consumer went away, open the pipe again next time
+            os.close(self._notify_fd)
+            self._notify_fd = None
+
+    def open_notifications(self) -> int:
+        """Create and open the consumer's end of the pipe, returns its file descriptor. Consumer only."""
+        try:
+            os.mkfifo(self.notify_path)
+        except FileExistsError:
+            pass
+        self._notify_fd = os.open(self.notify_path, os.O_RDONLY | os.O_NONBLOCK)
+        # Without a writer the pipe reads as end of file, which would look readable forever once the producer exits
+        self._keepalive_fd = os.open(self.notify_path, os.O_WRONLY | os.O_NONBLOCK)
+        return self._notify_fd
+
+    def clear_notifications(self) -> None:
+        try:
+            while os.read(self._notify_fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def prepare_wait(self) -> bool:
+        """Raise the waiting flag, False when messages arrived meanwhile and there is no need to wait."""
+        _FLAG.pack_into(self.buffer, _WAITING_OFFSET, 1)
+        if self.used > 0:
+            _FLAG.pack_into(self.buffer, _WAITING_OFFSET, 0)
+            return False
+        return True
+
+    def close(self) -> None:
+        for fd in (self._notify_fd, self._keepalive_fd):
+            if fd is not None:
+                os.close(fd)
+        self._notify_fd = None
+        self._keepalive_fd = None
+        self.buffer = None
+        self.shm.close()
+
+    def unlink(self) -> None:
+        """Remove the block and the pipe, call on an open ring."""
+        # unlink() unregisters from the tracker, which must know the name first
+        resource_tracker.register(self.shm._name, "shared_memory")
+        self.shm.unlink()
+        try:
+            os.remove(self.notify_path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
@@ -0,0 +1,278 @@
+import collections
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import Deque, List, NamedTuple, Optional, Tuple
+
+# Record header: payload length, CRC32 of the payload, sequence number. A zero length
+# marks the end of the records written to a segment, segments are preallocated with zeros.
+_RECORD_HEADER = struct.Struct("<IIQ")
+_ACK = struct.Struct("<Q")
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".spool"
+SPOOL_ID_BYTES = 16
+
+# Frames between the spooling publisher (DEALER) and the subscriber (ROUTER):
+# the publisher sends [spool id, seq, oldest seq it still holds] followed by the message frames,
+# seq 0 for messages that are not spooled, and the subscriber answers with [spool id, last seq received]
+SPOOL_HEADER = struct.Struct("<16sQQ")
+SPOOL_ACK = struct.Struct("<16sQ")
+
+
+class SpoolEntry(NamedTuple):
+    seq: int
+    segment: "Segment"
+    offset: int
+    length: int
+
+
+class Segment:
+    def __init__(self, path: str, size: int, first_seq: int, create: bool):
+        self.path = path
+        self.first_seq = first_seq
+        self.last_seq = first_seq - 1
+        mode = os.O_RDWR | (os.O_CREAT | os.O_EXCL if create else 0)
+        fd = os.open(path, mode, 0o644)
+        try:
+            if create:
+                os.ftruncate(fd, size)
+            self.size = os.fstat(fd).st_size
+            self.map = mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+        self.end = 0
+
+    def fits(self, length: int) -> bool:
+        # Keep room for the zero header terminating the records
+        return self.end + 2 * _RECORD_HEADER.size + length <= self.size
+
+    def append(self, seq: int, payload: bytes) -> int:
+        offset = self.end
+        start = offset + _RECORD_HEADER.size
+        # Payload first, so a record torn by a crash fails its checksum rather than reading garbage
+        self.map[start:start + len(payload)] = payload
+        _RECORD_HEADER.pack_into(self.map, offset, len(payload), zlib.crc32(payload), seq)
+        self.end = start + len(payload)
+        self.last_seq = seq
+        return offset
+
+    def read(self, offset: int, length: int) -> bytes:
+        start = offset + _RECORD_HEADER.size
+        return self.map[start:start + length]
+
+    def scan(self) -> List[Tuple[int, int, int]]:
+        """Find the intact records, as (seq, offset, length), and move the end past them."""
+        records = []
+        offset = 0
+        while offset + _RECORD_HEADER.size <= self.size:
+            length, crc, seq = _RECORD_HEADER.unpack_from(self.map, offset)
+            start = offset + _RECORD_HEADER.size
+            if length == 0 or start + length > self.size:
+                break
+            if zlib.crc32(self.map[start:start + length]) != crc:
+                break
+            records.append((seq, offset, length))
+            self.last_seq = seq
+            offset = start + length
+        self.end = offset
+        return records
+
+    def sync(self) -> None:
+        self.map.flush()
+
+    def close(self) -> None:
+        self.map.close()
+
+    def remove(self) -> None:
+        self.close()
+        os.remove(self.path)
+
+
+class SegmentSpool:
+    def __init__(self, directory: str, segment_bytes: int = 1024 * 1024, max_segments: int = 16):
+        """
+        Append-only spool of messages waiting to be acknowledged, on memory-mapped segment files.
+
+        Appending copies the record into the page cache, the disk is only written when the
+        kernel writes the pages back or sync() is called, so it costs the caller no I/O.
+        Segments whose records are all acknowledged are deleted. When max_segments are in
+        use the oldest segment is dropped, acknowledged or not, which bounds the disk used
+        to segment_bytes * max_segments.
+
+        Args:
+            directory: Directory holding the segments, the acknowledged sequence number and the spool id
+            segment_bytes: Size of each segment file
+            max_segments: Segment files kept at most
+        """
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        if max_segments < 2:
+            raise ValueError("The spool needs at least two segments")
+        self.dropped = 0
+        self.segments: Deque[Segment] = collections.deque()
+        # Segment new records are appended to, None until the first append
+        self._current: Optional[Segment] = None
+        # Segments left for a new one since the last sync, sync() writes them through
+        # so the rollover keeps msync off the appending thread
+        self._unsynced: List[Segment] = []
+        # sync() runs on another thread, segments removed meanwhile are left for it to remove
+        self._lock = threading.Lock()
+        self._syncing = False
+        self._retired: List[Segment] = []
+        self.entries: Deque[SpoolEntry] = collections.deque()
+        os.makedirs(directory, exist_ok=True)
+        self.spool_id = self._load_spool_id()
+        self._ack_map = self._open_ack_map()
+        self.acked = _ACK.unpack_from(self._ack_map, 0)[0]
+        self.next_seq = self.acked + 1
+        self._open_segments()
+
+    def _load_spool_id(self) -> bytes:
+        # Identifies this spool's sequence numbers, a wiped spool starts a new sequence under a new id
+        path = os.path.join(self.directory, "id")
+        if os.path.exists(path):
+            with open(path, 'rb') as file:
+                spool_id = file.read()
+            if len(spool_id) == SPOOL_ID_BYTES:
+                return spool_id
+        spool_id = os.urandom(SPOOL_ID_BYTES)
+        with open(path, 'wb') as file:
+            file.write(spool_id)
+        return spool_id
+
+    def _open_ack_map(self) -> mmap.mmap:
+        path = os.path.join(self.directory, "ack")
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < _ACK.size:
+                os.ftruncate(fd, _ACK.size)
+            return mmap.mmap(fd, _ACK.size)
+        finally:
+            os.close(fd)
+
+    def _open_segments(self) -> None:
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX))
+        for name in names:
+            first_seq = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+            segment = Segment(os.path.join(self.directory, name), self.segment_bytes, first_seq, create=False)
+            records = segment.scan()
+            if not records or segment.last_seq <= self.acked:
+                segment.remove()
+                continue
+            self.segments.append(segment)
+            for seq, offset, length in records:
+                if seq > self.acked:
+                    self.entries.append(SpoolEntry(seq, segment, offset, length))
+            self.next_seq = max(self.next_seq, segment.last_seq + 1)
+        # New records go to a fresh segment, the tail of the last one may be torn
+
+    def _new_segment(self) -> Segment:
+        if self._current is not None:
+            self._unsynced.append(self._current)
+        if len(self.segments) >= self.max_segments:
+            self._drop_oldest_segment()
+        path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{self.next_seq:020d}{SEGMENT_SUFFIX}")
+        segment = Segment(path, self.segment_bytes, self.next_seq, create=True)
+        self.segments.append(segment)
+        return segment
+
+    def _drop_oldest_segment(self) -> None:
+        segment = self.segments.popleft()
+        while self.entries and self.entries[0].segment is segment:
+            self.entries.popleft()
+            self.dropped += 1
+        if segment.last_seq > self.acked:
+            self._store_ack(segment.last_seq)
+        self._remove_segment(segment)
+
+    def _remove_segment(self, segment: Segment) -> None:
+        with self._lock:
+            if segment in self._unsynced:
+                # Nothing left in it worth writing through
+                self._unsynced.remove(segment)
+            if self._syncing:
+                self._retired.append(segment)
+                return
+            segment.remove()
+
+    def append(self, payload: bytes) -> int:
+        """Spool a message, returns its sequence number."""
+        if len(payload) + 2 * _RECORD_HEADER.size > self.segment_bytes:
+            raise ValueError(f"Message of {len(payload)} bytes does not fit a {self.segment_bytes} byte segment")
+        if self._current is None or not self._current.fits(len(payload)):
+            self._current = self._new_segment()
+
+        seq = self.next_seq
+        offset = self._current.append(seq, payload)
+        self.entries.append(SpoolEntry(seq, self._current, offset, len(payload)))
+        self.next_seq += 1
+        return seq
+
+    def ack(self, seq: int) -> None:
+        """Acknowledge every message up to and including seq."""
+        if seq <= self.acked:
+            return
+        seq = min(seq, self.next_seq - 1)
+        while self.entries and self.entries[0].seq <= seq:
+            self.entries.popleft()
+        self._store_ack(seq)
+        # The segment being appended to stays, even when all of it is acknowledged
+        while self.segments and self.segments[0] is not self._current and self.segments[0].last_seq <= seq:
+            self._remove_segment(self.segments.popleft())
+
+    def _store_ack(self, seq: int) -> None:
+        self.acked = seq
+        _ACK.pack_into(self._ack_map, 0, seq)
+
+    @property
+    def first_unacked(self) -> int:
+        """Sequence number of the oldest message still spooled, next_seq when there is none."""
+        return self.entries[0].seq if self.entries else self.next_seq
+
+    @property
+    def pending(self) -> int:
+        return len(self.entries)
+
+    def read_from(self, seq: int, limit: int) -> List[Tuple[int, bytes]]:
+        """Get up to limit spooled messages as (seq, payload), starting at seq. Spooled sequence numbers are consecutive."""
+        if not self.entries:
+            return []
+        start = max(0, seq - self.entries[0].seq)
+        messages = []
+        for index in range(start, min(start + limit, len(self.entries))):
+            entry = self.entries[index]
+            messages.append((entry.seq, entry.segment.read(entry.offset, entry.length)))
+        return messages
+
+    def sync(self) -> None:
+        """Write the spooled messages and the acknowledged sequence number through to the disk."""
+        with self._lock:
+            self._syncing = True
+            segments, self._unsynced = self._unsynced, []
+            if self._current is not None:
+                segments.append(self._current)
+        try:
+            for segment in segments:
+                segment.sync()
+            self._ack_map.flush()
+        finally:
+            with self._lock:
+                self._syncing = False
+                retired, self._retired = self._retired, []
+                for segment in retired:
+                    segment.remove()
+
+    def close(self) -> None:
+        for segment in self.segments:
+            segment.close()
+        self.segments.clear()
+        self.entries.clear()
+        self._current = None
+        self._unsynced.clear()
+        self._ack_map.close()
+
@@ -1,41 +1,209 @@
-import json
-from datetime import datetime
+import os
+import socket
+import threading
+import time
+from queue import Full
+from typing import Dict, List, Optional
+
 import zmq
 
+from analytics.metric import MetricsRegistry
+from enums import DropPolicy, WireCodec
+from infrastructure.boblogger import LogMessage
+from infrastructure.envelopes import MetricsSequencer, event_envelope, logs_envelope, system_info_envelope, telemetry_envelope
+from infrastructure.publish_queue import DEFAULT_TYPE_POLICIES, PublishQueues, TypePolicy
+from infrastructure.wire import EnvelopeStamper, encode_event, topic_for
+
+# As the publisher defaults, except that events are bounded: a producer thread can wait, a coroutine cannot
+SYNC_TYPE_POLICIES: Dict[str, TypePolicy] = dict(
+    DEFAULT_TYPE_POLICIES, export_event=TypePolicy(DropPolicy.NEVER_DROP, 10000))
+
 
 class SyncPublisher:
-    def __init__(self, publish_address: str):
+    def __init__(self, publish_address: str, bind: bool = True, codec: WireCodec = WireCodec.JSON,
+                 full_metrics_interval_seconds: float = 30, source: Optional[str] = None,
+                 send_hwm: int = 1000, type_policies: Optional[Dict[str, TypePolicy]] = None,
+                 close_timeout_seconds: float = 1, full_timeout_seconds: float = 1, topic_frames: bool = False):
+        """
+        Publishes envelopes from any thread without blocking it, for callers that cannot await
+        such as sensor callbacks and hardware drivers.
+
+        Publishing only puts the envelope on a queue per type, a dedicated I/O thread owns the
+        ZMQ socket, encodes the envelopes and sends them. While the socket pushes back the
+        queues fill up and each type's policy decides what is dropped, as in AsyncPublisher.
+        Events are never dropped but their queue is bounded, a producer finding it full waits
+        up to full_timeout_seconds for the I/O thread to make room and then gets queue.Full.
+
+        Args:
+            publish_address: ZMQ endpoint to publish on
+            bind: Bind the endpoint, or connect to it (e.g. to a forwarding proxy)
+            codec: Wire encoding, binary codecs need subscribers that read the wire header
+            full_metrics_interval_seconds: How often a metrics flush carries every metric
+                rather than only the changed ones, so late subscribers catch up
+            source: Name of this publisher in its envelopes, defaults to host and process id
+            send_hwm: ZMQ send high-water mark, messages queued per subscriber
+            type_policies: Drop policy per envelope type, overriding SYNC_TYPE_POLICIES
+            close_timeout_seconds: How long close() waits for a stalled subscriber before
+                giving up on the envelopes still queued
+            full_timeout_seconds: How long a producer waits for room in a full queue that never drops
+            topic_frames: Prefix every message with its topic frame, as in AsyncPublisher
+        """
         self.publish_address = publish_address
-        self.context = zmq.Context()
-        self.pub = self.context.socket(zmq.PUB)
+        self.bind = bind
+        self.codec = codec
+        self.topic_frames = topic_frames
+        self.source = source if source is not None else f"{socket.gethostname()}:{os.getpid()}"
+        self.metrics_sequencer = MetricsSequencer(self.source, full_metrics_interval_seconds)
+        self.stamper = EnvelopeStamper(self.source)
+        self.send_hwm = send_hwm
+        self.close_timeout = close_timeout_seconds
+        self.full_timeout = full_timeout_seconds
+        # In drain order, events first
+        self.queues = PublishQueues(type_policies, defaults=SYNC_TYPE_POLICIES)
+        # Guards the queues and the state below, shared by the callers and the I/O thread
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._sending = False
+        self._closing = False
+        self._close_deadline: Optional[float] = None
+        self.abandoned = 0
+        self._thread: Optional[threading.Thread] = None
 
     def connect(self):
-        self.pub.bind(self.publish_address)
+        """Start the I/O thread, returns once its socket is bound or connected."""
+        ready = threading.Event()
+        errors: List[Exception] = []
+        self._thread = threading.Thread(target=self._run, args=(ready, errors), name="sync-publisher", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if errors:
+            self._thread.join()
+            self._thread = None
+            raise errors[0]
         print("Publisher connected and ready")
 
+    def _open_socket(self, context: zmq.Context) -> zmq.Socket:
+        pub = context.socket(zmq.PUB)
+        # Options only apply to connections made after they are set
+        pub.setsockopt(zmq.SNDHWM, self.send_hwm)
+        # Report a full subscriber queue as back pressure rather than silently dropping
+        pub.setsockopt(zmq.XPUB_NODROP, 1)
+        if self.bind:
+            pub.bind(self.publish_address)
+        else:
+            pub.connect(self.publish_address)
+        return pub
+
+    def _run(self, ready: threading.Event, errors: List[Exception]):
+        # ZMQ sockets are not thread-safe, this thread is the only one touching the socket
+        context = zmq.Context()
+        try:
+            pub = self._open_socket(context)
+        except zmq.ZMQError as e:
+            errors.append(e)
+            ready.set()
+            context.term()
+            return
+        ready.set()
+
+        try:
+            while True:
+                with self._changed:
+                    self._sending = False
+                    if not self.queues:
+                        # Wakes flush() callers waiting for the queues to empty
+                        self._changed.notify_all()
+                    while not self._closing and not self.queues:
+                        self._changed.wait()
+                    if not self.queues:
+                        break
+                    event = self.queues.pop()
+                    self._sending = True
+                    # Wakes producers waiting for room
+                    self._changed.notify_all()
+                # Encoding happens here, off the producer's thread
+                frames = encode_event(event, self.codec)
+                if self.topic_frames:
+                    frames = [topic_for(event["type"])] + frames
+                if not self._write(pub, frames):
+                    break
+        finally:
+            with self._changed:
+                self.abandoned += self.queues.clear()
+                self._sending = False
+                self._changed.notify_all()
+            pub.close(linger=int(self.close_timeout * 1000))
+            context.term()
+
+    def _write(self, pub: zmq.Socket, frames: List[bytes]) -> bool:
+        """Send one message, waiting while a subscriber is full. False when close() gave up on it."""
+        while True:
+            try:
+                pub.send_multipart(frames, zmq.NOBLOCK)
+                return True
+            except zmq.Again:
+                # The producers keep queueing meanwhile, their drop policies apply
+                pass
+            if self._close_deadline is not None and time.monotonic() >= self._close_deadline:
+                with self._lock:
+                    self.abandoned += 1
+                return False
+            pub.poll(100, zmq.POLLOUT)
+
+    def _send(self, event: dict):
+        with self._changed:
+            queue = self.queues.queue_for(event["type"])
+            if not self._changed.wait_for(lambda: self._closing or not queue.full, self.full_timeout):
+                raise Full(f"{len(queue)} {event['type']} envelopes are waiting for the socket")
+            if self._closing:
+                self.abandoned += 1
+                return
+            self.stamper.stamp(event)
+            queue.put(event)
+            self._changed.notify_all()
+
+    def observe_queues(self, registry: MetricsRegistry):
+        """Export the sent, dropped and queued counts per envelope type."""
+        with self._lock:
+            self.queues.observe(registry)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the I/O thread has handed every queued envelope to the socket, False on timeout."""
+        if self._thread is None:
+            return not self.queues
+        with self._changed:
+            return self._changed.wait_for(lambda: not self.queues and not self._sending, timeout)
+
     def publish_telemetry(self, data: dict):
-        event = {
-            "type": "export_telemetry",
-            "timestamp": datetime.now().isoformat(),
-            "data": data
-        }
-        message = json.dumps(event)
-        self.pub.send_string(message)
-        print(f"Published telemetry: {message}")
+        self._send(telemetry_envelope(data))
 
     def publish_event(self, event_name: str, data: dict):
-        event = {
-            "type": "export_event",
-            "timestamp": datetime.now().isoformat(),
-            "event": event_name,
-            "data": data
-        }
-        message = json.dumps(event)
-        self.pub.send_string(message)
-        print(f"Published event: {message}")
+        """Queue the event, raising queue.Full when the event queue stayed full for full_timeout_seconds."""
+        self._send(event_envelope(event_name, data))
+
+    def publish_system_info(self):
+        self._send(system_info_envelope())
+
+    def flush_logs(self, logs: List[LogMessage]):
+        self._send(logs_envelope(logs))
+
+    def flush_metrics(self, registry: MetricsRegistry):
+        """Publish the metrics changed since the previous flush, and all of them once per full metrics interval."""
+        self.observe_queues(registry)
+        with self._lock:
+            event = self.metrics_sequencer.envelope(registry)
+        if event is not None:
+            self._send(event)
 
     def close(self):
-        if self.pub:
-            self.pub.close()
-        if self.context:
-            self.context.term()
\ No newline at end of file
+        """Send what is queued, waiting at most close_timeout_seconds for a stalled subscriber, and stop the I/O thread."""
+        if self._thread is None:
+            return
+        with self._changed:
+            self._closing = True
+            self._close_deadline = time.monotonic() + self.close_timeout
+            self._changed.notify_all()
+        self._thread.join()
+        self._thread = None
+        if self.abandoned:
+            print(f"Publisher closed with {self.abandoned} envelopes unsent")
\ No newline at end of file
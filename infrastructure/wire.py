@@ -0,0 +1,287 @@
+import datetime
+import json
+import struct
+import time
+from typing import Dict, List, Optional
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from enums import WireCodec
+
+# First frame of messages on PUB sockets whose publisher opted into topic frames, subscribers
+# filter on it in ZMQ before any decoding. Sidecars predating topic frames cannot read such
+# messages, and subscribers picking topics miss every message of a publisher sending none.
+TOPICS = {
+    "export_telemetry": b"telemetry",
+    "export_event": b"event",
+    "flush_logs": b"logs",
+    "flush_metrics": b"metrics",
+    "export_system_info": b"system_info",
+}
+OTHER_TOPIC = b"other"
+_TOPIC_FRAMES = frozenset(TOPICS.values()) | {OTHER_TOPIC}
+
+# First frame of a legacy multipart message carrying several JSON envelopes as one array
+BATCH_FRAME = b"batch"
+
+# Binary messages are [header, payload], the header being magic, version, codec and flags
+WIRE_MAGIC = b"BOB"
+# Version 2 added the trace to struct codec records
+WIRE_VERSION = 2
+FLAG_BATCH = 0x01
+_HEADER = struct.Struct("<3sBBB")
+
+# Struct codec records: kind, flags, timestamp in microseconds, box count, machine speed,
+# followed by the event name (events only) and the line id (when present), each prefixed by its length,
+# then the trace (when present): sequence number, send time and the source prefixed by its length
+_RECORD = struct.Struct("<BBqQd")
+_TRACE = struct.Struct("<Qq")
+_JSON_RECORD = struct.Struct("<BI")
+_LENGTH = struct.Struct("<B")
+_FRAME_LENGTH = struct.Struct("<I")
+KIND_JSON = 0
+KIND_TELEMETRY = 1
+KIND_EVENT = 2
+RECORD_HAS_LINE_ID = 0x01
+RECORD_INT_SPEED = 0x02
+RECORD_HAS_TRACE = 0x04
+
+# Envelope key of the trace publishers stamp envelopes with
+TRACE = "trace"
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+class _IsoTimestamps:
+    """
+    Converts the publisher's "...Z" UTC timestamps to and from microseconds since the epoch.
+
+    Consecutive envelopes mostly fall within the same second, so the seconds part is
+    converted once and cached, leaving only the fraction to handle per envelope.
+    """
+
+    def __init__(self):
+        self._last_parsed = (None, 0)
+        self._last_formatted = (None, "")
+
+    def parse(self, timestamp: str) -> int:
+        # YYYY-MM-DDTHH:MM:SS, optionally followed by .ffffff, then Z
+        if not timestamp.endswith("Z") or len(timestamp) not in (20, 27):
+            raise ValueError(f"Not a UTC timestamp: {timestamp}")
+        head = timestamp[:19]
+        last_head, seconds_micros = self._last_parsed
+        if head != last_head:
+            seconds_micros = (datetime.datetime.fromisoformat(head) - _EPOCH) // _MICROSECOND
+            self._last_parsed = (head, seconds_micros)
+        if len(timestamp) == 20:
+            return seconds_micros
+        if timestamp[19] != ".":
+            raise ValueError(f"Not a UTC timestamp: {timestamp}")
+        return seconds_micros + int(timestamp[20:26])
+
+    def format(self, micros: int) -> str:
+        seconds, fraction = divmod(micros, 1_000_000)
+        last_seconds, head = self._last_formatted
+        if seconds != last_seconds:
+            head = (_EPOCH + datetime.timedelta(seconds=seconds)).isoformat()
+            self._last_formatted = (seconds, head)
+        # Same shape as datetime.isoformat(), which leaves out a zero fraction
+        if fraction:
+            return f"{head}.{fraction:06d}Z"
+        return head + "Z"
+
+
+_timestamps = _IsoTimestamps()
+
+
+def topic_for(event_type: str) -> bytes:
+    return TOPICS.get(event_type, OTHER_TOPIC)
+
+
+class EnvelopeStamper:
+    def __init__(self, source: str):
+        """
+        Stamps envelopes with the trace subscribers measure latency and loss with.
+
+        The trace holds the publisher, a sequence number and the CLOCK_MONOTONIC time the
+        envelope was published at, in nanoseconds. Sequence numbers are consecutive per
+        envelope type, as subscribers may only receive some of the topics. The send time
+        is only comparable on the same machine.
+
+        Args:
+            source: Name of the publisher, distinct per process
+        """
+        self.source = source
+        self.sequences: Dict[str, int] = {}
+
+    def stamp(self, event: dict) -> None:
+        sequence = self.sequences.get(event["type"], 0) + 1
+        self.sequences[event["type"]] = sequence
+        event[TRACE] = {"source": self.source, "seq": sequence, "sent": time.monotonic_ns()}
+
+
+def encode_event(event: dict, codec: WireCodec = WireCodec.JSON) -> List[bytes]:
+    """
+    Encode one envelope.
+
+    JSON keeps the original single-frame text message, so consumers that predate
+    the header keep working as long as the publisher sticks to it and sends no topic frame.
+    """
+    if codec == WireCodec.JSON:
+        return [json.dumps(event).encode()]
+    return [_HEADER.pack(WIRE_MAGIC, WIRE_VERSION, codec.value, 0), _encode_payload([event], codec)]
+
+
+def encode_batch(events: List[dict], codec: WireCodec = WireCodec.JSON) -> List[bytes]:
+    """Serialize the envelopes together, one encoding pass and one ZMQ message for the whole batch."""
+    if codec == WireCodec.JSON:
+        return [BATCH_FRAME, json.dumps(events).encode()]
+    return [_HEADER.pack(WIRE_MAGIC, WIRE_VERSION, codec.value, FLAG_BATCH), _encode_payload(events, codec)]
+
+
+def decode_message(frames: List[bytes]) -> List[dict]:
+    """Decode a received message into its envelopes, whatever codec and framing it was sent with."""
+    if frames and frames[0] in _TOPIC_FRAMES:
+        frames = frames[1:]
+    if len(frames) >= 2 and len(frames[0]) == _HEADER.size and frames[0][:3] == WIRE_MAGIC:
+        _, version, codec, _ = _HEADER.unpack(frames[0])
+        if version > WIRE_VERSION:
+            raise ValueError(f"Unsupported wire version {version}")
+        return _decode_payload(frames[1], WireCodec(codec))
+    if len(frames) >= 2 and frames[0] == BATCH_FRAME:
+        return json.loads(frames[1].decode())
+    return [json.loads(frames[0].decode())]
+
+
+def _encode_payload(events: List[dict], codec: WireCodec) -> bytes:
+    if codec == WireCodec.MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("The msgpack wire codec needs the msgpack package")
+        return msgpack.packb(events)
+    return b"".join(_encode_record(event) for event in events)
+
+
+def _decode_payload(payload: bytes, codec: WireCodec) -> List[dict]:
+    if codec == WireCodec.MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("The msgpack wire codec needs the msgpack package")
+        return msgpack.unpackb(payload)
+    if codec == WireCodec.JSON:
+        return json.loads(payload.decode())
+
+    events = []
+    offset = 0
+    while offset < len(payload):
+        event, offset = _decode_record(payload, offset)
+        events.append(event)
+    return events
+
+
+def _encode_record(event: dict) -> bytes:
+    record = _encode_machine_record(event)
+    if record is not None:
+        return record
+    body = json.dumps(event).encode()
+    return _JSON_RECORD.pack(KIND_JSON, len(body)) + body
+
+
+def _encode_machine_record(event: dict) -> Optional[bytes]:
+    """Pack a telemetry or event envelope, None when it does not fit the fixed layout."""
+    event_type = event.get("type")
+    trace = event.get(TRACE)
+    extra_keys = 0 if trace is None else 1
+    if event_type == "export_telemetry" and len(event) == 3 + extra_keys:
+        kind = KIND_TELEMETRY
+    elif event_type == "export_event" and len(event) == 4 + extra_keys:
+        kind = KIND_EVENT
+    else:
+        return None
+
+    try:
+        data = event["data"]
+        box_count = data["totaloutputunitcount"]
+        speed = data["machinespeed"]
+        line_id = data.get("lineid")
+        if len(data) != (2 if line_id is None else 3) or type(box_count) is not int or type(speed) not in (int, float):
+            return None
+
+        flags = RECORD_INT_SPEED if type(speed) is int else 0
+        if line_id is not None:
+            flags |= RECORD_HAS_LINE_ID
+        if trace is not None:
+            if len(trace) != 3:
+                return None
+            flags |= RECORD_HAS_TRACE
+        record = _RECORD.pack(kind, flags, _timestamps.parse(event["timestamp"]), box_count, speed)
+        if kind == KIND_EVENT:
+            name = event["event"].encode()
+            record += _LENGTH.pack(len(name)) + name
+        if line_id is not None:
+            line_id = line_id.encode()
+            record += _LENGTH.pack(len(line_id)) + line_id
+        if trace is not None:
+            source = trace["source"].encode()
+            record += _TRACE.pack(trace["seq"], trace["sent"]) + _LENGTH.pack(len(source)) + source
+        return record
+    except (KeyError, TypeError, ValueError, AttributeError, struct.error):
+        # Missing fields, other types, or values out of the layout's range
+        return None
+
+
+def _decode_record(payload: bytes, offset: int):
+    kind = payload[offset]
+    if kind == KIND_JSON:
+        _, length = _JSON_RECORD.unpack_from(payload, offset)
+        offset += _JSON_RECORD.size
+        return json.loads(payload[offset:offset + length].decode()), offset + length
+
+    _, flags, timestamp_micros, box_count, speed = _RECORD.unpack_from(payload, offset)
+    offset += _RECORD.size
+    data = {
+        "totaloutputunitcount": box_count,
+        "machinespeed": int(speed) if flags & RECORD_INT_SPEED else speed,
+    }
+    event = {
+        "type": "export_telemetry" if kind == KIND_TELEMETRY else "export_event",
+        "timestamp": _timestamps.format(timestamp_micros),
+    }
+    if kind == KIND_EVENT:
+        length = payload[offset]
+        event["event"] = payload[offset + 1:offset + 1 + length].decode()
+        offset += 1 + length
+    if flags & RECORD_HAS_LINE_ID:
+        length = payload[offset]
+        data["lineid"] = payload[offset + 1:offset + 1 + length].decode()
+        offset += 1 + length
+    event["data"] = data
+    if flags & RECORD_HAS_TRACE:
+        sequence, sent = _TRACE.unpack_from(payload, offset)
+        offset += _TRACE.size
+        length = payload[offset]
+        event[TRACE] = {
+            "source": payload[offset + 1:offset + 1 + length].decode(),
+            "seq": sequence,
+            "sent": sent,
+        }
+        offset += 1 + length
+    return event, offset
+
+
+def pack_frames(frames: List[bytes]) -> bytes:
+    """Join the frames of a multipart message into one buffer, for transports without multipart messages."""
+    return b"".join(_FRAME_LENGTH.pack(len(frame)) + frame for frame in frames)
+
+
+def unpack_frames(payload: bytes) -> List[bytes]:
+    frames = []
+    offset = 0
+    while offset < len(payload):
+        length = _FRAME_LENGTH.unpack_from(payload, offset)[0]
+        offset += _FRAME_LENGTH.size
+        frames.append(payload[offset:offset + length])
+        offset += length
+    return frames
@@ -22,6 +22,14 @@ class IMotorController(ABC):
     def slow_down(self) -> None:
         pass
 
+    def set_speed(self, speed: float) -> None:
+        """Move towards the given duty cycle, one step per call for motors without absolute control"""
+        current_speed = self.get_speed()
+        if speed > current_speed:
+            self.speed_up()
+        elif speed < current_speed:
+            self.slow_down()
+
     @abstractmethod
     def get_speed(self) -> int:
         pass
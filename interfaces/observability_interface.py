@@ -22,4 +22,20 @@ class IObservabilityController(ABC):
 
     @abstractmethod
     async def observe_system_info(self):
+        pass
+
+    async def observe_tick_stats(self, stats) -> None:
+        """Record the control loop tick scheduling statistics"""
+        pass
+
+    async def observe_tick_profile(self, profiler) -> None:
+        """Record the per-phase tick duration percentiles"""
+        pass
+
+    async def observe_throughput(self, summary: dict) -> None:
+        """Record the windowed box rates, inter-arrival percentiles and gaps"""
+        pass
+
+    async def observe_sensor(self, stats: dict) -> None:
+        """Record the sensor's counters"""
         pass
\ No newline at end of file
@@ -1,8 +1,25 @@
 
 # src/interfaces/sensor_interface.py
 from abc import ABC, abstractmethod
+from typing import List, NamedTuple, Optional
+
+
+class SensorEdge(NamedTuple):
+    # Monotonic clock time of the edge in seconds
+    timestamp: float
+    # True when the box entered the beam, False when it left
+    rising: bool
+
 
 class ISensorController(ABC):
     @abstractmethod
     def is_box_visible(self) -> bool:
         pass
+
+    def drain_box_edges(self) -> Optional[List[SensorEdge]]:
+        """Return the edges buffered since the last call, or None if the sensor is only polled"""
+        return None
+
+    def stats(self) -> dict:
+        """Return the sensor's counters by metric name, e.g. edges it had to drop"""
+        return {}
@@ -0,0 +1,28 @@
+
+# src/interfaces/speed_strategy_interface.py
+from abc import ABC, abstractmethod
+from typing import NamedTuple, Optional
+
+
+class SpeedInputs(NamedTuple):
+    # Monotonic clock time of the tick in seconds
+    now: float
+    # Duty cycle the motor currently runs at
+    machine_speed: float
+    # Duty cycle requested by the config
+    desired_speed: float
+    # Throughput requested by the config, None to target the duty cycle
+    target_boxes_per_minute: Optional[float]
+    # Measured throughput
+    boxes_per_minute: float
+
+
+class ISpeedStrategy(ABC):
+    @abstractmethod
+    def next_speed(self, inputs: SpeedInputs) -> Optional[float]:
+        """Return the duty cycle to command this tick, None to leave the motor as is"""
+        pass
+
+    def reset(self) -> None:
+        """Forget the controller state, called while the machine is off"""
+        pass
@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+
+from analytics.metric import MetricsRegistry
+from core.line_supervisor import LineSupervisor
+from core.sharded_supervisor import ShardedLineSupervisor
+from implementations.advanced_motor_controller import AdvancedMotorController
+from implementations.infra_red_sensor_controller import EdgeTriggeredIRSensorController
+from infrastructure.async_publisher import AsyncPublisher
+from infrastructure.boblogger import BobLogger
+from infrastructure.config_loader import ConfigLoader
+
+
+def hardware_line(line_id: str, config_loader: ConfigLoader):
+    motor = AdvancedMotorController(pin=int(config_loader.get_value("motor_pin", 18)))
+    sensor = EdgeTriggeredIRSensorController(pin=int(config_loader.get_value("sensor_pin", 22)))
+    return motor, sensor
+
+
+async def run_in_process():
+    async_publisher = AsyncPublisher(
+        publish_address="tcp://127.0.0.1:5555"
+    )
+    logger = BobLogger()
+    await async_publisher.connect()
+
+    supervisor = LineSupervisor(
+        publisher=async_publisher,
+        logger=logger,
+        metrics_registry=MetricsRegistry(),
+        flush_millis=100
+    )
+
+    for line_id in ConfigLoader(config_path="config.json").line_ids:
+        config_loader = ConfigLoader(config_path="config.json", section=line_id)
+        motor, sensor = hardware_line(line_id, config_loader)
+        supervisor.add_line(
+            line_id=line_id,
+            motor=motor,
+            sensor=sensor,
+            config_loader=config_loader,
+            delay_millis=float(config_loader.get_value("delay_millis", 100))
+        )
+
+    try:
+        await supervisor.run()
+    except:
+        await supervisor.stop()
+
+
+async def run_sharded(workers: int):
+    supervisor = ShardedLineSupervisor(
+        line_ids=ConfigLoader(config_path="config.json").line_ids,
+        line_factory=hardware_line,
+        config_path="config.json",
+        publish_address="tcp://127.0.0.1:5555",
+        workers=workers
+    )
+    await supervisor.run()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Run every line configured in config.json")
+    parser.add_argument("--sharded", action="store_true", help="Run the lines in a pool of worker processes")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes, defaults to one per core")
+    args = parser.parse_args()
+
+    if args.sharded:
+        await run_sharded(args.workers)
+    else:
+        await run_in_process()
+
+if __name__ == "__main__":
+    asyncio.run(main())
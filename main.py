@@ -1,18 +1,50 @@
+import argparse
 import asyncio
 
 from analytics.analytics_client import produce_machine_iot_client
 from core.control_loop import ControlLoop
+from core.tick_profiler import TickProfiler
 from implementations.advanced_motor_controller import AdvancedMotorController
-from implementations.infra_red_sensor_controller import IRSensorController
+from implementations.infra_red_sensor_controller import EdgeTriggeredIRSensorController
 from implementations.in_memory_observability_controller import InMemoryObservabilityController
 from implementations.queued_observability_controller import QueuedObservabilityController
 from implementations.simple_motor_controller import SimpleMotorController
-from infrastructure.async_publisher import AsyncPublisher
+from implementations.speed_strategies import ClosedLoopSpeedStrategy, RampProfile
+from infrastructure.async_publisher import BatchingAsyncPublisher, SharedMemoryPublisher, SpoolingAsyncPublisher
 from infrastructure.boblogger import BobLogger
 from infrastructure.config_loader import ConfigLoader
+from infrastructure.spool import SegmentSpool
+
+
+def create_publisher(transport: str, spool_dir: str, topic_frames: bool):
+    if transport == "spool":
+        # Telemetry and events survive the sidecar restarting, run it with --transport spool
+        return SpoolingAsyncPublisher(
+            publish_address="tcp://127.0.0.1:5556",
+            spool=SegmentSpool(directory=spool_dir)
+        )
+    if transport == "shm":
+        # Same machine only, the sidecar reads the ring with --transport shm
+        return SharedMemoryPublisher(ring_name="bober-ring")
+    return BatchingAsyncPublisher(
+        publish_address="tcp://127.0.0.1:5555",
+        window_millis=500,
+        max_batch_size=64,
+        topic_frames=topic_frames
+    )
 
 
 async def main():
+    parser = argparse.ArgumentParser(description="Run the conveyor control loop")
+    parser.add_argument("--transport", choices=["pub", "spool", "shm"], default="pub",
+                        help="Publish to the sidecar over PUB/SUB, spool and deliver with acknowledgements, "
+                             "or write to a shared memory ring")
+    parser.add_argument("--spool-dir", default="spool", help="Directory of the spool for --transport spool")
+    parser.add_argument("--topic-frames", action="store_true",
+                        help="Prefix published messages with their topic so sidecars can pick streams with --topics "
+                             "(pub only, sidecars that predate topic frames cannot read them)")
+    args = parser.parse_args()
+
     #
     # analytics_client = produce_machine_iot_client()
     #
@@ -28,14 +60,12 @@ async def main():
     #     )
     # )
 
-    async_publisher = AsyncPublisher(
-        publish_address="tcp://127.0.0.1:5555"
-    )
+    async_publisher = create_publisher(args.transport, args.spool_dir, args.topic_frames)
     logger = BobLogger()
     await async_publisher.connect()
     control_loop = ControlLoop(
         motor=AdvancedMotorController(),
-        sensor=IRSensorController(),
+        sensor=EdgeTriggeredIRSensorController(debounce_millis=5),
         observability=QueuedObservabilityController(
             publisher=async_publisher,
             logger=logger
@@ -44,12 +74,17 @@ async def main():
         config_loader=ConfigLoader(
             config_path="config.json"
         ),
-        logger=logger
+        logger=logger,
+        profiler=TickProfiler(report_interval_seconds=60),
+        speed_strategy=ClosedLoopSpeedStrategy(ramp=RampProfile(max_rate=4))
     )
     try:
         await control_loop.run()
     except:
         await control_loop.stop()
+    finally:
+        await async_publisher.flush()
+        logger.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,214 @@
+# src/simulation/conveyor.py
+import math
+import random
+from collections import deque
+from typing import List, Optional
+
+from interfaces.motor_interface import IMotorController
+from interfaces.sensor_interface import ISensorController, SensorEdge
+from simulation.virtual_clock import VirtualClock
+
+
+class ConveyorModel:
+    def __init__(self,
+                 clock: VirtualClock,
+                 arrival_rate: float = 0.5,
+                 sensor_distance: float = 1.0,
+                 box_length: float = 0.2,
+                 min_gap: float = 0.05,
+                 max_queue: int = 20,
+                 speed_per_duty: float = 0.05,
+                 stall_duty: float = 8.0,
+                 ramp_time_constant: float = 0.5,
+                 seed: Optional[int] = None):
+        """
+        Conveyor belt with a box loader at one end and an IR beam further down.
+
+        Boxes arrive at the loader as a Poisson process and are put on the belt as
+        soon as the previous box has moved far enough, up to max_queue boxes waiting.
+        The belt speed follows the motor duty cycle through a first-order lag. The
+        model is evaluated in closed form whenever it is queried, so it costs nothing
+        between queries and the beam edges get exact timestamps whatever the tick rate.
+
+        Args:
+            clock: Clock the model is evaluated against
+            arrival_rate: Mean box arrivals per second at the loader
+            sensor_distance: Distance from the loader to the beam in meters
+            box_length: Box length along the belt in meters
+            min_gap: Minimum gap the loader leaves between two boxes in meters
+            max_queue: Boxes waiting at the loader before new arrivals are rejected
+            speed_per_duty: Belt speed in m/s gained per duty cycle unit above the stall
+            stall_duty: Duty cycle below which the belt does not move
+            ramp_time_constant: Time constant of the motor speed response in seconds
+            seed: Seed of the arrival process
+        """
+        self.clock = clock
+        self.arrival_rate = arrival_rate
+        self.sensor_distance = sensor_distance
+        self.box_length = box_length
+        self.pitch = box_length + min_gap
+        self.max_queue = max_queue
+        self.speed_per_duty = speed_per_duty
+        self.stall_duty = stall_duty
+        self.tau = ramp_time_constant
+        self.random = random.Random(seed)
+
+        self.time = clock.monotonic()
+        # Distance travelled by the belt since the start, in meters
+        self.odometer = 0.0
+        self.velocity = 0.0
+        self.target_velocity = 0.0
+        self.duty_cycle = 0.0
+        self.next_arrival = self.time + self.random.expovariate(arrival_rate)
+        self.last_placed = -math.inf
+        # Odometer positions of the boxes waiting at the loader
+        self.queue = deque()
+        # Odometer readings at which the beam changes state, in increasing order
+        self.thresholds = deque()
+        self.edges = deque()
+        self.visible = False
+
+        self.boxes_arrived = 0
+        self.boxes_rejected = 0
+        self.boxes_passed = 0
+
+    def set_duty_cycle(self, duty_cycle: float) -> None:
+        self.advance()
+        self.duty_cycle = duty_cycle
+        self.target_velocity = max(0.0, self.speed_per_duty * (duty_cycle - self.stall_duty))
+
+    def _distance(self, v0: float, dt: float) -> float:
+        vt = self.target_velocity
+        return vt * dt + (v0 - vt) * self.tau * (1 - math.exp(-dt / self.tau))
+
+    def _velocity(self, v0: float, dt: float) -> float:
+        vt = self.target_velocity
+        return vt + (v0 - vt) * math.exp(-dt / self.tau)
+
+    def _time_to_travel(self, distance: float, v0: float, horizon: float) -> float:
+        """Time at which the belt has travelled distance, known to happen within horizon."""
+        low, high = 0.0, horizon
+        dt = horizon / 2
+        for _ in range(50):
+            error = self._distance(v0, dt) - distance
+            if abs(error) < 1e-9:
+                break
+            if error > 0:
+                high = dt
+            else:
+                low = dt
+            velocity = self._velocity(v0, dt)
+            # Newton step, falling back to bisection when it leaves the bracket
+            step = dt - error / velocity if velocity > 0 else -1
+            dt = step if low < step < high else (low + high) / 2
+        return dt
+
+    def _arrive(self, belt_position: float) -> None:
+        self.boxes_arrived += 1
+        while self.queue and self.queue[0] <= belt_position:
+            self.queue.popleft()
+        if len(self.queue) >= self.max_queue:
+            self.boxes_rejected += 1
+            return
+
+        placed = max(belt_position, self.last_placed + self.pitch)
+        self.last_placed = placed
+        if placed > belt_position:
+            self.queue.append(placed)
+        self.thresholds.append((placed + self.sensor_distance, True))
+        self.thresholds.append((placed + self.sensor_distance + self.box_length, False))
+
+    def advance(self) -> None:
+        """Bring the model up to the current clock time."""
+        now = self.clock.monotonic()
+        horizon = now - self.time
+        if horizon <= 0:
+            return
+
+        start, v0 = self.time, self.velocity
+        while self.next_arrival <= now:
+            self._arrive(self.odometer + self._distance(v0, self.next_arrival - start))
+            self.next_arrival += self.random.expovariate(self.arrival_rate)
+
+        travelled = self._distance(v0, horizon)
+        while self.thresholds and self.thresholds[0][0] <= self.odometer + travelled:
+            threshold, rising = self.thresholds.popleft()
+            dt = self._time_to_travel(threshold - self.odometer, v0, horizon)
+            self.edges.append(SensorEdge(timestamp=start + dt, rising=rising))
+            self.visible = rising
+            if rising:
+                self.boxes_passed += 1
+
+        self.odometer += travelled
+        self.velocity = self._velocity(v0, horizon)
+        self.time = now
+
+    def drain_edges(self) -> List[SensorEdge]:
+        self.advance()
+        edges = list(self.edges)
+        self.edges.clear()
+        return edges
+
+
+class SimulatedMotorController(IMotorController):
+    def __init__(self, model: ConveyorModel, default_speed: int = 10, max_speed: int = 14):
+        self.model = model
+        self.default_speed = default_speed
+        self.max_speed = max_speed
+        self.current_speed = 0
+        self.running = False
+
+    def _apply(self, speed: int) -> None:
+        self.current_speed = speed
+        self.model.set_duty_cycle(speed)
+
+    def start_motor(self) -> None:
+        if not self.running:
+            self.running = True
+            self._apply(self.default_speed)
+
+    def stop_motor(self) -> None:
+        if self.running:
+            self.running = False
+            self._apply(0)
+
+    def speed_up(self) -> None:
+        if self.running and self.current_speed < self.max_speed:
+            self._apply(self.current_speed + 1)
+
+    def slow_down(self) -> None:
+        if self.running and self.current_speed > self.default_speed:
+            self._apply(self.current_speed - 1)
+
+    def set_speed(self, speed: float) -> None:
+        if self.running:
+            self._apply(min(max(speed, self.default_speed), self.max_speed))
+
+    def get_speed(self) -> int:
+        return self.current_speed
+
+    def is_running(self) -> bool:
+        return self.running
+
+
+class SimulatedSensorController(ISensorController):
+    def __init__(self, model: ConveyorModel, edge_triggered: bool = True):
+        """
+        Args:
+            model: Conveyor the beam belongs to
+            edge_triggered: Report timestamped edges, or only support polling
+        """
+        self.model = model
+        self.edge_triggered = edge_triggered
+
+    def is_box_visible(self) -> bool:
+        self.model.advance()
+        if not self.edge_triggered:
+            # Nobody drains the edges of a polled sensor
+            self.model.edges.clear()
+        return self.model.visible
+
+    def drain_box_edges(self) -> Optional[List[SensorEdge]]:
+        if not self.edge_triggered:
+            return None
+        return self.model.drain_edges()
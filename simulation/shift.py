@@ -0,0 +1,118 @@
+# Run from the repository root: python -m simulation.shift --hours 24
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import tempfile
+import time
+from typing import Optional
+
+from core.control_loop import ControlLoop
+from implementations.recording_observability_controller import RecordingObservabilityController
+from implementations.speed_strategies import ClosedLoopSpeedStrategy
+from infrastructure.boblogger import BobLogger
+from infrastructure.config_loader import ConfigLoader
+from interfaces.speed_strategy_interface import ISpeedStrategy
+from simulation.conveyor import ConveyorModel, SimulatedMotorController, SimulatedSensorController
+from simulation.virtual_clock import VirtualClock
+
+
+class StopAt:
+    """Tick listener ending the control loop once the virtual clock reaches the end of the shift."""
+
+    def __init__(self, clock: VirtualClock, end: float):
+        self.clock = clock
+        self.end = end
+
+    def __call__(self, control_loop: ControlLoop) -> None:
+        if self.clock.monotonic() >= self.end:
+            control_loop.is_running = False
+
+
+async def run_shift(config_path: str,
+                    hours: float,
+                    period_millis: float = 100,
+                    arrival_rate: float = 0.5,
+                    edge_triggered: bool = True,
+                    speed_strategy: Optional[ISpeedStrategy] = None,
+                    seed: int = 0) -> dict:
+    """Run a ControlLoop against a simulated conveyor for a shift of virtual time."""
+    clock = VirtualClock()
+    model = ConveyorModel(clock, arrival_rate=arrival_rate, seed=seed)
+    logger = BobLogger(echo=False)
+    observability = RecordingObservabilityController(logger=logger, clock=clock)
+    control_loop = ControlLoop(
+        motor=SimulatedMotorController(model),
+        sensor=SimulatedSensorController(model, edge_triggered=edge_triggered),
+        observability=observability,
+        config_loader=ConfigLoader(config_path=config_path),
+        logger=logger,
+        delay_millis=period_millis,
+        clock=clock,
+        speed_strategy=speed_strategy
+    )
+    control_loop.add_tick_listener(StopAt(clock, clock.monotonic() + hours * 3600))
+
+    started_at = time.perf_counter()
+    await control_loop.run()
+    final_speed = control_loop.motor.get_speed()
+    await control_loop.stop()
+    elapsed = time.perf_counter() - started_at
+
+    # Boxes still inside the beam when the shift ends have been counted by both
+    return {
+        "virtual_hours": (clock.monotonic() - clock.start) / 3600,
+        "real_seconds": elapsed,
+        "speedup": (clock.monotonic() - clock.start) / elapsed,
+        "ticks": control_loop.scheduler.stats.ticks,
+        "boxes_arrived": model.boxes_arrived,
+        "boxes_rejected": model.boxes_rejected,
+        "boxes_passed": model.boxes_passed,
+        "boxes_counted": control_loop.box_count,
+        "final_speed": final_speed,
+        "telemetry_records": len(observability.telemetry),
+        "events": len(observability.events),
+        "tick_p99_ms": control_loop.profiler.histograms[-1].percentile(99) * 1000,
+        **control_loop.throughput.summary(clock.monotonic()),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Simulate a conveyor shift on a virtual clock")
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--period-ms", type=float, default=100)
+    parser.add_argument("--arrival-rate", type=float, default=0.5, help="Mean boxes per second at the loader")
+    parser.add_argument("--speed", type=int, default=12, help="Desired motor duty cycle")
+    parser.add_argument("--target-bpm", type=float, default=None, help="Throughput target in boxes per minute")
+    parser.add_argument("--closed-loop", action="store_true", help="Use the ramped closed-loop speed strategy")
+    parser.add_argument("--polled", action="store_true", help="Poll the sensor instead of draining edges")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        config_path = os.path.join(directory, "config.json")
+        with open(config_path, 'w') as file:
+            config = {"speed": args.speed, "power": "ON"}
+            if args.target_bpm is not None:
+                config["target_boxes_per_minute"] = args.target_bpm
+            json.dump(config, file)
+
+        # The mocks print on every call, which would dominate the run time
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            result = await run_shift(
+                config_path,
+                hours=args.hours,
+                period_millis=args.period_ms,
+                arrival_rate=args.arrival_rate,
+                edge_triggered=not args.polled,
+                speed_strategy=ClosedLoopSpeedStrategy() if args.closed_loop else None,
+                seed=args.seed
+            )
+
+    for key, value in result.items():
+        print(f"{key:>22}: {value:.2f}" if isinstance(value, float) else f"{key:>22}: {value}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,37 @@
+# src/simulation/virtual_clock.py
+import asyncio
+import time
+from typing import Optional
+
+
+class VirtualClock:
+    def __init__(self, start: float = 0.0, wall_start: Optional[float] = None):
+        """
+        Clock that only moves when something sleeps on it.
+
+        A sleep advances the virtual time straight to the wake-up time and yields
+        to the event loop once, so a control loop sleeping between ticks runs as
+        fast as the CPU allows. Meant for a single sleeping task: concurrent
+        sleepers each advance the clock by their own duration.
+
+        Args:
+            start: Initial monotonic time in seconds
+            wall_start: Wall clock time matching start, defaults to now
+        """
+        self.now = start
+        self.start = start
+        self.wall_start = wall_start if wall_start is not None else time.time()
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.wall_start + (self.now - self.start)
+
+    def advance(self, seconds: float) -> None:
+        if seconds > 0:
+            self.now += seconds
+
+    async def sleep(self, seconds: float) -> None:
+        self.advance(seconds)
+        await asyncio.sleep(0)